@@ -1,21 +1,42 @@
+import asyncio
 import logging
-from typing import Dict, Any, List, Optional
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple, Type, Union
 from abc import ABC, abstractmethod
 from uuid import UUID
 
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.callbacks import BaseCallbackHandler, Callbacks
 from langchain_core.runnables import RunnableConfig
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import BaseMessage, HumanMessage, ToolMessage
 
-from mdt_agent_system.app.core.schemas import PatientCase, StatusUpdate
+from pydantic import BaseModel, ValidationError
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.case_projection import (
+    CASE_PROJECTIONS,
+    SHARED_CASE_PROJECTION,
+    CaseProjection,
+    get_projection_cache,
+)
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.context_cache import get_context_cache
+from mdt_agent_system.app.core.json_repair import JSONRepairError, loads_tolerant
+from mdt_agent_system.app.core.schemas import PatientCase, StatusUpdate, get_metadata_schema
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService, Status
 from mdt_agent_system.app.core.llm import get_llm
 from mdt_agent_system.app.core.memory.persistence import PersistentConversationMemory
 from mdt_agent_system.app.core.logging import get_logger
-from mdt_agent_system.app.core.samples.prompts import get_prompt_template
+from mdt_agent_system.app.core.samples.prompts import SHARED_PREFIX, get_prompt, render_shared_case
 from mdt_agent_system.app.core.output_parser import MDTOutputParser
+from mdt_agent_system.app.core.tools import MDTTool, ToolRegistry, plan_prefetch, prefetch_tool_context
+from mdt_agent_system.app.core.tokens import (
+    estimate_prompt_tokens,
+    estimate_tokens,
+    get_token_ledger,
+    reported_prompt_tokens,
+    trim_candidates,
+)
 
 logger = get_logger(__name__)
 
@@ -24,8 +45,40 @@ class BaseSpecializedAgent(ABC):
     
     Implements common functionality for agent initialization, status updates,
     memory integration, and communication with the LLM.
+    
+    Agents that list registry tools in ``tool_names`` get them bound to the LLM;
+    the tool calls of each model turn are executed concurrently and fed back
+    until the model answers or ``max_tool_iterations`` is reached. With
+    ``prefetch_tools`` enabled, lookups derivable from the patient case run
+    while the prompt is prepared and are injected into the context up front.
+    With ``stream_sections`` enabled (per class, or per agent through
+    ``STREAM_AGENT_SECTIONS``), tool-less agents stream the response and emit
+    each markdown section as an ACTIVE status update once it completes.
+    Prompts are estimated before each call and kept within the agent's and the
+    run's token budgets by dropping low-priority input (oldest history first);
+    estimates and provider-reported usage go to the token ledger.
+    The patient case is narrowed to the agent type's ``CASE_PROJECTIONS`` view
+    (or ``case_projection``) before the input is prepared. With
+    ``PROMPT_SHARED_CASE`` the full case instead opens every stage prompt
+    after the shared system message, a prefix a provider context cache can
+    hold once per run.
+    Upstream stage outputs arrive compacted to summaries, key findings and
+    metadata; ``upstream_markdown`` also passes their full markdown.
+    Metadata that fails the agent type's schema is fixed by follow-up calls
+    asking only for the failing fields, within attempt and token limits.
     """
     
+    tool_names: List[str] = []
+    max_tool_iterations: int = 4
+    prefetch_tools: bool = True
+    stream_sections: bool = False
+    upstream_markdown: bool = False
+    case_projection: Optional[CaseProjection] = None
+    _token_budget: Optional[int] = None
+    _trimmed_sections: int = 0
+    _reported_prompt_tokens: Optional[int] = None
+    _token_usage: Dict[str, Any] = {}
+    
     def __init__(self, 
                  agent_id: str,
                  run_id: str,
@@ -37,7 +90,7 @@ class BaseSpecializedAgent(ABC):
         self.status_service = status_service
         self.callbacks = callbacks or []
         self.llm = get_llm(callbacks=self.callbacks)
-        self.output_parser = MDTOutputParser()
+        self.output_parser = MDTOutputParser(agent_id=agent_id)
         
         memory_session_id = f"{run_id}_{agent_id}"
         self.memory = PersistentConversationMemory(
@@ -46,10 +99,13 @@ class BaseSpecializedAgent(ABC):
             return_messages=True
         )
         
-        agent_type = self._get_agent_type()
-        self.prompt_template = ChatPromptTemplate.from_template(
-            get_prompt_template(agent_type)
-        )
+        # Compiled once per process; the version identifies the template this agent renders
+        self.prompt = get_prompt(self._get_agent_type())
+        self.prompt_template = self.prompt.chat_template
+        
+        streamed = getattr(get_config(), "STREAM_AGENT_SECTIONS", [])
+        if streamed and ("*" in streamed or agent_id in streamed or self._get_agent_type() in streamed):
+            self.stream_sections = True
         
         logger.info(f"Initialized {agent_id} with run_id: {run_id}")
     
@@ -72,20 +128,38 @@ class BaseSpecializedAgent(ABC):
     
     async def process(self, patient_case: PatientCase, context: Dict[str, Any]) -> Dict[str, Any]:
         """Process the patient case with this specialized agent."""
+        prefetch_task = None
         try:
-            await self._emit_status("ACTIVE", f"Starting {self.agent_id} analysis")
+            if self.prefetch_tools and self.tool_names:
+                # Lookups start on the next await and overlap with prompt preparation
+                prefetch_task = asyncio.create_task(
+                    prefetch_tool_context(plan_prefetch(patient_case), self.tool_names)
+                )
+            await self._emit_status(
+                "ACTIVE", f"Starting {self.agent_id} analysis", {"prompt_version": self.prompt.version}
+            )
             
-            agent_input = self._prepare_input(patient_case, context)
+            agent_input = self._prepare_within_budget(patient_case, context)
+            if prefetch_task is not None:
+                agent_input = self._inject_prefetched(agent_input, await prefetch_task)
             result = await self._run_analysis(agent_input)
-            parsed_output = self.output_parser.parse_llm_output(result)
+            if isinstance(result, AgentOutput):
+                parsed_output = result
+            else:
+                parsed_output = self.output_parser.parse_llm_output(result)
+            # Responses outside the markdown/metadata protocol are left to the agents' fallbacks
+            if isinstance(result, AgentOutput) or self.output_parser.MARKDOWN_DELIMITER in result:
+                parsed_output = await self._repair_metadata(parsed_output)
             structured_output = self._structure_output(parsed_output)
             
             self._save_to_memory(agent_input, structured_output)
-            await self._emit_status("DONE", f"Completed {self.agent_id} analysis")
+            await self._emit_status("DONE", f"Completed {self.agent_id} analysis", {"token_usage": self._token_usage})
             
             return structured_output
             
         except Exception as e:
+            if prefetch_task is not None and not prefetch_task.done():
+                prefetch_task.cancel()
             logger.exception(f"Error in {self.agent_id} analysis: {str(e)}")
             await self._emit_status("ERROR", f"Error in {self.agent_id} analysis: {str(e)}")
             raise
@@ -95,21 +169,389 @@ class BaseSpecializedAgent(ABC):
         """Prepare the input for the agent's analysis."""
         pass
     
-    async def _run_analysis(self, input_data: Dict[str, Any]) -> str:
-        """Run the LLM analysis with the prepared input."""
+    def _project_case(self, patient_case: PatientCase) -> PatientCase:
+        """Return the view of the case this agent reads, built once per run and view."""
+        config = get_config()
+        if getattr(config, "PROMPT_SHARED_CASE", False):
+            projection = SHARED_CASE_PROJECTION
+        else:
+            projection = self.case_projection or CASE_PROJECTIONS.get(self._get_agent_type())
+            if projection is None or not getattr(config, "CASE_PROJECTION_ENABLED", True):
+                return patient_case
+        return get_projection_cache().get(self.run_id, patient_case, projection)
+    
+    def _shared_case_section(self, patient_case: PatientCase) -> str:
+        """Return the run's shared patient case section, rendered once per run."""
+        return get_projection_cache().memo(
+            self.run_id, patient_case, "shared_case", lambda: render_shared_case(patient_case)
+        )
+    
+    def _stage_preparer(self, patient_case: PatientCase) -> Tuple[PatientCase, Callable[[PatientCase, Dict[str, Any]], Dict[str, Any]]]:
+        """Return the case to trim under the budget and the function preparing an input from it.
+        
+        With PROMPT_SHARED_CASE the whole case goes into ``shared_context``, so
+        that is what gets trimmed; the stage text uses the (empty) projection.
+        """
+        if not getattr(get_config(), "PROMPT_SHARED_CASE", False):
+            return self._project_case(patient_case), self._prepare_input
+        stage_case = self._project_case(patient_case)
+        
+        def prepare(case: PatientCase, context: Dict[str, Any]) -> Dict[str, Any]:
+            # Only the untrimmed case is shared by every stage; trimmed variants are stage-specific
+            shared = self._shared_case_section(case) if case is patient_case else render_shared_case(case)
+            return {**self._prepare_input(stage_case, context), "shared_context": shared}
+        
+        return patient_case, prepare
+    
+    def _prompt_budget(self) -> Optional[int]:
+        """Return the prompt token budget of this stage, or None when unlimited.
+        
+        The smaller of the agent's budget (AGENT_PROMPT_TOKEN_BUDGETS by agent
+        type, else AGENT_PROMPT_TOKEN_BUDGET) and what is left of
+        RUN_PROMPT_TOKEN_BUDGET after the run's earlier stages.
+        """
+        config = get_config()
+        per_agent = getattr(config, "AGENT_PROMPT_TOKEN_BUDGETS", {}) or {}
+        budgets = [per_agent.get(self._get_agent_type(), getattr(config, "AGENT_PROMPT_TOKEN_BUDGET", None))]
+        run_budget = getattr(config, "RUN_PROMPT_TOKEN_BUDGET", None)
+        if run_budget is not None:
+            budgets.append(max(run_budget - get_token_ledger().estimated_total(self.run_id), 0))
+        budgets = [budget for budget in budgets if budget is not None]
+        return min(budgets) if budgets else None
+    
+    def _estimate_input_tokens(self, agent_input: Dict[str, Any]) -> int:
+        """Estimate the prompt tokens of a prepared input without rendering the template."""
+        shared = agent_input.get("shared_context")
+        return (
+            estimate_tokens(self.prompt.text)
+            + estimate_tokens(agent_input.get("context", ""))
+            + estimate_tokens(agent_input.get("task", ""))
+            + (estimate_tokens(SHARED_PREFIX) + estimate_tokens(shared) if shared else 0)
+        )
+    
+    def _prepare_within_budget(self, patient_case: PatientCase, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Prepare the input, dropping low-priority sections until it fits the budget.
+        
+        Sections are dropped in the fixed order of ``trim_candidates``; if the
+        input is still too large, the context text and then the shared case
+        section are cut at the budget.
+        """
+        self._token_budget = self._prompt_budget()
+        self._trimmed_sections = 0
+        patient_case, prepare = self._stage_preparer(patient_case)
+        agent_input = prepare(patient_case, context)
+        if self._token_budget is None or self._estimate_input_tokens(agent_input) <= self._token_budget:
+            return agent_input
+        
+        for trimmed_case, trimmed_context in trim_candidates(patient_case, context):
+            self._trimmed_sections += 1
+            agent_input = prepare(trimmed_case, trimmed_context)
+            if self._estimate_input_tokens(agent_input) <= self._token_budget:
+                break
+        else:
+            for field in ("context", "shared_context"):
+                text = agent_input.get(field)
+                excess = self._estimate_input_tokens(agent_input) - self._token_budget
+                if not text or excess <= 0:
+                    continue
+                agent_input = {
+                    **agent_input,
+                    field: text[:max(len(text) - excess * 4, 0)] + "\n[context truncated to fit the token budget]"
+                }
+            self._trimmed_sections += 1
+        logger.warning(
+            f"{self.agent_id}: input trimmed to fit {self._token_budget} tokens "
+            f"({self._trimmed_sections} section(s) dropped)"
+        )
+        return agent_input
+    
+    def _inject_prefetched(self, agent_input: Dict[str, Any], prefetched: Dict[str, Any]) -> Dict[str, Any]:
+        """Append pre-fetched tool results to the prepared context."""
+        if not prefetched:
+            return agent_input
+        return {
+            **agent_input,
+            "context": (
+                f"{agent_input.get('context', '')}\n\n"
+                "PRE-FETCHED REFERENCE DATA (already looked up from the patient case; "
+                "call tools only for information not covered here):\n"
+                f"{json_codec.dumps(prefetched)}"
+            )
+        }
+    
+    async def _run_analysis(self, input_data: Dict[str, Any]) -> Union[str, AgentOutput]:
+        """Run the LLM analysis with the prepared input.
+        
+        Returns:
+            The raw response text, or the already parsed output when streamed
+        """
         config = RunnableConfig(
             callbacks=self.callbacks,
             run_name=f"{self.agent_id}_analysis"
         )
         
-        prompt = self.prompt_template.format_messages(
+        tools = self._get_tools()
+        shared = input_data.get("shared_context")
+        llm, prefix_cached = self.llm, False
+        if shared and not tools:
+            # Tool loops rebind the LLM per turn, so only single calls reference the cached prefix
+            cache = get_context_cache()
+            if cache is not None:
+                handle = await asyncio.to_thread(cache.handle, self.run_id, SHARED_PREFIX, shared)
+                if handle is not None:
+                    llm, prefix_cached = cache.bind(self.llm, handle), True
+        
+        prompt = self.prompt.format_messages(
             context=input_data.get("context", ""),
-            task=input_data.get("task", "Analyze the patient case")
+            task=input_data.get("task", "Analyze the patient case"),
+            shared=shared,
+            prefix_cached=prefix_cached
+        )
+        estimated = estimate_prompt_tokens(prompt)
+        if prefix_cached:
+            # The cached prefix is left out of the messages but is still part of the model input
+            estimated += estimate_tokens(SHARED_PREFIX) + estimate_tokens(shared)
+        self._reported_prompt_tokens = None
+        
+        if tools:
+            output = await self._run_tool_loop(prompt, tools, config)
+        elif self.stream_sections:
+            output = await self._stream_analysis(prompt, config, llm)
+        else:
+            response = await llm.ainvoke(prompt, config=config)
+            self._note_usage(response)
+            output = response.content
+        
+        self._record_usage(estimated)
+        return output
+    
+    def _note_usage(self, response: Any) -> None:
+        """Add the prompt tokens the provider reported for one call, if any."""
+        reported = reported_prompt_tokens(response)
+        if reported is not None:
+            self._reported_prompt_tokens = (self._reported_prompt_tokens or 0) + reported
+    
+    def _record_usage(self, estimated: int) -> None:
+        """Record the stage's estimated and reported prompt tokens in the run's ledger.
+        
+        The estimate covers the initial prompt; reported usage sums every call
+        of the stage, including tool-loop turns.
+        """
+        reported = self._reported_prompt_tokens
+        get_token_ledger().record(
+            self.run_id, self.agent_id, estimated, reported,
+            budget=self._token_budget, trimmed=self._trimmed_sections
         )
+        self._token_usage = {"estimated_prompt_tokens": estimated, "reported_prompt_tokens": reported}
+        if reported is not None:
+            logger.info(f"{self.agent_id}: prompt tokens estimated {estimated}, reported {reported}")
+    
+    async def _stream_analysis(self, prompt: List[BaseMessage], config: RunnableConfig, llm: Any = None) -> AgentOutput:
+        """Stream the LLM response through the incremental output parser.
         
-        response = await self.llm.ainvoke(prompt, config=config)
+        Each completed markdown section is emitted as an ACTIVE status update;
+        the response text itself is never accumulated.
+        """
+        parser = self.output_parser.stream()
+        async for chunk in (llm or self.llm).astream(prompt, config=config):
+            for event in parser.feed(chunk.content):
+                if event.kind == "section":
+                    await self._emit_status(
+                        "ACTIVE",
+                        f"{event.title or 'Section'} ready",
+                        {"section": event.title, "level": event.level, "markdown": event.content}
+                    )
+        return parser.close()
+    
+    @staticmethod
+    def _metadata_errors(schema: Type[BaseModel], metadata: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Validate metadata against a schema and return pydantic's error list."""
+        try:
+            schema.model_validate(metadata)
+        except ValidationError as e:
+            return e.errors()
+        return []
+    
+    def _metadata_retry_prompt(self, schema: Type[BaseModel], metadata: Dict[str, Any],
+                               errors: List[Dict[str, Any]], fields: List[str]) -> str:
+        """Build the follow-up prompt from the previous metadata and its validation errors."""
+        error_lines = "\n".join(
+            f"- {'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in errors
+        )
+        field_lines = "\n".join(
+            f"- {name}: {schema.model_fields[name].description or 'required'}"
+            for name in fields if name in schema.model_fields
+        )
+        return (
+            "The metadata JSON of your previous answer failed validation.\n\n"
+            f"Previous metadata:\n{json_codec.dumps(metadata)}\n\n"
+            f"Validation errors:\n{error_lines}\n\n"
+            f"Expected fields:\n{field_lines}\n\n"
+            f"Return ONLY a JSON object with corrected values for {json_codec.dumps(fields)}. "
+            "Do not repeat other fields and do not add commentary."
+        )
+    
+    async def _repair_metadata(self, parsed_output: AgentOutput) -> AgentOutput:
+        """Re-ask the LLM for the metadata fields that fail this agent's schema.
+        
+        Each follow-up sends only the previous metadata and the validation
+        errors, not the case context, and the returned fields are merged in.
+        Attempts stop at METADATA_RETRY_MAX_ATTEMPTS or when the next call
+        would exceed the METADATA_RETRY_MAX_TOKENS estimate.
+        
+        Returns:
+            The output with merged metadata; unchanged if no schema applies
+        """
+        schema = get_metadata_schema(self._get_agent_type())
+        if schema is None:
+            return parsed_output
+        config = get_config()
+        max_attempts = getattr(config, "METADATA_RETRY_MAX_ATTEMPTS", 2)
+        token_budget = getattr(config, "METADATA_RETRY_MAX_TOKENS", 2000)
+        
+        metadata = dict(parsed_output.metadata)
+        errors = self._metadata_errors(schema, metadata)
+        attempts = 0
+        tokens_used = 0
+        while errors and attempts < max_attempts:
+            fields = sorted({str(error["loc"][0]) for error in errors if error["loc"]})
+            prompt = self._metadata_retry_prompt(schema, metadata, errors, fields)
+            estimated = estimate_tokens(prompt)
+            if tokens_used + estimated > token_budget:
+                logger.warning(f"{self.agent_id}: metadata retry skipped, token budget {token_budget} would be exceeded")
+                break
+            
+            attempts += 1
+            await self._emit_status(
+                "ACTIVE",
+                f"Requesting {len(fields)} missing or invalid metadata field(s)",
+                {"attempt": attempts, "fields": fields}
+            )
+            try:
+                response = await self.llm.ainvoke(
+                    [HumanMessage(content=prompt)],
+                    config=RunnableConfig(callbacks=self.callbacks, run_name=f"{self.agent_id}_metadata_retry")
+                )
+            except Exception as e:
+                logger.warning(f"{self.agent_id}: metadata retry call failed: {str(e)}")
+                break
+            tokens_used += estimated + estimate_tokens(response.content)
+            
+            try:
+                patch, _ = loads_tolerant(response.content)
+            except JSONRepairError as e:
+                logger.warning(f"{self.agent_id}: metadata retry returned unparseable JSON: {str(e)}")
+                patch = None
+            if isinstance(patch, dict):
+                metadata.update({key: value for key, value in patch.items() if key in fields})
+            errors = self._metadata_errors(schema, metadata)
+        
+        if attempts:
+            self.output_parser.record_metadata_retry(attempts, recovered=not errors, tokens=tokens_used)
+            logger.info(
+                f"{self.agent_id}: metadata {'recovered' if not errors else 'still invalid'} after "
+                f"{attempts} follow-up call(s), ~{tokens_used} tokens"
+            )
+        elif errors:
+            logger.warning(f"{self.agent_id}: metadata failed validation: {len(errors)} error(s)")
+        return parsed_output.model_copy(update={"metadata": metadata})
+    
+    def _get_tools(self) -> List[MDTTool]:
+        """Resolve ``tool_names`` against the tool registry, skipping missing tools."""
+        tools = []
+        for name in self.tool_names:
+            try:
+                tools.append(ToolRegistry.get_tool(name))
+            except KeyError:
+                logger.warning(f"{self.agent_id}: tool '{name}' not found in registry")
+        return tools
+    
+    async def _run_tool_loop(self, prompt: List[BaseMessage], tools: List[MDTTool], config: RunnableConfig) -> str:
+        """Let the LLM call tools until it produces a final answer.
+        
+        The MDT tools are bound directly; each declares an ``args_schema``, so
+        the model sees only the arguments it may pass. Chat models without
+        ``bind_tools`` (including the pinned langchain-google-genai 0.0.5) get a
+        single plain call instead; their tool context comes from pre-fetching.
+        
+        Args:
+            prompt: The formatted prompt messages
+            tools: The tools the LLM may call
+            config: Runnable config for the LLM calls
+            
+        Returns:
+            The content of the LLM's final response
+        """
+        try:
+            llm_with_tools = self.llm.bind_tools(tools)
+        except NotImplementedError:
+            logger.warning(f"{self.agent_id}: LLM does not support tool binding, running without tools")
+            response = await self.llm.ainvoke(prompt, config=config)
+            self._note_usage(response)
+            return response.content
+        
+        tools_by_name = {tool.name: tool for tool in tools}
+        messages = list(prompt)
+        for iteration in range(1, self.max_tool_iterations + 1):
+            response = await llm_with_tools.ainvoke(messages, config=config)
+            self._note_usage(response)
+            tool_calls = getattr(response, "tool_calls", None) or []
+            if not tool_calls:
+                return response.content
+            
+            messages.append(response)
+            results = await asyncio.gather(*(self._execute_tool_call(call, tools_by_name) for call in tool_calls))
+            timings = []
+            for call, (result, timing) in zip(tool_calls, results):
+                messages.append(ToolMessage(content=json_codec.dumps(result), tool_call_id=call.get("id") or call["name"]))
+                timings.append(timing)
+            
+            await self._emit_status(
+                "ACTIVE",
+                f"Executed {len(tool_calls)} tool call(s)",
+                {"iteration": iteration, "tool_calls": timings}
+            )
+        
+        logger.warning(f"{self.agent_id}: reached {self.max_tool_iterations} tool iterations, requesting final answer")
+        # The history holds tool-call turns, so keep the tools declared but forbid calling them
+        try:
+            final_llm = self.llm.bind_tools(tools, tool_choice="none")
+        except (TypeError, ValueError, NotImplementedError):
+            final_llm = llm_with_tools
+        response = await final_llm.ainvoke(messages, config=config)
+        self._note_usage(response)
         return response.content
     
+    async def _execute_tool_call(self, call: Dict[str, Any], tools_by_name: Dict[str, MDTTool]) -> Tuple[Any, Dict[str, Any]]:
+        """Execute one tool call and time it.
+        
+        ``MDTTool._arun`` runs async tools on the event loop and offloads
+        synchronous ones to the shared tool executor, applying each tool's
+        concurrency limit, timeout and retry policy.
+        
+        Returns:
+            The tool result and a timing record for status details
+        """
+        name = call.get("name", "")
+        args = call.get("args") or {}
+        tool = tools_by_name.get(name)
+        started = time.perf_counter()
+        if tool is None:
+            result = {"status": "error", "error": f"Unknown tool: {name}", "error_type": "KeyError"}
+        else:
+            try:
+                result = await tool._arun(**args)
+            except Exception as e:
+                logger.warning(f"{self.agent_id}: tool '{name}' failed: {str(e)}")
+                result = tool._handle_error(e)
+        
+        status = result.get("status", "success") if isinstance(result, dict) else "success"
+        return result, {
+            "tool": name,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 2),
+            "status": status
+        }
+    
     @abstractmethod
     def _structure_output(self, parsed_output: AgentOutput) -> Dict[str, Any]:
         """Structure the parsed output into a standardized format."""
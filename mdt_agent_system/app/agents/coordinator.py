@@ -9,9 +9,15 @@ from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from pydantic import BaseModel, Field
 from pydantic import ConfigDict
 
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.case_projection import get_projection_cache
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.context_cache import get_context_cache
+from mdt_agent_system.app.core.context_compaction import StageSnapshot
 from mdt_agent_system.app.core.schemas import PatientCase, MDTReport, StatusUpdate
 from mdt_agent_system.app.core.status import StatusUpdateService, Status
 from mdt_agent_system.app.core.logging import get_logger
+from mdt_agent_system.app.core.memory.retention import report_file_path
 from mdt_agent_system.app.agents.ehr_agent import EHRAgent
 
 logger = get_logger(__name__)
@@ -85,6 +91,10 @@ class AgentContext(BaseModel):
     specialist_assessment: Optional[AgentOutputPlaceholder] = None
     evaluation: Optional[Dict[str, Any]] = None
     summary: Optional[Dict[str, Any]] = None
+    # Estimated upstream-context tokens per agent, before and after compaction
+    context_tokens: Dict[str, Dict[str, int]] = Field(default_factory=dict)
+    # Completed stage outputs, serialized once for every downstream stage
+    snapshots: Dict[str, StageSnapshot] = Field(default_factory=dict)
 
     model_config = ConfigDict(extra="allow", arbitrary_types_allowed=True)
     
@@ -111,6 +121,19 @@ class AgentContext(BaseModel):
             
         return result
     
+    def record_snapshot(self, key: str) -> Optional[StageSnapshot]:
+        """Snapshot the completed stage output stored under ``key``.
+        
+        Empty outputs are not passed downstream, so they get no snapshot.
+        """
+        value = getattr(self, key)
+        if not value:
+            self.snapshots.pop(key, None)
+            return None
+        snapshot = StageSnapshot.capture(value, max_findings=getattr(get_config(), "CONTEXT_MAX_FINDINGS", 8))
+        self.snapshots[key] = snapshot
+        return snapshot
+    
     def _convert_to_serializable(self, obj):
         """Convert objects to serializable format."""
         if hasattr(obj, "dict") and callable(obj.dict):
@@ -127,6 +150,27 @@ class AgentContext(BaseModel):
             except:
                 return "Non-serializable object"
 
+def _upstream_context(context: AgentContext, agent: Any, keys: Tuple[str, ...]) -> Dict[str, Any]:
+    """Build an agent's upstream context from the snapshots of completed stages.
+    
+    Each stage output is serialized once when it completes; later stages reuse
+    the snapshot's parsed data or its precomputed compact view. Agents with
+    ``upstream_markdown`` set keep the full markdown of each stage. The
+    estimated context tokens before and after compaction are logged and
+    recorded in ``context.context_tokens``.
+    """
+    snapshots = [(key, context.snapshots[key]) for key in keys if key in context.snapshots]
+    if not snapshots:
+        return {}
+    if not getattr(get_config(), "CONTEXT_COMPACTION_ENABLED", True):
+        return {key: snapshot.data for key, snapshot in snapshots}
+    include_markdown = getattr(agent, "upstream_markdown", False)
+    before = sum(snapshot.tokens for _, snapshot in snapshots)
+    after = sum(snapshot.view_tokens(include_markdown=include_markdown) for _, snapshot in snapshots)
+    context.context_tokens[agent.agent_id] = {"before": before, "after": after}
+    logger.info(f"{agent.agent_id}: upstream context ~{before} -> ~{after} tokens after compaction")
+    return {key: snapshot.view(include_markdown=include_markdown) for key, snapshot in snapshots}
+
 # --- Agent Step Functions (Placeholders as Runnables) ---
 
 async def _run_ehr_agent_step(context: AgentContext) -> AgentContext:
@@ -152,6 +196,7 @@ async def _run_ehr_agent_step(context: AgentContext) -> AgentContext:
     
     # Convert to expected output format using enhanced handler
     context.ehr_analysis = AgentOutputPlaceholder.from_agent_output(result)
+    context.record_snapshot("ehr_analysis")
     
     await context.status_service.emit_status_update(
         run_id=context.run_id,
@@ -184,16 +229,15 @@ async def _run_imaging_agent_step(context: AgentContext) -> AgentContext:
         status_service=context.status_service
     )
     
-    # Build a dict with context data for the agent
-    agent_context = {}
-    if context.ehr_analysis:
-        agent_context["ehr_analysis"] = context.ehr_analysis.dict()
+    # Upstream outputs come from the snapshots of completed stages
+    agent_context = _upstream_context(context, agent, ("ehr_analysis",))
         
     # Process with the actual agent
     result = await agent.process(context.patient_case, agent_context)
     
     # Convert to expected output format using enhanced handler
     context.imaging_analysis = AgentOutputPlaceholder.from_agent_output(result)
+    context.record_snapshot("imaging_analysis")
     
     await context.status_service.emit_status_update(
         run_id=context.run_id,
@@ -226,18 +270,15 @@ async def _run_pathology_agent_step(context: AgentContext) -> AgentContext:
         status_service=context.status_service
     )
     
-    # Build a dict with context data for the agent
-    agent_context = {}
-    if context.ehr_analysis:
-        agent_context["ehr_analysis"] = context.ehr_analysis.dict()
-    if context.imaging_analysis:
-        agent_context["imaging_analysis"] = context.imaging_analysis.dict()
+    # Upstream outputs come from the snapshots of completed stages
+    agent_context = _upstream_context(context, agent, ("ehr_analysis", "imaging_analysis"))
         
     # Process with the actual agent
     result = await agent.process(context.patient_case, agent_context)
     
     # Convert to expected output format using enhanced handler
     context.pathology_analysis = AgentOutputPlaceholder.from_agent_output(result)
+    context.record_snapshot("pathology_analysis")
     
     await context.status_service.emit_status_update(
         run_id=context.run_id,
@@ -270,20 +311,15 @@ async def _run_guideline_agent_step(context: AgentContext) -> AgentContext:
         status_service=context.status_service
     )
     
-    # Build a dict with context data for the agent
-    agent_context = {}
-    if context.ehr_analysis:
-        agent_context["ehr_analysis"] = context.ehr_analysis.dict()
-    if context.imaging_analysis:
-        agent_context["imaging_analysis"] = context.imaging_analysis.dict()
-    if context.pathology_analysis:
-        agent_context["pathology_analysis"] = context.pathology_analysis.dict()
+    # Upstream outputs come from the snapshots of completed stages
+    agent_context = _upstream_context(context, agent, ("ehr_analysis", "imaging_analysis", "pathology_analysis"))
         
     # Process with the actual agent
     result = await agent.process(context.patient_case, agent_context)
     
     # For guidelines, store the recommendations directly
     context.guideline_recommendations = result
+    context.record_snapshot("guideline_recommendations")
     
     await context.status_service.emit_status_update(
         run_id=context.run_id,
@@ -316,22 +352,15 @@ async def _run_specialist_agent_step(context: AgentContext) -> AgentContext:
         status_service=context.status_service
     )
     
-    # Build a dict with context data for the agent
-    agent_context = {}
-    if context.ehr_analysis:
-        agent_context["ehr_analysis"] = context.ehr_analysis.dict()
-    if context.imaging_analysis:
-        agent_context["imaging_analysis"] = context.imaging_analysis.dict()
-    if context.pathology_analysis:
-        agent_context["pathology_analysis"] = context.pathology_analysis.dict()
-    if context.guideline_recommendations:
-        agent_context["guideline_recommendations"] = context.guideline_recommendations
+    # Upstream outputs come from the snapshots of completed stages
+    agent_context = _upstream_context(context, agent, ("ehr_analysis", "imaging_analysis", "pathology_analysis", "guideline_recommendations"))
         
     # Process with the actual agent
     result = await agent.process(context.patient_case, agent_context)
     
     # Convert to expected output format using enhanced handler
     context.specialist_assessment = AgentOutputPlaceholder.from_agent_output(result)
+    context.record_snapshot("specialist_assessment")
     
     await context.status_service.emit_status_update(
         run_id=context.run_id,
@@ -364,18 +393,8 @@ async def _run_evaluation_step(context: AgentContext) -> AgentContext:
         status_service=context.status_service
     )
     
-    # Build a dict with context data for the agent
-    agent_context = {}
-    if context.ehr_analysis:
-        agent_context["ehr_analysis"] = context.ehr_analysis.dict()
-    if context.imaging_analysis:
-        agent_context["imaging_analysis"] = context.imaging_analysis.dict()
-    if context.pathology_analysis:
-        agent_context["pathology_analysis"] = context.pathology_analysis.dict()
-    if context.guideline_recommendations:
-        agent_context["guideline_recommendations"] = context.guideline_recommendations
-    if context.specialist_assessment:
-        agent_context["specialist_assessment"] = context.specialist_assessment.dict()
+    # Upstream outputs come from the snapshots of completed stages
+    agent_context = _upstream_context(context, agent, ("ehr_analysis", "imaging_analysis", "pathology_analysis", "guideline_recommendations", "specialist_assessment"))
         
     # Process with the actual agent
     result = await agent.process(context.patient_case, agent_context)
@@ -388,6 +407,7 @@ async def _run_evaluation_step(context: AgentContext) -> AgentContext:
         "evaluation_formatted": evaluation_output.markdown_content if evaluation_output.markdown_content else None,
         "metadata": evaluation_output.metadata if evaluation_output.metadata else {}
     }
+    context.record_snapshot("evaluation")
     
     await context.status_service.emit_status_update(
         run_id=context.run_id,
@@ -420,20 +440,8 @@ async def _run_summary_step(context: AgentContext) -> AgentContext:
         status_service=context.status_service
     )
     
-    # Build a dict with context data for the agent
-    agent_context = {}
-    if context.ehr_analysis:
-        agent_context["ehr_analysis"] = context.ehr_analysis.dict()
-    if context.imaging_analysis:
-        agent_context["imaging_analysis"] = context.imaging_analysis.dict()
-    if context.pathology_analysis:
-        agent_context["pathology_analysis"] = context.pathology_analysis.dict()
-    if context.guideline_recommendations:
-        agent_context["guideline_recommendations"] = context.guideline_recommendations
-    if context.specialist_assessment:
-        agent_context["specialist_assessment"] = context.specialist_assessment.dict()
-    if context.evaluation:
-        agent_context["evaluation"] = context.evaluation
+    # Upstream outputs come from the snapshots of completed stages
+    agent_context = _upstream_context(context, agent, ("ehr_analysis", "imaging_analysis", "pathology_analysis", "guideline_recommendations", "specialist_assessment", "evaluation"))
         
     # Process with the actual agent
     result = await agent.process(context.patient_case, agent_context)
@@ -860,7 +868,6 @@ async def run_mdt_simulation(
             print("SPECIALIST OUTPUT:", final_context.specialist_assessment.dict())
         
         # Also try to directly create a JSON string of the report
-        import json
         try:
             from pydantic import BaseModel
             if isinstance(mdt_report, BaseModel):
@@ -875,13 +882,6 @@ async def run_mdt_simulation(
                     print(report_json[:1000])  # Print first 1000 chars
                     print("... (truncated) ...")
             
-            # Try the default JSON encoder with custom datetime handling
-            class DateTimeEncoder(json.JSONEncoder):
-                def default(self, obj):
-                    if isinstance(obj, datetime):
-                        return obj.isoformat()
-                    return super().default(obj)
-            
             report_dict = {}
             if hasattr(mdt_report, 'dict'):
                 report_dict = mdt_report.dict()
@@ -903,15 +903,17 @@ async def run_mdt_simulation(
                     "timestamp": str(datetime.utcnow())
                 }
             
-            manual_json = json.dumps(report_dict, cls=DateTimeEncoder, indent=2)
+            manual_json = json_codec.dumps(report_dict, indent=True)
             print("\n======= FINAL REPORT MANUAL JSON =======")
             print(manual_json[:1000])  # Print first 1000 chars
             print("... (truncated) ...")
             
-            # Write report to local file for inspection
-            with open(f"report_{run_id}.json", "w") as f:
+            # Write report to the reports directory for inspection and GET /report
+            report_path = report_file_path(run_id)
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(report_path, "w", encoding="utf-8") as f:
                 f.write(manual_json)
-            print(f"\nFull report written to file: report_{run_id}.json")
+            print(f"\nFull report written to file: {report_path}")
             
             # Create a simplified report for testing
             simple_report = {
@@ -920,7 +922,7 @@ async def run_mdt_simulation(
                 "timestamp": str(datetime.utcnow())
             }
             print("\n======= SIMPLIFIED TEST REPORT =======")
-            print(json.dumps(simple_report, indent=2))
+            print(json_codec.dumps(simple_report, indent=True))
         except Exception as json_error:
             print(f"Error creating JSON output: {json_error}")
             print(f"Error type: {type(json_error)}")
@@ -994,21 +996,13 @@ async def run_mdt_simulation(
             # Try alternative serialization if dict() fails
             if report_data is None:
                 try:
-                    import json
                     # Try using __dict__ or serialize the object directly
                     if hasattr(mdt_report, '__dict__'):
                         report_data = mdt_report.__dict__
                         print(f"===> USING __dict__ FALLBACK: {type(report_data)}")
                     else:
-                        # Try direct JSON serialization with custom encoder
-                        class DateTimeEncoder(json.JSONEncoder):
-                            def default(self, obj):
-                                if isinstance(obj, datetime):
-                                    return obj.isoformat()
-                                return super().default(obj)
-                        
-                        report_json = json.dumps(mdt_report, cls=DateTimeEncoder, default=str)
-                        report_data = json.loads(report_json)
+                        # Try direct JSON serialization through the codec
+                        report_data = json_codec.to_jsonable(mdt_report)
                         print(f"===> USING CUSTOM JSON SERIALIZATION: {type(report_data)}")
                 except Exception as json_error:
                     print(f"===> ERROR WITH ALTERNATIVE SERIALIZATION: {json_error}")
@@ -1076,6 +1070,11 @@ async def run_mdt_simulation(
         )
         # Re-raise or handle as needed, potentially return a partial/error report
         raise # Re-raise the exception for the background task runner to potentially catch
+    finally:
+        get_projection_cache().discard(run_id)
+        context_cache = get_context_cache()
+        if context_cache is not None:
+            await asyncio.to_thread(context_cache.release, run_id)
 
 # Placeholder for Status enum if not defined in core.status
 try:
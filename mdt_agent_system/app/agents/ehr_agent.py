@@ -1,11 +1,12 @@
-import json
 import logging
 from typing import Dict, Any, List, Optional
 
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService
 from mdt_agent_system.app.core.logging import get_logger
+from mdt_agent_system.app.core.output_parser import parse_markdown_outline
 from mdt_agent_system.app.agents.base_agent import BaseSpecializedAgent
 
 logger = get_logger(__name__)
@@ -63,18 +64,10 @@ class EHRAgent(BaseSpecializedAgent):
             "lab_results": patient_case.lab_results if hasattr(patient_case, 'lab_results') else []
         }
         
-        # Convert to JSON string with indentation for better LLM processing
-        # Use a custom JSON encoder to handle datetime objects and other special types
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if hasattr(obj, "dict") and callable(obj.dict):
-                    return obj.dict()
-                if hasattr(obj, "__dict__"):
-                    return obj.__dict__
-                return str(obj)  # Convert any other objects to string
-        
+        # Convert to JSON string with indentation for better LLM processing;
+        # the codec handles datetime objects and other special types
         try:
-            context_str = json.dumps(ehr_context, indent=2, cls=CustomJSONEncoder)
+            context_str = json_codec.dumps(ehr_context, indent=True)
         except Exception as e:
             logger.error(f"Error serializing EHR context: {str(e)}")
             # Fallback serialization with simpler data
@@ -82,7 +75,7 @@ class EHRAgent(BaseSpecializedAgent):
                 "patient_id": str(ehr_context.get("patient_id", "")),
                 "current_condition": str(ehr_context.get("current_condition", ""))
             }
-            context_str = json.dumps(simple_context, indent=2)
+            context_str = json_codec.dumps(simple_context, indent=True)
         
         return {
             "context": context_str,
@@ -149,54 +142,20 @@ class EHRAgent(BaseSpecializedAgent):
                 ]
         
         # Extract sections from markdown content
-        lines = parsed_output.markdown_content.split('\n')
-        overview_text = []
-        in_overview = False
-        for line in lines:
-            if line.strip().startswith('# Patient Overview'):
-                in_overview = True
-                continue
-            elif line.startswith('#'):
-                in_overview = False
-            elif in_overview and line.strip() and not line.strip().startswith('#'):
-                overview_text.append(line.strip('- ').strip())
+        outline = parse_markdown_outline(parsed_output.markdown_content)
+        overview = outline.find("Patient Overview", level=1)
+        overview_text = [
+            line.strip('- ').strip() for line in (overview.body.split('\n') if overview else []) if line.strip()
+        ]
         
         # Use markdown content for patient summary if available and not already set from metadata
         if overview_text:
             structured_output["patient_summary"] = " ".join(overview_text)
         
-        # Extract active conditions from markdown
-        conditions_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Active Conditions" in line or "## Disease Status" in line:
-                conditions_section = True
-                continue
-            if conditions_section and line.strip() and line.startswith('- '):
-                structured_output["active_conditions"].append(line.strip('- '))
-            elif conditions_section and line.startswith('#'):
-                conditions_section = False
-        
-        # Extract medications from markdown
-        medications_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Current Medications" in line:
-                medications_section = True
-                continue
-            if medications_section and line.strip() and line.startswith('- '):
-                structured_output["medications"].append(line.strip('- '))
-            elif medications_section and line.startswith('#'):
-                medications_section = False
-        
-        # Extract treatment history from markdown
-        history_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Treatment History" in line:
-                history_section = True
-                continue
-            if history_section and line.strip() and line.startswith('- '):
-                structured_output["treatment_history"].append(line.strip('- '))
-            elif history_section and line.startswith('#'):
-                history_section = False
+        # Extract active conditions, medications and treatment history from markdown
+        structured_output["active_conditions"].extend(outline.bullets("Active Conditions", "Disease Status"))
+        structured_output["medications"].extend(outline.bullets("Current Medications"))
+        structured_output["treatment_history"].extend(outline.bullets("Treatment History"))
         
         # Ensure we have at least some basic content in required fields
         if not structured_output["patient_summary"]:
@@ -1,7 +1,10 @@
-import json
 import logging
-from typing import Dict, Any, List, Optional
+import re
+from typing import Dict, Any, List, Optional, Union
 
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.evaluation_parser import parse_evaluation
+from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.status import StatusUpdateService
 from mdt_agent_system.app.core.logging import get_logger
@@ -9,6 +12,10 @@ from mdt_agent_system.app.agents.base_agent import BaseSpecializedAgent
 
 logger = get_logger(__name__)
 
+# Fallback cues for free-text evaluations without labelled sections
+_STRENGTH_TERMS = re.compile(r"thorough|comprehensive|good|excellent|well", re.IGNORECASE)
+_IMPROVEMENT_TERMS = re.compile(r"could|should|missing|lacks|improve", re.IGNORECASE)
+
 class EvaluationAgent(BaseSpecializedAgent):
     """Evaluation Agent responsible for assessing the quality and completeness of the MDT report.
     
@@ -20,6 +27,9 @@ class EvaluationAgent(BaseSpecializedAgent):
     5. Identifying any gaps or areas for improvement
     """
     
+    # The report under review is the upstream markdown itself
+    upstream_markdown = True
+    
     def __init__(self, run_id: str, status_service: StatusUpdateService, callbacks=None):
         """Initialize the Evaluation Agent.
         
@@ -95,20 +105,11 @@ class EvaluationAgent(BaseSpecializedAgent):
             "documentation": "Assesses the clarity and completeness of documentation"
         }
         
-        # Custom JSON encoder to handle complex objects
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if hasattr(obj, "dict") and callable(obj.dict):
-                    return obj.dict()
-                if hasattr(obj, "__dict__"):
-                    return obj.__dict__
-                # Handle other special types as needed
-                return str(obj)  # Convert any other objects to string
-        
-        # Convert to JSON string with indentation for better LLM processing
+        # Convert to JSON string with indentation for better LLM processing;
+        # the codec handles complex objects
         try:
-            mdt_report_str = json.dumps(mdt_report, indent=2, cls=CustomJSONEncoder)
-            criteria_str = json.dumps(evaluation_criteria, indent=2)
+            mdt_report_str = json_codec.dumps(mdt_report, indent=True)
+            criteria_str = json_codec.dumps(evaluation_criteria, indent=True)
         except Exception as e:
             logger.error(f"Error serializing evaluation context: {str(e)}")
             # Fallback serialization with simpler data
@@ -116,8 +117,8 @@ class EvaluationAgent(BaseSpecializedAgent):
                 "patient_id": str(mdt_report.get("patient_id", "")),
                 "error": f"Failed to serialize complete report: {str(e)}"
             }
-            mdt_report_str = json.dumps(simple_report, indent=2)
-            criteria_str = json.dumps(evaluation_criteria, indent=2)
+            mdt_report_str = json_codec.dumps(simple_report, indent=True)
+            criteria_str = json_codec.dumps(evaluation_criteria, indent=True)
         
         return {
             "context": f"MDT Report:\n{mdt_report_str}\n\nEvaluation Criteria:\n{criteria_str}",
@@ -126,127 +127,49 @@ class EvaluationAgent(BaseSpecializedAgent):
                     "strengths, weaknesses, and any missing elements that should be addressed."
         }
     
-    def _structure_output(self, llm_output: str) -> Dict[str, Any]:
+    def _structure_output(self, llm_output: Union[str, AgentOutput]) -> Dict[str, Any]:
         """Structure the LLM output into a standardized format.
         
-        Attempts to parse the LLM output into a structured evaluation format.
-        If parsing fails, returns a basic structure with the raw output.
+        Parses the evaluation with the single-pass evaluation parser. Strengths and
+        areas for improvement fall back to keyword matches, then to placeholders.
         
         Args:
-            llm_output: The raw output from the LLM
+            llm_output: The raw output from the LLM, or its parsed form
             
         Returns:
             A structured dictionary with the evaluation results
         """
+        text = llm_output.markdown_content if isinstance(llm_output, AgentOutput) else llm_output
         try:
-            # Default structure for evaluation output
+            evaluation = parse_evaluation(text)
             structured_output = {
-                "score": 0.0,
-                "comments": "",
-                "strengths": [],
-                "areas_for_improvement": [],
-                "missing_elements": []
+                "score": evaluation.score if evaluation.score is not None else 0.0,
+                "score_label": evaluation.score_label,
+                "criteria_scores": evaluation.criteria_scores(),
+                "comments": evaluation.comments,
+                "strengths": evaluation.strengths,
+                "areas_for_improvement": evaluation.areas_for_improvement,
+                "missing_elements": evaluation.missing_elements
             }
             
-            # Parse the LLM output for evaluation data
-            lines = llm_output.split('\n')
-            current_section = None
-            
-            # First, try to extract the score - look for overall score
-            overall_score = None
-            for line in lines:
-                line = line.strip()
-                # Look for patterns like "Overall Quality Score: 0.85" or "Score: 0.9"
-                if (("overall" in line.lower() and "score" in line.lower()) or 
-                    line.lower().startswith("score:")) and ":" in line:
-                    score_text = line.split(":", 1)[1].strip()
-                    try:
-                        # Extract number from text like "0.85" or "85%" or "Score: 0.85/1.0"
-                        score_parts = score_text.replace("/1.0", "").replace("/1", "").replace("%", "").strip()
-                        score_value = float(score_parts)
-                        # If percentage, convert to decimal
-                        if score_value > 1.0:
-                            score_value /= 100
-                        overall_score = round(score_value, 2)
-                        # Ensure score is between 0 and 1
-                        if overall_score < 0:
-                            overall_score = 0.0
-                        elif overall_score > 1:
-                            overall_score = 1.0
-                        break
-                    except ValueError:
-                        logger.warning(f"Could not parse overall score from text: {score_text}")
-                        continue
-            
-            # If overall score was found, use it
-            if overall_score is not None:
-                structured_output["score"] = overall_score
-            
-            # Process the output by sections
-            for line in lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Detect section changes
-                lower_line = line.lower()
-                if "strength" in lower_line and (":" in line or line.endswith("strengths")):
-                    current_section = "strengths"
-                    continue
-                elif any(x in lower_line for x in ["area", "improvement", "weakness"]) and (":" in line or line.endswith("improvements")):
-                    current_section = "areas_for_improvement"
-                    continue
-                elif "missing" in lower_line and (":" in line or line.endswith("elements")):
-                    current_section = "missing_elements"
-                    continue
-                elif "comment" in lower_line and ":" in line:
-                    current_section = "comments"
-                    structured_output["comments"] = line.split(":", 1)[1].strip()
-                    continue
-                
-                # Add content to the current section
-                if current_section == "strengths" and line and not line.endswith(":"):
-                    structured_output["strengths"].append(line)
-                elif current_section == "areas_for_improvement" and line and not line.endswith(":"):
-                    structured_output["areas_for_improvement"].append(line)
-                elif current_section == "missing_elements" and line and not line.endswith(":"):
-                    structured_output["missing_elements"].append(line)
-                elif current_section == "comments" and line and not line.endswith(":"):
-                    structured_output["comments"] += " " + line
-            
             # If we couldn't extract specific comments but have the overall output
             if not structured_output["comments"]:
-                structured_output["comments"] = llm_output[:200] + "..." if len(llm_output) > 200 else llm_output
+                structured_output["comments"] = text[:200] + "..." if len(text) > 200 else text
             
-            # Ensure we have at least one strength if none were identified
             if not structured_output["strengths"]:
-                for line in lines:
-                    if len(line) > 10 and any(term in line.lower() for term in ["thorough", "comprehensive", "good", "excellent", "well"]):
-                        if not line.endswith(":") and ":" not in line:
-                            structured_output["strengths"].append(line)
-                            if len(structured_output["strengths"]) >= 2:
-                                break
-            
-            # Still no strengths - add a placeholder
-            if not structured_output["strengths"]:
-                structured_output["strengths"] = ["The report provides a structured analysis of the patient case."]
-            
-            # Ensure we have at least one area for improvement
-            if not structured_output["areas_for_improvement"]:
-                for line in lines:
-                    if len(line) > 10 and any(term in line.lower() for term in ["could", "should", "missing", "lacks", "improve"]):
-                        if not line.endswith(":") and ":" not in line:
-                            structured_output["areas_for_improvement"].append(line)
-                            if len(structured_output["areas_for_improvement"]) >= 2:
-                                break
-            
-            # Still no areas for improvement - add a placeholder
+                structured_output["strengths"] = (
+                    _keyword_lines(text, _STRENGTH_TERMS)
+                    or ["The report provides a structured analysis of the patient case."]
+                )
             if not structured_output["areas_for_improvement"]:
-                structured_output["areas_for_improvement"] = ["Consider providing more detailed treatment rationale."]
+                structured_output["areas_for_improvement"] = (
+                    _keyword_lines(text, _IMPROVEMENT_TERMS)
+                    or ["Consider providing more detailed treatment rationale."]
+                )
             
             # Create a formatted evaluation summary for display
-            strengths_text = "\n- " + "\n- ".join(structured_output["strengths"][:3]) if structured_output["strengths"] else ""
-            improvements_text = "\n- " + "\n- ".join(structured_output["areas_for_improvement"][:3]) if structured_output["areas_for_improvement"] else ""
+            strengths_text = "\n- " + "\n- ".join(structured_output["strengths"][:3])
+            improvements_text = "\n- " + "\n- ".join(structured_output["areas_for_improvement"][:3])
             
             structured_output["evaluation_formatted"] = (
                 f"Overall Score: {structured_output['score']:.2f}\n\n"
@@ -262,9 +185,21 @@ class EvaluationAgent(BaseSpecializedAgent):
             return {
                 "score": 0.75,  # Default score
                 "comments": "Evaluation completed with parsing limitations. See raw output for details.",
-                "raw_output": llm_output,
+                "raw_output": text,
                 "strengths": ["See raw output for identified strengths"],
                 "areas_for_improvement": ["See raw output for areas of improvement"],
                 "evaluation_formatted": "Overall Score: 0.75\n\nEvaluation completed with parsing limitations.",
                 "processing_error": str(e)
-            } 
\ No newline at end of file
+            }
+
+
+def _keyword_lines(text: str, terms: "re.Pattern[str]", limit: int = 2) -> List[str]:
+    """Return up to ``limit`` free-text lines mentioning one of ``terms``."""
+    found = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if len(line) > 10 and ":" not in line and terms.search(line):
+            found.append(line)
+            if len(found) >= limit:
+                break
+    return found
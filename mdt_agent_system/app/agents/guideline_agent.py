@@ -1,14 +1,12 @@
-import json
 import logging
 from typing import Dict, Any, List, Optional
 
-from langchain.tools import StructuredTool
-from langchain_core.runnables import ConfigurableField, RunnableConfig
-
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService
 from mdt_agent_system.app.core.logging import get_logger
+from mdt_agent_system.app.core.output_parser import parse_markdown_outline
 from mdt_agent_system.app.agents.base_agent import BaseSpecializedAgent
 from mdt_agent_system.app.core.tools import ToolRegistry, GuidelineReferenceTool
 
@@ -25,6 +23,8 @@ class GuidelineAgent(BaseSpecializedAgent):
     5. Integrating multiple guideline sources
     """
     
+    tool_names = ["guideline_reference"]
+    
     def __init__(self, run_id: str, status_service: StatusUpdateService, callbacks=None):
         """Initialize the Guideline Agent.
         
@@ -79,7 +79,7 @@ class GuidelineAgent(BaseSpecializedAgent):
         
         # Convert to JSON string with indentation for better LLM processing
         try:
-            context_str = json.dumps(guideline_context, indent=2)
+            context_str = json_codec.dumps(guideline_context, indent=True)
         except Exception as e:
             logger.error(f"Error serializing guideline context: {str(e)}")
             # Fallback serialization with simpler data
@@ -87,7 +87,7 @@ class GuidelineAgent(BaseSpecializedAgent):
                 "current_condition": str(patient_case.current_condition),
                 "ehr_summary": str(context.get("ehr_analysis", {}).get("patient_summary", ""))
             }
-            context_str = json.dumps(simple_context, indent=2)
+            context_str = json_codec.dumps(simple_context, indent=True)
         
         return {
             "context": context_str,
@@ -114,57 +114,6 @@ class GuidelineAgent(BaseSpecializedAgent):
             )
         }
     
-    async def _run_analysis(self, input_data: Dict[str, Any]) -> str:
-        """Run the LLM analysis with the prepared input, including tool access.
-        
-        This overrides the base class method to add tool handling.
-        
-        Args:
-            input_data: The prepared input data
-            
-        Returns:
-            The LLM's response as a string
-        """
-        # Configure the LLM run with callbacks
-        config = RunnableConfig(
-            callbacks=self.callbacks,
-            run_name=f"{self.agent_id}_analysis"
-        )
-        
-        # Format the prompt with input data
-        prompt = self.prompt_template.format_messages(
-            context=input_data.get("context", ""),
-            task=input_data.get("task", "Analyze the patient case in relation to guidelines")
-        )
-        
-        # Get the guideline tool from registry
-        guideline_tool = ToolRegistry.get_tool("guideline_reference")
-        if not guideline_tool:
-            logger.warning(f"Guideline reference tool not found in registry")
-            # Proceed without tool
-            response = await self.llm.ainvoke(prompt, config=config)
-            return response.content
-        
-        # Create a structured tool for LangChain use
-        structured_tool = StructuredTool.from_function(
-            func=guideline_tool._run,
-            name=guideline_tool.name,
-            description=guideline_tool.description
-        )
-        
-        # Bind the tool to the LLM
-        llm_with_tools = self.llm.bind_tools([structured_tool])
-        
-        # Invoke LLM with tools 
-        try:
-            response = await llm_with_tools.ainvoke(prompt, config=config)
-            return response.content
-        except Exception as e:
-            logger.error(f"Error in guideline agent tool-using LLM call: {str(e)}")
-            # Fallback to regular LLM call if tool usage fails
-            response = await self.llm.ainvoke(prompt, config=config)
-            return response.content + "\n\nNote: Tool usage was attempted but failed."
-    
     def _structure_output(self, parsed_output: AgentOutput) -> Dict[str, Any]:
         """Structure the parsed output into a standardized format.
         
@@ -188,76 +137,40 @@ class GuidelineAgent(BaseSpecializedAgent):
             # Define section mapping with multiple possible headers for each section
             section_mapping = {
                 "disease_characteristics": [
-                    "## Disease Characteristics",
-                    "## Disease Status",
-                    "## Clinical Characteristics"
+                    "Disease Characteristics",
+                    "Disease Status",
+                    "Clinical Characteristics"
                 ],
                 "treatment_recommendations": [
-                    "## Treatment Guidelines",
-                    "## Treatment Recommendations",
-                    "## Therapeutic Approach"
+                    "Treatment Guidelines",
+                    "Treatment Recommendations",
+                    "Therapeutic Approach"
                 ],
                 "special_considerations": [
-                    "## Special Considerations",
-                    "## Patient-Specific Factors",
-                    "## Additional Considerations"
+                    "Special Considerations",
+                    "Patient-Specific Factors",
+                    "Additional Considerations"
                 ],
                 "evidence_levels": [
-                    "## Evidence Level",
-                    "## Evidence Levels",
-                    "## Evidence Grading"
+                    "Evidence Level",
+                    "Evidence Levels",
+                    "Evidence Grading"
                 ]
             }
 
-            # Extract content from markdown sections
-            lines = parsed_output.markdown_content.split('\n')
-            current_section = None
-            current_subsection = None
-            section_content = []
-            subsection_content = {}
-
-            for line in lines:
-                line_stripped = line.strip()
-                if not line_stripped:
-                    continue
-
-                # Check if this line starts a new section
-                found_section = False
-                for section_key, headers in section_mapping.items():
-                    if any(line_stripped.startswith(header) for header in headers):
-                        # Save content from previous section if it exists
-                        if current_section:
-                            if current_subsection and subsection_content:
-                                section_content.extend(self._format_subsections(subsection_content))
-                            structured_output[current_section] = self._clean_section_content(section_content)
-                        # Start new section
-                        current_section = section_key
-                        section_content = []
-                        subsection_content = {}
-                        current_subsection = None
-                        found_section = True
-                        break
-
-                # Check for subsection headers (###)
-                if not found_section and line_stripped.startswith('### '):
-                    if current_subsection and subsection_content.get(current_subsection):
-                        section_content.extend(self._format_subsections({current_subsection: subsection_content[current_subsection]}))
-                    current_subsection = line_stripped[4:].strip()
-                    subsection_content[current_subsection] = []
+            # Extract content from markdown sections, formatting nested subsections
+            outline = parse_markdown_outline(parsed_output.markdown_content)
+            for section_key, headers in section_mapping.items():
+                section = outline.find(*headers, level=2)
+                if section is None:
                     continue
-
-                # Add content to appropriate section/subsection
-                if current_section:
-                    if current_subsection:
-                        subsection_content[current_subsection].append(line_stripped)
-                    else:
-                        section_content.append(line_stripped)
-
-            # Save the last section
-            if current_section:
-                if current_subsection and subsection_content:
-                    section_content.extend(self._format_subsections(subsection_content))
-                structured_output[current_section] = self._clean_section_content(section_content)
+                section_content = section.body.split('\n')
+                subsection_content = {
+                    sub.title: [line for line in sub.body.split('\n') if line.strip()]
+                    for sub in outline.subsections(section)
+                }
+                section_content.extend(self._format_subsections(subsection_content))
+                structured_output[section_key] = self._clean_section_content(section_content)
 
             # Extract additional information from metadata
             if parsed_output.metadata:
@@ -1,11 +1,12 @@
-import json
 import logging
 from typing import Dict, Any, List, Optional
 
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService
 from mdt_agent_system.app.core.logging import get_logger
+from mdt_agent_system.app.core.output_parser import parse_markdown_outline
 from mdt_agent_system.app.agents.base_agent import BaseSpecializedAgent
 
 logger = get_logger(__name__)
@@ -68,18 +69,10 @@ class ImagingAgent(BaseSpecializedAgent):
             else:
                 imaging_context["ehr_context"] = context["ehr_analysis"]
         
-        # Convert to JSON string with indentation for better LLM processing
-        # Use a custom JSON encoder to handle datetime objects and other special types
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if hasattr(obj, "dict") and callable(obj.dict):
-                    return obj.dict()
-                if hasattr(obj, "__dict__"):
-                    return obj.__dict__
-                return str(obj)  # Convert any other objects to string
-        
+        # Convert to JSON string with indentation for better LLM processing;
+        # the codec handles datetime objects and other special types
         try:
-            context_str = json.dumps(imaging_context, indent=2, cls=CustomJSONEncoder)
+            context_str = json_codec.dumps(imaging_context, indent=True)
         except Exception as e:
             logger.error(f"Error serializing imaging context: {str(e)}")
             # Fallback serialization with simpler data
@@ -87,7 +80,7 @@ class ImagingAgent(BaseSpecializedAgent):
                 "patient_id": str(imaging_context.get("patient_id", "")),
                 "current_condition": str(imaging_context.get("current_condition", ""))
             }
-            context_str = json.dumps(simple_context, indent=2)
+            context_str = json_codec.dumps(simple_context, indent=True)
         
         return {
             "context": context_str,
@@ -154,60 +147,33 @@ class ImagingAgent(BaseSpecializedAgent):
                 structured_output["summary"] = " ".join(key_findings[:2])  # Use first two findings as summary
         
         # Extract sections from markdown content as fallback
+        outline = parse_markdown_outline(parsed_output.markdown_content)
         if not structured_output["summary"]:
-            lines = parsed_output.markdown_content.split('\n')
-            for line in lines:
-                if "# Clinical Findings" in line or "## Primary Disease" in line:
-                    next_idx = lines.index(line) + 1
-                    if next_idx < len(lines):
-                        structured_output["summary"] = lines[next_idx].strip('- ')
-                        break
+            section = outline.find("Clinical Findings", "Primary Disease")
+            if section is not None:
+                structured_output["summary"] = section.first_line.strip('- ')
         
         # Extract disease extent from markdown
-        disease_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Disease Extent" in line:
-                disease_section = True
-                continue
-            if disease_section and line.strip() and line.startswith('- '):
-                content = line.strip('- ')
-                if "primary" in content.lower() or "tumor" in content.lower():
-                    structured_output["disease_extent"]["primary_tumor"] = content
-                elif "node" in content.lower() or "lymph" in content.lower():
-                    structured_output["disease_extent"]["nodal_status"] = content
-                elif "metasta" in content.lower() or "distant" in content.lower():
-                    structured_output["disease_extent"]["metastatic_status"] = content
+        for content in outline.bullets("Disease Extent", include_subsections=True):
+            if "primary" in content.lower() or "tumor" in content.lower():
+                structured_output["disease_extent"]["primary_tumor"] = content
+            elif "node" in content.lower() or "lymph" in content.lower():
+                structured_output["disease_extent"]["nodal_status"] = content
+            elif "metasta" in content.lower() or "distant" in content.lower():
+                structured_output["disease_extent"]["metastatic_status"] = content
         
         # Extract staging from markdown
-        staging_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "# Staging Assessment" in line or "## Staging Assessment" in line:
-                staging_section = True
-                continue
-            if staging_section and line.strip():
-                if line.startswith('#'):  # Exit if we hit another section
-                    staging_section = False
-                    continue
-                if line.startswith('- '):
-                    content = line.strip('- ').strip()
-                    if "stage:" in content.lower() or "clinical stage:" in content.lower():
-                        # Extract the actual stage value after the colon
-                        stage_parts = content.split(':')
-                        if len(stage_parts) > 1:
-                            structured_output["staging"]["clinical_stage"] = stage_parts[1].strip()
-                        else:
-                            structured_output["staging"]["clinical_stage"] = content
-                    else:
-                        structured_output["staging"]["key_findings"].append(content)
+        for content in outline.bullets("Staging Assessment"):
+            if "stage:" in content.lower():
+                # Extract the actual stage value after the colon
+                structured_output["staging"]["clinical_stage"] = content.split(':', 1)[1].strip()
+            else:
+                structured_output["staging"]["key_findings"].append(content)
         
         # Extract treatment implications from markdown
-        implications_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Clinical Correlation" in line:
-                implications_section = True
-                continue
-            if implications_section and line.strip() and line.startswith('- '):
-                structured_output["treatment_implications"].append(line.strip('- '))
+        structured_output["treatment_implications"].extend(
+            outline.bullets("Clinical Correlation", include_subsections=True)
+        )
         
         # Ensure we have at least some basic content in required fields
         if not structured_output["summary"]:
@@ -1,7 +1,7 @@
-import json
 import logging
 from typing import Dict, Any, List, Optional, Union
 
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService
@@ -67,18 +67,10 @@ class PathologyAgent(BaseSpecializedAgent):
             if "imaging_analysis" in context:
                 pathology_context["imaging_context"] = context["imaging_analysis"]
         
-        # Convert to JSON string with indentation for better LLM processing
-        # Use a custom JSON encoder to handle datetime objects and other special types
-        class CustomJSONEncoder(json.JSONEncoder):
-            def default(self, obj):
-                if hasattr(obj, "dict") and callable(obj.dict):
-                    return obj.dict()
-                if hasattr(obj, "__dict__"):
-                    return obj.__dict__
-                return str(obj)  # Convert any other objects to string
-        
+        # Convert to JSON string with indentation for better LLM processing;
+        # the codec handles datetime objects and other special types
         try:
-            context_str = json.dumps(pathology_context, indent=2, cls=CustomJSONEncoder)
+            context_str = json_codec.dumps(pathology_context, indent=True)
         except Exception as e:
             logger.error(f"Error serializing pathology context: {str(e)}")
             # Fallback serialization with simpler data
@@ -86,7 +78,7 @@ class PathologyAgent(BaseSpecializedAgent):
                 "patient_id": str(pathology_context.get("patient_id", "")),
                 "current_condition": str(pathology_context.get("current_condition", ""))
             }
-            context_str = json.dumps(simple_context, indent=2)
+            context_str = json_codec.dumps(simple_context, indent=True)
         
         return {
             "context": context_str,
@@ -164,24 +156,15 @@ class PathologyAgent(BaseSpecializedAgent):
                     "metadata": llm_output.metadata
                 }
             
-            # Handle string input
-            # Split on markdown and metadata sections
-            parts = llm_output.split("---MARKDOWN---")
-            if len(parts) != 2:
+            # Handle string input; delimited output goes through the shared parser
+            if self.output_parser.MARKDOWN_DELIMITER not in llm_output:
                 # If not in correct format, create structured markdown
                 markdown_content = self._create_structured_markdown(llm_output)
                 metadata = self._extract_metadata(llm_output)
             else:
-                markdown_and_metadata = parts[1].split("---METADATA---")
-                if len(markdown_and_metadata) != 2:
-                    markdown_content = markdown_and_metadata[0].strip()
-                    metadata = self._extract_metadata(llm_output)
-                else:
-                    markdown_content = markdown_and_metadata[0].strip()
-                    try:
-                        metadata = json.loads(markdown_and_metadata[1].strip())
-                    except:
-                        metadata = self._extract_metadata(llm_output)
+                parsed_output = self.output_parser.parse_llm_output(llm_output)
+                markdown_content = parsed_output.markdown_content
+                metadata = parsed_output.metadata or self._extract_metadata(llm_output)
             
             return {
                 "markdown_content": markdown_content,
@@ -1,11 +1,13 @@
-import json
 import logging
 from typing import Dict, Any, List, Optional
 
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService
 from mdt_agent_system.app.core.logging import get_logger
+from mdt_agent_system.app.core.output_parser import parse_markdown_outline
+from mdt_agent_system.app.core.tools import ToolRegistry
 from mdt_agent_system.app.agents.base_agent import BaseSpecializedAgent
 
 logger = get_logger(__name__)
@@ -40,6 +42,17 @@ class SpecialistAgent(BaseSpecializedAgent):
         """Return the agent type for prompt template selection."""
         return "specialist"
     
+    async def process(self, patient_case: PatientCase, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Check drug interactions through the tool executor, then run the analysis.
+        
+        The interaction matrix runs SQLite and NumPy work, so it is awaited here
+        rather than called from the synchronous ``_prepare_input``.
+        """
+        drug_interactions = await self._check_drug_interactions(patient_case)
+        if drug_interactions:
+            context = {**(context or {}), "drug_interactions": drug_interactions}
+        return await super().process(patient_case, context)
+    
     def _prepare_input(self, patient_case: PatientCase, context: Dict[str, Any]) -> Dict[str, Any]:
         """Prepare input for the Specialist agent's analysis.
         
@@ -72,8 +85,11 @@ class SpecialistAgent(BaseSpecializedAgent):
             if "guideline_recommendations" in context:
                 specialist_context["guideline_recommendations"] = context["guideline_recommendations"]
         
+            if context.get("drug_interactions"):
+                specialist_context["drug_interactions"] = context["drug_interactions"]
+        
         # Convert to JSON string with indentation for better LLM processing
-        context_str = json.dumps(specialist_context, indent=2)
+        context_str = json_codec.dumps(specialist_context, indent=True)
         
         return {
             "context": context_str,
@@ -86,6 +102,7 @@ class SpecialistAgent(BaseSpecializedAgent):
                 "2. Treatment Planning\n"
                 "   - Consider all therapeutic options\n"
                 "   - Evaluate risk-benefit ratios\n"
+                "   - Account for any flagged drug interactions\n"
                 "   - Account for patient preferences\n\n"
                 "3. Evidence Integration\n"
                 "   - Apply current clinical guidelines\n"
@@ -94,6 +111,29 @@ class SpecialistAgent(BaseSpecializedAgent):
             )
         }
     
+    async def _check_drug_interactions(self, patient_case: PatientCase) -> Optional[Dict[str, Any]]:
+        """Run the interaction matrix over the patient's medications.
+        
+        Args:
+            patient_case: The patient case data
+            
+        Returns:
+            Resolved drugs and flagged pairs, or None when no known drug was found
+        """
+        try:
+            result = await ToolRegistry.get_tool("drug_interaction_matrix")._arun(patient_case=patient_case)
+        except Exception as e:
+            logger.warning(f"Drug interaction check failed: {str(e)}")
+            return None
+        
+        if result.get("status") != "success" or not result.get("drug_ids"):
+            return None
+        return {
+            "drugs": result["drug_ids"],
+            "unmatched_medications": result["unmatched"],
+            "flagged_pairs": result["flagged_pairs"]
+        }
+    
     def _structure_output(self, parsed_output: AgentOutput) -> Dict[str, Any]:
         """Structure the parsed output into a standardized format.
         
@@ -134,32 +174,19 @@ class SpecialistAgent(BaseSpecializedAgent):
                 structured_output["risk_assessment"] = f"Case complexity: {risk_level}, Urgency: {urgency}"
         
         # Extract sections from markdown content as fallback
+        outline = parse_markdown_outline(parsed_output.markdown_content)
         if not structured_output["overall_assessment"]:
-            lines = parsed_output.markdown_content.split('\n')
-            for line in lines:
-                if "# Clinical Assessment" in line or "## Disease Status" in line:
-                    next_idx = lines.index(line) + 1
-                    if next_idx < len(lines):
-                        structured_output["overall_assessment"] = lines[next_idx].strip('- ')
-                        break
-        
-        # Extract treatment considerations from markdown
-        treatment_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Treatment Recommendations" in line:
-                treatment_section = True
-                continue
-            if treatment_section and line.strip() and line.startswith('- '):
-                structured_output["treatment_considerations"].append(line.strip('- '))
-        
-        # Extract follow-up recommendations from markdown
-        followup_section = False
-        for line in parsed_output.markdown_content.split('\n'):
-            if "## Follow-up Plan" in line:
-                followup_section = True
-                continue
-            if followup_section and line.strip() and line.startswith('- '):
-                structured_output["follow_up_recommendations"].append(line.strip('- '))
+            section = outline.find("Clinical Assessment", "Disease Status")
+            if section is not None:
+                structured_output["overall_assessment"] = section.first_line.strip('- ')
+        
+        # Extract treatment considerations and follow-up recommendations from markdown
+        structured_output["treatment_considerations"].extend(
+            outline.bullets("Treatment Recommendations", include_subsections=True)
+        )
+        structured_output["follow_up_recommendations"].extend(
+            outline.bullets("Follow-up Plan", include_subsections=True)
+        )
         
         # Ensure we have at least some basic content in required fields
         if not structured_output["overall_assessment"]:
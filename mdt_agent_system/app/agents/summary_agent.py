@@ -1,8 +1,8 @@
-import json
 from typing import Dict, Any, Union
 
 # Assuming schemas are in the correct path relative to this file
 # Adjust imports if necessary based on your project structure
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.status import StatusUpdateService
 from mdt_agent_system.app.core.logging import get_logger
@@ -37,17 +37,9 @@ class SummaryAgent(BaseSpecializedAgent):
         """Convert complete MDT report data to LLM-friendly input for summarization"""
         logger.debug(f"Preparing input for SummaryAgent. Context keys: {list(context.keys())}")
         
-        serializable_context = {}
-        for key, value in context.items():
-            try:
-                json.dumps(value) 
-                serializable_context[key] = value
-            except (TypeError, OverflowError):
-                logger.warning(f"Could not serialize context key '{key}', using string representation.")
-                serializable_context[key] = str(value)
-
-        # Create a string representation of the context for the LLM.
-        context_str = json.dumps(serializable_context, indent=2, default=str)
+        # Create a string representation of the context for the LLM; values JSON
+        # cannot represent are converted by the codec instead of failing.
+        context_str = json_codec.dumps(context, indent=True)
         
         # Define the task for the prompt template
         return {
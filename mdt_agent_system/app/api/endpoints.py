@@ -1,16 +1,32 @@
-from fastapi import APIRouter, UploadFile, File, Depends, Request, Header
+from fastapi import APIRouter, UploadFile, File, Depends, Request, Header, Query
 from fastapi import HTTPException, BackgroundTasks, status
 from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect
 from sse_starlette.sse import EventSourceResponse, ServerSentEvent
 from pydantic import ValidationError
 import uuid
-import json
 import logging
 import asyncio # Added for sleep in SSE stream
 import os # For log file path
-from typing import List, Optional
+from typing import List, Optional, Set
 from datetime import datetime
 
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.ingest import (
+    CaseTooLargeError,
+    InvalidCaseJSONError,
+    format_validation_errors,
+    iter_ndjson_lines,
+    max_upload_bytes,
+    parse_patient_case,
+    read_limited,
+)
+from mdt_agent_system.app.core.run_dedupe import (
+    MAX_IDEMPOTENCY_KEY_LENGTH,
+    IdempotencyKeyConflictError,
+    get_run_deduplicator,
+)
+from mdt_agent_system.app.core.run_limits import get_run_limiter
 from mdt_agent_system.app.core.schemas.common import PatientCase, StatusUpdate
 # Import the actual status service instance getter
 from mdt_agent_system.app.core.status.service import StatusUpdateService, get_status_service
@@ -21,15 +37,24 @@ from mdt_agent_system.app.core.logging.logger import run_id_context
 # Import the main simulation runner from the coordinator
 from mdt_agent_system.app.agents.coordinator import run_mdt_simulation
 from mdt_agent_system.app.core.samples.patient_case import get_sample_case
+from mdt_agent_system.app.core.tools import tool_cache_stats
+from mdt_agent_system.app.core.output_parser import metadata_repair_stats
+from mdt_agent_system.app.core.samples.prompts import get_prompt_registry
+from mdt_agent_system.app.core.memory.retention import report_file_path
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Placeholder function for the actual simulation logic
-async def run_simulation_background(run_id: str, patient_case: PatientCase):
+async def run_simulation_background(run_id: str, patient_case: PatientCase, admitted: bool = False):
     """Runs the agent simulation in the background.
     Sets the run_id context for logging and calls the coordinator.
+    Waits for a run slot unless the caller already ``admitted`` the run,
+    and frees the slot when the run ends.
     """
+    limiter = get_run_limiter()
+    if not admitted:
+        await limiter.acquire()
     # Set the run_id in the context for this task's execution
     token = run_id_context.set(run_id)
     logger.info(f"Starting background simulation.") # run_id should be logged automatically now
@@ -50,6 +75,8 @@ async def run_simulation_background(run_id: str, patient_case: PatientCase):
         # This block catches potential errors *outside* the coordinator's main try/except
         # or if the coordinator re-raises an exception.
         logger.error(f"Unhandled exception caught in background task runner for run_id: {run_id}: {e}", exc_info=True)
+        # A retry of the same submission should start over rather than attach to this run
+        get_run_deduplicator().forget(run_id)
         # Ensure an error status is emitted if the coordinator failed to do so
         try:
             await status_service.emit_status_update(
@@ -74,40 +101,72 @@ async def run_simulation_background(run_id: str, patient_case: PatientCase):
         finally:
              # Reset the context variable to its previous state regardless of cleanup success
             run_id_context.reset(token)
+            limiter.release()
+
+
+async def _emit_received(status_service: StatusUpdateService, run_id: str) -> None:
+    """Emit the initial ACTIVE status of an accepted run; failures are only logged."""
+    try:
+        # Pass data as dict to the modified emit_status_update
+        await status_service.emit_status_update(
+            run_id=run_id,
+            status_update_data={ # Pass data as dict
+                "agent_id": "API",
+                "status": "ACTIVE", # Changed from RECEIVED
+                "message": "Simulation request received and validated."
+            }
+        )
+        logger.info(f"Emitted initial ACTIVE status for run_id: {run_id}")
+    except Exception as e:
+        # Log error but don't fail the request if status emission fails initially
+        logger.error(f"Failed to emit initial status update for run_id {run_id}: {e}", exc_info=True)
 
 
 @router.post("/simulate", tags=["Simulation"], status_code=status.HTTP_202_ACCEPTED)
 async def simulate_mdt(
     background_tasks: BackgroundTasks, 
     file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(None),
     status_service: StatusUpdateService = Depends(get_status_service)
 ):
     """
     Endpoint to start the MDT simulation process.
     Accepts a JSON file representing the PatientCase.
     Validates the input and returns a run_id for tracking the simulation.
-    Starts the simulation as a background task.
+    Starts the simulation as a background task, unless the request repeats an
+    earlier ``Idempotency-Key`` or (within ``CASE_DEDUPE_WINDOW_MINUTES``) an
+    identical case, in which case the earlier run_id is returned.
     """
     run_id = str(uuid.uuid4())
     logger.info(f"Received simulation request. Generated run_id: {run_id}")
 
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key must be 1 to {MAX_IDEMPOTENCY_KEY_LENGTH} characters.",
+        )
+
     if file.content_type != "application/json":
         logger.error(f"Invalid file type received: {file.content_type}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid file type. Only JSON is accepted.")
 
     try:
-        contents = await file.read()
-        file_data = json.loads(contents)
-        patient_case = PatientCase(**file_data)
+        # Bytes are validated straight into the model, within the size and list limits
+        contents = await read_limited(file)
+        patient_case = parse_patient_case(contents)
         logger.info(f"PatientCase validated successfully for run_id: {run_id}")
-    except json.JSONDecodeError:
-        logger.error(f"Failed to decode JSON for run_id: {run_id}", exc_info=True)
+    except CaseTooLargeError as e:
+        logger.error(f"Patient case upload too large for run_id: {run_id}")
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    except InvalidCaseJSONError as e:
+        logger.error(f"Failed to decode JSON for run_id: {run_id}: {e}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON file.")
     except ValidationError as e:
-        logger.error(f"PatientCase validation failed for run_id: {run_id}: {e}")
+        errors = format_validation_errors(e)
+        logger.error(f"PatientCase validation failed for run_id: {run_id}: {errors}")
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            detail=f"PatientCase validation failed: {e.errors()}",
+            detail=f"PatientCase validation failed: {errors}",
         )
     except Exception as e:
         logger.exception(f"An unexpected error occurred during file processing for run_id: {run_id}")
@@ -115,27 +174,106 @@ async def simulate_mdt(
     finally:
         await file.close()
 
+    try:
+        claimed_run_id = get_run_deduplicator().claim(run_id, patient_case, idempotency_key)
+    except IdempotencyKeyConflictError as e:
+        logger.error(f"Idempotency-Key reused for a different case; it belongs to run_id: {e.run_id}")
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if claimed_run_id != run_id:
+        # Status events are cleared when a run ends, so a finished run is only reachable through its report
+        completed = report_file_path(claimed_run_id).exists()
+        logger.info(f"Duplicate submission attached to existing run_id: {claimed_run_id} (completed: {completed})")
+        return {
+            "run_id": claimed_run_id,
+            "message": (
+                "Identical simulation request already completed; its report is available."
+                if completed else
+                "Identical simulation request already accepted; attached to the existing run."
+            ),
+            "deduplicated": True,
+            "completed": completed,
+        }
+
     # Start the simulation in the background
     background_tasks.add_task(run_simulation_background, run_id, patient_case)
     logger.info(f"Simulation background task added for run_id: {run_id}")
 
     # Emit initial status update
-    try:
-        # Pass data as dict to the modified emit_status_update
-        await status_service.emit_status_update(
-            run_id=run_id,
-            status_update_data={ # Pass data as dict
-                "agent_id": "API",
-                "status": "ACTIVE", # Changed from RECEIVED
-                "message": "Simulation request received and validated."
-            }
-        )
-        logger.info(f"Emitted initial ACTIVE status for run_id: {run_id}")
-    except Exception as e:
-        # Log error but don't fail the request if status emission fails initially
-        logger.error(f"Failed to emit initial status update for run_id {run_id}: {e}", exc_info=True)
+    await _emit_received(status_service, run_id)
+
+    return {"run_id": run_id, "message": "Simulation request accepted and is being processed.", "deduplicated": False, "completed": False}
+
+
+# Content types accepted for batch uploads
+NDJSON_MEDIA_TYPES = frozenset({"application/x-ndjson", "application/ndjson", "application/jsonl", "application/x-jsonlines"})
+
+# Batch runs are plain tasks, since they start while the response is still streaming
+_batch_tasks: Set[asyncio.Task] = set()
+
+
+class _RequestStreamingResponse(StreamingResponse):
+    """StreamingResponse whose content reads the request body while streaming.
+
+    Starlette's disconnect listener would consume the body messages, so it is
+    left out; a client that goes away surfaces as ``ClientDisconnect`` from the
+    body stream instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/simulate/batch", tags=["Simulation"])
+async def simulate_batch(
+    request: Request,
+    status_service: StatusUpdateService = Depends(get_status_service)
+) -> StreamingResponse:
+    """Start one simulation per line of a streamed NDJSON body of patient cases.
+    
+    Lines are validated as they arrive and each valid case starts a run once
+    a run slot is free (``MAX_CONCURRENT_RUNS``); the body is not read further
+    while waiting. The response streams one NDJSON record per case line:
+    ``{"line": n, "run_id": ...}`` or ``{"line": n, "error": ...}``.
+    """
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in NDJSON_MEDIA_TYPES:
+        logger.error(f"Invalid batch content type received: {media_type}")
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid content type. Only NDJSON is accepted.")
+    limiter = get_run_limiter()
+    max_line_bytes = max_upload_bytes()
+
+    async def admit(number: int, line: Optional[bytes]) -> dict:
+        if line is None:
+            return {"line": number, "error": f"Line exceeds the {max_line_bytes} byte limit."}
+        try:
+            patient_case = parse_patient_case(line)
+        except InvalidCaseJSONError as e:
+            return {"line": number, "error": str(e)}
+        except ValidationError as e:
+            return {"line": number, "error": f"PatientCase validation failed: {format_validation_errors(e)}"}
+        await limiter.acquire()
+        run_id = str(uuid.uuid4())
+        try:
+            await _emit_received(status_service, run_id)
+        except BaseException:
+            limiter.release()
+            raise
+        task = asyncio.create_task(run_simulation_background(run_id, patient_case, admitted=True))
+        _batch_tasks.add(task)
+        task.add_done_callback(_batch_tasks.discard)
+        logger.info(f"Batch line {number} started run_id: {run_id}")
+        return {"line": number, "run_id": run_id}
 
-    return {"run_id": run_id, "message": "Simulation request accepted and is being processed."}
+    async def records():
+        try:
+            async for number, line in iter_ndjson_lines(request.stream(), max_line_bytes):
+                yield json_codec.dumpb(await admit(number, line)) + b"\n"
+        except ClientDisconnect:
+            logger.warning("Client disconnected during batch upload; no further lines are started.")
+
+    return _RequestStreamingResponse(records(), media_type="application/x-ndjson")
 
 
 @router.get("/status/{run_id}/stream")
@@ -143,9 +281,16 @@ async def stream_status(
     run_id: str,
     request: Request,
     last_event_id: Optional[str] = Header(None),
+    replay_from: Optional[str] = Query(None, alias="last_event_id"),
     status_service: StatusUpdateService = Depends(get_status_service)
 ) -> EventSourceResponse:
-    """Stream status updates for a specific run using Server-Sent Events (SSE)."""
+    """Stream status updates for a specific run using Server-Sent Events (SSE).
+
+    The ``last_event_id`` query parameter stands in for the Last-Event-ID header
+    on a first connection, e.g. ``0`` to replay a run already in progress.
+    """
+    if last_event_id is None:
+        last_event_id = replay_from
     logger.info(f"Starting SSE stream for run_id {run_id}, last_event_id: {last_event_id}")
     logger.debug(f"Request headers: {dict(request.headers)}")
     
@@ -170,7 +315,7 @@ async def stream_status(
                 yield {
                     "event": "status_update",
                     "id": str(update.event_id),
-                    "data": json.dumps(event_data)
+                    "data": json_codec.dumps(event_data)
                 }
         except asyncio.CancelledError:
             logger.info(f"SSE connection cancelled for run_id: {run_id}")
@@ -179,7 +324,7 @@ async def stream_status(
             logger.error(f"Error in SSE stream for run_id {run_id}: {e}", exc_info=True)
             yield {
                 "event": "error",
-                "data": json.dumps({
+                "data": json_codec.dumps({
                     "error": str(e),
                     "run_id": run_id
                 })
@@ -223,12 +368,12 @@ async def get_logs(run_id: str):
                 if f'"{run_id}"' in line or f'"{run_id}"' in line: # Check quoted run_id
                     try:
                          # Optional: Try parsing to verify it's valid JSON and contains the run_id field
-                         log_entry = json.loads(line.strip())
+                         log_entry = json_codec.loads(line.strip())
                          if log_entry.get("run_id") == run_id:
                               run_logs.append(line.strip())
                          elif f'"run_id": "{run_id}"' in line: # Fallback for simple string check if parsing fails or run_id not top-level
                              run_logs.append(line.strip())
-                    except json.JSONDecodeError:
+                    except json_codec.JSONDecodeError:
                         # If line isn't valid JSON but contains the run_id string, maybe still include it?
                         if f'"{run_id}"' in line:
                            logger.debug(f"Including non-JSON log line containing run_id {run_id}")
@@ -241,6 +386,26 @@ async def get_logs(run_id: str):
     logger.info(f"Retrieved {len(run_logs)} log entries for run_id: {run_id}")
     return run_logs
 
+@router.get("/metrics/tools", tags=["Observability"], response_model=List[dict])
+async def get_tool_metrics():
+    """Endpoint returning result-cache size and hit-ratio metrics for each tool."""
+    return tool_cache_stats()
+
+@router.get("/metrics/metadata", tags=["Observability"], response_model=dict)
+async def get_metadata_metrics():
+    """Endpoint returning per-agent counts of parsed, repaired and failed metadata blocks."""
+    return metadata_repair_stats()
+
+@router.get("/prompts", tags=["Observability"], response_model=dict)
+async def get_prompt_versions():
+    """Endpoint returning the content hash of the prompt template each agent type uses."""
+    return get_prompt_registry().versions()
+
+@router.post("/prompts/reload", tags=["Observability"], response_model=dict)
+async def reload_prompt_templates():
+    """Endpoint recompiling prompt templates from PROMPT_TEMPLATE_DIR without a restart."""
+    return get_prompt_registry().reload()
+
 @router.get("/state/{run_id}/{agent_id}", tags=["Observability"], response_model=List[str])
 async def get_agent_state(run_id: str, agent_id: str):
     """
@@ -266,13 +431,13 @@ async def get_agent_state(run_id: str, agent_id: str):
                 if run_id_str in line and agent_id_str in line:
                     try:
                         # Optional: Parse JSON for more precise check
-                         log_entry = json.loads(line.strip())
+                         log_entry = json_codec.loads(line.strip())
                          if log_entry.get("run_id") == run_id and log_entry.get("agent_id") == agent_id:
                              agent_logs.append(line.strip())
                          # Fallback check if parsing fails or fields not top-level
                          elif f'"run_id": "{run_id}"' in line and f'"agent_id": "{agent_id}"' in line:
                              agent_logs.append(line.strip())
-                    except json.JSONDecodeError:
+                    except json_codec.JSONDecodeError:
                          # Include non-JSON line if it contains both ID strings
                          if run_id_str in line and agent_id_str in line:
                              logger.debug(f"Including non-JSON log line containing run_id {run_id} and agent_id {agent_id}")
@@ -295,12 +460,12 @@ async def get_report(run_id: str):
     
     try:
         # First, check if the report file exists
-        report_file_path = f"report_{run_id}.json"
+        report_path = report_file_path(run_id)
         
-        if os.path.exists(report_file_path):
+        if report_path.exists():
             logger.info(f"Found report file for run_id: {run_id}")
-            with open(report_file_path, "r") as file:
-                report_data = json.load(file)
+            with open(report_path, "rb") as file:
+                report_data = json_codec.load(file)
                 return report_data
                 
         # If file doesn't exist, check if we have any report in the status service
@@ -0,0 +1,50 @@
+"""Locked, atomic JSON file writes shared by the on-disk stores.
+
+Status updates and agent memories are saved with read-modify-write cycles on
+the event loop while the retention job compacts the same files from a worker
+thread. Every store serializes its cycles on ``path_lock`` and replaces files
+through a temporary sibling, so a reader never sees a truncated file and a
+concurrent compaction cannot be overwritten with stale data.
+"""
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Union
+
+from mdt_agent_system.app.core import json_codec
+
+_locks: Dict[str, threading.RLock] = {}
+_locks_guard = threading.Lock()
+
+
+def path_lock(path: Union[str, Path]) -> threading.RLock:
+    """Return the process-wide re-entrant lock guarding ``path``."""
+    key = os.path.abspath(os.fspath(path))
+    with _locks_guard:
+        lock = _locks.get(key)
+        if lock is None:
+            lock = _locks[key] = threading.RLock()
+        return lock
+
+
+def write_json_atomic(path: Union[str, Path], data: Any, indent: bool = False) -> None:
+    """Write ``data`` as JSON to a temporary file and move it over ``path``.
+
+    Args:
+        path: Destination file
+        data: Value to encode with the shared JSON codec
+        indent: Indent the file with two spaces
+    """
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(json_codec.dumpb(data, indent=indent))
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except FileNotFoundError:
+            pass
+        raise
@@ -0,0 +1,147 @@
+"""Per-agent views of a PatientCase.
+
+Each agent reads only part of the case: imaging needs the imaging results,
+pathology the pathology results and biomarker labs, the guideline review a
+few recent history entries. ``CASE_PROJECTIONS`` declares those views by
+agent type; fields outside a view are emptied before the agent serializes the
+case into its prompt. Projections are cached per run, so each view is built
+once however many times a run's stages ask for it.
+"""
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Hashable, Optional, Tuple
+
+from mdt_agent_system.app.core.schemas import PatientCase
+from mdt_agent_system.app.core.tools.prefetch import BIOMARKER_NAMES
+
+# Dated fields tried in order when ordering history entries from oldest to newest
+_DATE_KEYS = ("date", "diagnosed", "onset", "recorded", "timestamp")
+_LAB_NAME_KEYS = ("test", "name", "marker", "test_name")
+_WORD_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)?")
+# Values given to fields outside a view
+_EMPTY: Dict[str, Any] = {
+    "demographics": {},
+    "medical_history": [],
+    "current_condition": {},
+    "imaging_results": None,
+    "pathology_results": None,
+    "lab_results": None,
+}
+
+
+def history_age_key(entry: Any) -> str:
+    """Sort key ordering history or lab entries by date; undated entries sort first."""
+    if isinstance(entry, dict):
+        for key in _DATE_KEYS:
+            if entry.get(key):
+                return str(entry[key])
+    return ""
+
+
+@dataclass(frozen=True)
+class CaseProjection:
+    """The parts of a PatientCase one agent sees.
+    
+    Attributes:
+        fields: PatientCase fields kept; ``patient_id`` and ``created_at`` are always kept
+        history_limit: Keep only this many most recent medical history entries
+        lab_tests: Keep only lab results whose test name is one of these
+    """
+    fields: FrozenSet[str]
+    history_limit: Optional[int] = None
+    lab_tests: Optional[FrozenSet[str]] = None
+
+    def apply(self, patient_case: PatientCase) -> PatientCase:
+        """Return a copy of ``patient_case`` restricted to this view."""
+        update: Dict[str, Any] = {name: empty for name, empty in _EMPTY.items() if name not in self.fields}
+        if self.history_limit is not None and "medical_history" in self.fields:
+            history = patient_case.medical_history
+            if len(history) > self.history_limit:
+                recent = sorted(range(len(history)), key=lambda i: (history_age_key(history[i]), i))[-self.history_limit:]
+                update["medical_history"] = [history[i] for i in sorted(recent)]
+        if self.lab_tests is not None and "lab_results" in self.fields and patient_case.lab_results:
+            labs = [entry for entry in patient_case.lab_results if _is_lab_test(entry, self.lab_tests)]
+            update["lab_results"] = labs or None
+        return patient_case.model_copy(update=update)
+
+
+def _is_lab_test(entry: Any, tests: FrozenSet[str]) -> bool:
+    if not isinstance(entry, dict):
+        return False
+    for key in _LAB_NAME_KEYS:
+        name = entry.get(key)
+        if isinstance(name, str):
+            name = name.lower()
+            return name in tests or any(word in tests for word in _WORD_RE.findall(name))
+    return False
+
+
+_CASE = frozenset({"demographics", "current_condition"})
+
+CASE_PROJECTIONS: Dict[str, CaseProjection] = {
+    "ehr": CaseProjection(_CASE | {"medical_history", "lab_results"}),
+    "imaging": CaseProjection(_CASE | {"imaging_results"}),
+    "pathology": CaseProjection(_CASE | {"pathology_results", "lab_results"}, lab_tests=BIOMARKER_NAMES),
+    "guideline": CaseProjection(_CASE | {"medical_history"}, history_limit=5),
+    "specialist": CaseProjection(_CASE | {"medical_history"}),
+    "evaluation": CaseProjection(_CASE),
+    "summary": CaseProjection(frozenset()),
+}
+# With the full case in the shared prompt prefix, stage inputs leave it out
+SHARED_CASE_PROJECTION = CaseProjection(frozenset())
+
+
+class ProjectionCache:
+    """Projected cases and other per-case values per run; the oldest runs are dropped past ``max_runs``."""
+
+    def __init__(self, max_runs: int = 256):
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, Dict[Hashable, Tuple[PatientCase, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, run_id: str, patient_case: PatientCase, projection: CaseProjection) -> PatientCase:
+        """Return the projection of ``patient_case``, building it on first use in the run."""
+        return self.memo(run_id, patient_case, projection, lambda: projection.apply(patient_case))
+
+    def memo(self, run_id: str, patient_case: PatientCase, key: Hashable, build: Callable[[], Any]) -> Any:
+        """Return the value cached for the run's case under ``key``, calling ``build`` on first use."""
+        with self._lock:
+            views = self._runs.setdefault(run_id, {})
+            self._runs.move_to_end(run_id)
+            cached = views.get(key)
+            # A run's case is one object; a different object means the case was replaced
+            if cached is not None and cached[0] is patient_case:
+                return cached[1]
+            value = build()
+            views[key] = (patient_case, value)
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+            return value
+
+    def discard(self, run_id: str) -> None:
+        """Forget the projections of a finished run."""
+        with self._lock:
+            self._runs.pop(run_id, None)
+
+
+_default_cache: Optional[ProjectionCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_projection_cache() -> ProjectionCache:
+    """Return the process-wide projection cache."""
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ProjectionCache()
+    return _default_cache
+
+
+def reset_projection_cache() -> None:
+    """Drop all cached projections."""
+    global _default_cache
+    with _default_cache_lock:
+        _default_cache = None
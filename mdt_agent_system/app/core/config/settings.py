@@ -1,7 +1,7 @@
 import os
 import pathlib
 from dotenv import load_dotenv
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from pydantic import AnyHttpUrl, Field, validator, ValidationError, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -48,6 +48,60 @@ class Settings(BaseSettings):
     LOG_LEVEL: Optional[str] = Field(default="INFO", description="Logging level")
     LOG_DIR: str = Field(default="logs", description="Directory to store log files")
     MEMORY_DIR: str = Field(default="memory_data", description="Directory to store persistent memory files (e.g., status, agent memory)")
+    REPORTS_DIR: str = Field(default=".", description="Directory where report_<run_id>.json files are written")
+
+    # Patient case uploads
+    MAX_CASE_UPLOAD_BYTES: int = Field(default=10 * 1024 * 1024, ge=1, description="Largest accepted patient case upload; reading stops past this size")
+    MAX_CASE_HISTORY_ENTRIES: Optional[int] = Field(default=5000, ge=1, description="Most medical_history entries accepted in an uploaded case, unlimited when unset")
+    MAX_CASE_LAB_RESULTS: Optional[int] = Field(default=20000, ge=1, description="Most lab_results entries accepted in an uploaded case, unlimited when unset")
+    MAX_CONCURRENT_RUNS: Optional[int] = Field(default=4, ge=1, description="Simulations running at once; further uploads and batch cases wait for a slot, unlimited when unset")
+
+    # Duplicate submissions
+    IDEMPOTENCY_KEY_TTL_SECONDS: float = Field(default=24 * 3600.0, gt=0, description="Seconds an Idempotency-Key stays attached to the run it started")
+    CASE_DEDUPE_WINDOW_MINUTES: Optional[float] = Field(default=None, gt=0, description="Attach an identical patient case submitted within this many minutes to the existing run, off when unset")
+
+    # Retention of persisted run data
+    RETENTION_ENABLED: bool = Field(default=False, description="Run the retention job periodically inside the API process")
+    RETENTION_INTERVAL_SECONDS: int = Field(default=3600, ge=60, description="Seconds between retention passes")
+    RETENTION_MAX_AGE_DAYS: Optional[float] = Field(default=30.0, gt=0, description="Expire runs inactive for longer than this")
+    RETENTION_MAX_RUNS: Optional[int] = Field(default=500, ge=1, description="Keep at most this many most recent runs")
+    RETENTION_ARCHIVE: bool = Field(default=True, description="Archive expired runs into compressed bundles before deleting")
+    RETENTION_ARCHIVE_DIR: Optional[str] = Field(default=None, description="Bundle directory, defaults to <MEMORY_DIR>/archive")
+
+    # Tool execution
+    TOOL_EXECUTOR_MAX_WORKERS: int = Field(default=8, ge=1, description="Worker threads shared by synchronous tools")
+    TOOL_PLUGIN_DISCOVERY: bool = Field(default=True, description="Register tools exposed through the mdt_agent_system.tools entry-point group")
+    TOOL_CACHE_ENABLED: bool = Field(default=True, description="Cache results of deterministic reference tools")
+    TOOL_CACHE_TTL_SECONDS: Optional[float] = Field(default=3600.0, gt=0, description="Lifetime of cached tool results, None for no expiry")
+    TOOL_CACHE_MAX_ENTRIES: int = Field(default=1024, ge=1, description="Cached results kept per tool")
+    TOOL_CACHE_DISABLED_TOOLS: List[str] = Field(default=[], description="Tool names whose results are never cached")
+
+    # Reference knowledge bases
+    GUIDELINE_DATA_PATH: Optional[str] = Field(default=None, description="Guideline JSON/YAML file or directory, defaults to the bundled dataset")
+    PHARMACOLOGY_DATA_PATH: Optional[str] = Field(default=None, description="Pharmacology JSON dataset, defaults to the bundled dataset")
+    PHARMACOLOGY_DB_PATH: Optional[str] = Field(default=None, description="SQLite file for the built pharmacology database, in memory when unset")
+
+    # Agent metadata validation
+    METADATA_RETRY_MAX_ATTEMPTS: int = Field(default=2, ge=0, description="Follow-up LLM calls per stage to fix missing or invalid metadata fields, 0 to disable")
+    METADATA_RETRY_MAX_TOKENS: int = Field(default=2000, ge=0, description="Estimated token budget across a stage's metadata follow-up calls")
+
+    # Agent context and streaming
+    CASE_PROJECTION_ENABLED: bool = Field(default=True, description="Give each agent only the patient case fields its type declares in CASE_PROJECTIONS")
+    CONTEXT_COMPACTION_ENABLED: bool = Field(default=True, description="Pass downstream agents deduplicated views of upstream outputs instead of the full outputs")
+    CONTEXT_MAX_FINDINGS: int = Field(default=8, ge=1, description="Key findings taken from an upstream markdown response without key_findings metadata")
+    STREAM_AGENT_SECTIONS: List[str] = Field(default=[], description="Agent types or ids (e.g. summary, EvaluationAgent) whose tool-less responses are streamed section by section, '*' for all")
+
+    # Prompt token budgets (local estimates, about four characters per token)
+    AGENT_PROMPT_TOKEN_BUDGET: Optional[int] = Field(default=None, ge=1, description="Prompt token budget of each agent stage, unlimited when unset")
+    AGENT_PROMPT_TOKEN_BUDGETS: Dict[str, int] = Field(default={}, description="Per agent type budgets overriding AGENT_PROMPT_TOKEN_BUDGET, e.g. {\"summary\": 6000}")
+    RUN_PROMPT_TOKEN_BUDGET: Optional[int] = Field(default=None, ge=1, description="Prompt token budget across all stages of a run, unlimited when unset")
+
+    # Prompt templates
+    PROMPT_TEMPLATE_DIR: Optional[str] = Field(default=None, description="Directory of <agent_type>.txt files overriding the built-in prompt templates")
+    PROMPT_TEMPLATE_HOT_RELOAD: bool = Field(default=False, description="Recompile prompt templates when files in PROMPT_TEMPLATE_DIR change")
+    PROMPT_SHARED_CASE: bool = Field(default=False, description="Open every stage prompt with the full patient case, a per-run prefix shared by all stages, instead of per-agent case views")
+    PROMPT_CONTEXT_CACHE: Optional[str] = Field(default=None, description="Provider context cache for the shared prefix of a run's prompts ('gemini'); needs PROMPT_SHARED_CASE")
+    PROMPT_CONTEXT_CACHE_TTL_SECONDS: int = Field(default=3600, ge=60, description="Lifetime of a run's cached prompt prefix")
 
     @field_validator('LOG_LEVEL')
     @classmethod
@@ -82,3 +136,4 @@ if __name__ == "__main__":
     print(f"  LOG_LEVEL: {settings.LOG_LEVEL}")
     print(f"  LOG_DIR: {settings.LOG_DIR}")
     print(f"  MEMORY_DIR: {settings.MEMORY_DIR}")
+    print(f"  RETENTION_ENABLED: {settings.RETENTION_ENABLED}")
@@ -0,0 +1,124 @@
+"""Provider-side context caches for the stable prefix of a run's prompts.
+
+With ``PROMPT_SHARED_CASE`` every stage of a run starts with the same system
+message and patient case section. A context cache uploads that prefix once
+per run and lets each stage reference it instead of resending it. Caches are
+optional: when the provider SDK lacks support the agents send full prompts.
+"""
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class ContextCache(ABC):
+    """Uploads a run's prompt prefix once and hands out references to it."""
+
+    def __init__(self):
+        self._handles: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, run_id: str, system: str, shared: str) -> Optional[str]:
+        """Return the cache reference for this prefix, creating it on first use in the run.
+
+        Blocks on the provider call; run it in a worker thread. Returns None
+        when the provider rejects the content, e.g. below its minimum size.
+        """
+        key = (run_id, hashlib.sha256(f"{system}\0{shared}".encode("utf-8")).hexdigest())
+        with self._lock:
+            name = self._handles.get(key)
+            if name is not None:
+                return name
+            try:
+                name = self._create(system, shared)
+            except Exception as e:
+                logger.warning(f"Context cache unavailable for run {run_id}: {e}")
+                return None
+            self._handles[key] = name
+            return name
+
+    def release(self, run_id: str) -> None:
+        """Delete the run's cached prefixes; failures are logged, the provider expires them anyway."""
+        with self._lock:
+            names = [name for (run, _), name in self._handles.items() if run == run_id]
+            self._handles = {key: name for key, name in self._handles.items() if key[0] != run_id}
+        for name in names:
+            try:
+                self._delete(name)
+            except Exception as e:
+                logger.warning(f"Could not delete cached context {name}: {e}")
+
+    def bind(self, llm: Any, name: str) -> Any:
+        """Return ``llm`` set up to reference the cached prefix ``name``."""
+        return llm.bind(cached_content=name)
+
+    @abstractmethod
+    def _create(self, system: str, shared: str) -> str:
+        """Upload the prefix and return its reference."""
+
+    def _delete(self, name: str) -> None:
+        """Delete an uploaded prefix."""
+
+
+class GeminiContextCache(ContextCache):
+    """Gemini ``CachedContent``; needs google-generativeai>=0.7 and langchain-google-genai>=2."""
+
+    def __init__(self, model: str, ttl_seconds: int):
+        try:
+            from google.generativeai import caching
+        except ImportError as e:
+            raise ImportError("Gemini context caching needs google-generativeai>=0.7 (google.generativeai.caching)") from e
+        super().__init__()
+        self._caching = caching
+        self.model = model if model.startswith("models/") else f"models/{model}"
+        self.ttl = timedelta(seconds=ttl_seconds)
+
+    def _create(self, system: str, shared: str) -> str:
+        cached = self._caching.CachedContent.create(
+            model=self.model, system_instruction=system, contents=[shared], ttl=self.ttl
+        )
+        return cached.name
+
+    def _delete(self, name: str) -> None:
+        self._caching.CachedContent.get(name).delete()
+
+
+_PROVIDERS = {"gemini": GeminiContextCache}
+
+_default_cache: Optional[ContextCache] = None
+_default_cache_checked = False
+_default_cache_lock = threading.Lock()
+
+
+def get_context_cache() -> Optional[ContextCache]:
+    """Return the cache selected by ``PROMPT_CONTEXT_CACHE``, or None when disabled or unsupported."""
+    global _default_cache, _default_cache_checked
+    if not _default_cache_checked:
+        with _default_cache_lock:
+            if not _default_cache_checked:
+                config = get_config()
+                provider = getattr(config, "PROMPT_CONTEXT_CACHE", None)
+                if provider:
+                    try:
+                        _default_cache = _PROVIDERS[provider.lower()](
+                            getattr(config, "LLM_MODEL", ""),
+                            getattr(config, "PROMPT_CONTEXT_CACHE_TTL_SECONDS", 3600)
+                        )
+                    except (KeyError, ImportError) as e:
+                        logger.warning(f"Prompt context cache '{provider}' disabled: {e}")
+                _default_cache_checked = True
+    return _default_cache
+
+
+def reset_context_cache() -> None:
+    """Forget the configured cache so the next use re-reads the settings."""
+    global _default_cache, _default_cache_checked
+    with _default_cache_lock:
+        _default_cache = None
+        _default_cache_checked = False
@@ -0,0 +1,155 @@
+"""Compact views of upstream stage outputs for downstream prompts.
+
+A stage output carries its response several times: the markdown and metadata
+inside ``details`` and again at the top level, next to structured fields
+derived from the same text. Passing that whole dict to every later stage makes
+the prompts grow roughly quadratically along the chain. The compact view keeps
+each fact once: non-empty structured fields, the metadata, and the key
+findings, with the markdown only when the receiving agent asks for it.
+
+Completed stages are captured once as a ``StageSnapshot``: serialized a
+single time, with the parsed data, both compact views and their token
+estimates kept for every downstream stage to reuse.
+"""
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.tokens import estimate_json_tokens, estimate_tokens
+
+# Keys holding the response text or a copy of it
+_TEXT_KEYS = frozenset({"details", "summary", "markdown_content", "metadata", "raw_output", "evaluation_formatted"})
+# Summaries AgentOutputPlaceholder fills in when the agent gave none
+_DEFAULT_SUMMARIES = frozenset({"", "Default summary", "Analysis completed"})
+_FINDING_RE = re.compile(r"^\s*(?:[-*+•]|\d+[.)])\s+(?P<item>.+?)\s*$", re.MULTILINE)
+
+DEFAULT_MAX_FINDINGS = 8
+
+
+def markdown_findings(markdown: str, limit: int = DEFAULT_MAX_FINDINGS) -> List[str]:
+    """Return the first ``limit`` list items of a markdown response."""
+    findings = []
+    for match in _FINDING_RE.finditer(markdown):
+        findings.append(match.group("item").replace("**", ""))
+        if len(findings) >= limit:
+            break
+    return findings
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {} or (
+        isinstance(value, dict) and all(_is_empty(v) for v in value.values())
+    )
+
+
+def _metadata_values(metadata: Dict[str, Any]) -> List[Any]:
+    """Values of ``metadata`` and its nested objects, for duplicate checks."""
+    values = []
+    for value in metadata.values():
+        values.append(value)
+        if isinstance(value, dict):
+            values.extend(_metadata_values(value))
+    return values
+
+
+def compact_stage_output(output: Any, include_markdown: bool = False,
+                         max_findings: int = DEFAULT_MAX_FINDINGS) -> Any:
+    """Reduce one stage output to a deduplicated view for downstream prompts.
+
+    Args:
+        output: ``AgentOutputPlaceholder.dict()`` or an agent's result dict;
+            other values are returned unchanged
+        include_markdown: Keep the full markdown response
+        max_findings: Key findings kept when they come from the markdown
+
+    Returns:
+        The summary, non-empty structured fields not repeated in the metadata,
+        ``key_findings``, the remaining metadata and optionally the markdown
+    """
+    if not isinstance(output, dict):
+        return output
+    details = output.get("details")
+    merged = {**details, **output} if isinstance(details, dict) else dict(output)
+    metadata = merged.get("metadata") if isinstance(merged.get("metadata"), dict) else {}
+    markdown = merged.get("markdown_content") or ""
+
+    compact: Dict[str, Any] = {}
+    summary = merged.get("summary")
+    if isinstance(summary, str) and summary not in _DEFAULT_SUMMARIES:
+        compact["summary"] = summary
+    repeated = _metadata_values(metadata)
+    for key, value in merged.items():
+        if key in _TEXT_KEYS or _is_empty(value) or any(value == seen for seen in repeated):
+            continue
+        compact[key] = value
+
+    findings = metadata.get("key_findings")
+    if not isinstance(findings, list) or not findings:
+        findings = markdown_findings(markdown, max_findings)
+    if findings:
+        compact["key_findings"] = findings
+    rest = {key: value for key, value in metadata.items() if key != "key_findings" and not _is_empty(value)}
+    if rest:
+        compact["metadata"] = rest
+    if include_markdown and markdown:
+        compact["markdown_content"] = markdown
+    return compact
+
+
+def compact_context(context: Dict[str, Any], include_markdown: bool = False,
+                    max_findings: int = DEFAULT_MAX_FINDINGS) -> Dict[str, Any]:
+    """Compact every stage output in an agent context; lists are compacted item by item."""
+    return {key: _compact_value(value, include_markdown, max_findings) for key, value in context.items()}
+
+
+def _compact_value(value: Any, include_markdown: bool, max_findings: int) -> Any:
+    if isinstance(value, list):
+        return [compact_stage_output(item, include_markdown, max_findings) for item in value]
+    return compact_stage_output(value, include_markdown, max_findings)
+
+
+@dataclass(frozen=True)
+class StageSnapshot:
+    """A completed stage output, serialized once and shared by downstream stages.
+
+    ``data`` and the compact views are plain JSON values built from
+    ``json_bytes``, independent of the live output objects; stages read them
+    and must not modify them.
+    """
+    json_bytes: bytes
+    data: Any
+    compact: Any
+    compact_with_markdown: Any
+    tokens: int
+    compact_tokens: int
+    compact_with_markdown_tokens: int
+
+    @classmethod
+    def capture(cls, output: Any, max_findings: int = DEFAULT_MAX_FINDINGS) -> "StageSnapshot":
+        """Serialize ``output`` (an object with ``dict()`` or a JSON-like value) once."""
+        json_bytes = json_codec.dumpb(output, indent=True)
+        data = json_codec.loads(json_bytes)
+        compact = _compact_value(data, False, max_findings)
+        with_markdown = _compact_value(data, True, max_findings)
+        return cls(
+            json_bytes=json_bytes,
+            data=data,
+            compact=compact,
+            compact_with_markdown=with_markdown,
+            tokens=estimate_tokens(json_bytes.decode("utf-8")),
+            compact_tokens=estimate_json_tokens(compact),
+            compact_with_markdown_tokens=estimate_json_tokens(with_markdown),
+        )
+
+    def view(self, compacted: bool = True, include_markdown: bool = False) -> Any:
+        """Return the full data or a compact view."""
+        if not compacted:
+            return self.data
+        return self.compact_with_markdown if include_markdown else self.compact
+
+    def view_tokens(self, compacted: bool = True, include_markdown: bool = False) -> int:
+        """Estimated tokens of ``view`` with the same arguments."""
+        if not compacted:
+            return self.tokens
+        return self.compact_with_markdown_tokens if include_markdown else self.compact_tokens
@@ -0,0 +1,230 @@
+"""Single-pass parser for EvaluationAgent responses.
+
+Evaluation responses are loosely structured prose: an overall score written
+in many notations ("Overall Score: 0.85", "Score: 0.85/1.0 (good)", "8/10",
+"85%"), optional per-criterion scores, and lists of strengths, areas for
+improvement and missing elements under headers or ``Label:`` lines. The
+grammar below is a handful of precompiled patterns driven by a small state
+machine over the lines; each line is classified once.
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+# A score with an optional denominator or percent sign and an optional "(label)"
+_SCORE = (
+    r"(?P<value>\d+(?:\.\d+)?)\s*"
+    r"(?:(?P<percent>%)|(?:/|out\s+of)\s*(?P<max>\d+(?:\.\d+)?))?"
+    r"(?:\s*\((?P<label>[^)]{1,40})\))?"
+)
+_LEADING_SCORE_RE = re.compile(r"^\**\s*" + _SCORE + r"(?![\w.])", re.IGNORECASE)
+# "- good" / ", strong" after a leading score
+_SCORE_LABEL_TAIL_RE = re.compile(r"^[-–—,;]\s*(?P<label>.{1,40})$")
+# Free-text fallback: a percentage or fraction anywhere, e.g. "I would rate it 75% complete"
+_INLINE_SCORE_RE = re.compile(
+    r"(?P<value>\d+(?:\.\d+)?)\s*(?:(?P<percent>%)|/\s*(?P<max>10|100|1(?:\.0+)?)\b)", re.IGNORECASE
+)
+# "## Strengths", "**Areas for Improvement:**", "1. Completeness: 0.9", "- Overall score: 8/10"
+_LABEL_RE = re.compile(
+    r"^(?:#{1,6}\s*)?(?:[-*+•]\s+)?(?:\d+[.)]\s+)?\**\s*"
+    r"(?P<label>[A-Za-z][A-Za-z0-9 /&',()-]{0,80}?)\s*\**\s*(?::|\s[-–—]\s)\s*\**\s*(?P<rest>.*)$"
+)
+_HEADING_RE = re.compile(r"^(?:#{1,6}\s*(?P<hash>.+?)|\*\*(?P<bold>[^*]+?)\*\*)\s*:?\s*$")
+_PLAIN_HEADING_RE = re.compile(r"^[A-Za-z][A-Za-z /&-]{0,40}$")
+_BULLET_RE = re.compile(r"^(?:[-*+•]|\d+[.)])\s+(?P<item>.+)$")
+_BULLET_STARTS = frozenset("-*+•0123456789")
+_EMPHASIS_RE = re.compile(r"\*\*|__")
+
+_SECTION_RES: Tuple[Tuple[str, "re.Pattern[str]"], ...] = (
+    ("score", re.compile(r"^(?:(?:overall|total|final|quality|mdt)\b.*\b(?:score|rating)|score|rating)$", re.IGNORECASE)),
+    ("missing_elements", re.compile(r"\b(?:missing|gaps?|omissions?)\b", re.IGNORECASE)),
+    ("areas_for_improvement", re.compile(r"\b(?:improvements?|improve|weakness(?:es)?|areas?|limitations?|concerns?)\b", re.IGNORECASE)),
+    ("strengths", re.compile(r"\bstrengths?\b", re.IGNORECASE)),
+    ("comments", re.compile(r"\b(?:comments?|overall assessment|summary|assessment|conclusion)\b", re.IGNORECASE)),
+    ("criteria", re.compile(r"\b(?:criteria|criterion|scores?)\b", re.IGNORECASE)),
+)
+_LIST_SECTIONS = ("strengths", "areas_for_improvement", "missing_elements")
+
+
+class CriterionScore(BaseModel):
+    """Score given to one evaluation criterion."""
+    name: str = Field(..., description="Criterion as written in the response")
+    score: float = Field(..., ge=0.0, le=1.0, description="Score normalized to 0.0-1.0")
+    label: Optional[str] = Field(None, description="Qualitative label such as 'good', if given")
+
+
+class EvaluationResult(BaseModel):
+    """Typed content of an evaluation response."""
+    score: Optional[float] = Field(None, ge=0.0, le=1.0, description="Overall score normalized to 0.0-1.0")
+    score_label: Optional[str] = Field(None, description="Qualitative label of the overall score, if given")
+    criteria: List[CriterionScore] = Field(default_factory=list, description="Per-criterion scores in response order")
+    comments: str = Field("", description="Free-text comments or overall assessment")
+    strengths: List[str] = Field(default_factory=list)
+    areas_for_improvement: List[str] = Field(default_factory=list)
+    missing_elements: List[str] = Field(default_factory=list)
+
+    def criteria_scores(self) -> Dict[str, float]:
+        """Return criterion scores keyed by snake_case criterion name."""
+        return {re.sub(r"[^a-z0-9]+", "_", c.name.lower()).strip("_"): c.score for c in self.criteria}
+
+
+def normalize_score(value: str, percent: Optional[str] = None, maximum: Optional[str] = None) -> Optional[float]:
+    """Convert a score written as 0.85, 85%, 8/10 or 0.85/1.0 to the 0.0-1.0 range.
+
+    Bare numbers above 1 are read as out of 10 up to 10 and as percentages above.
+    Returns None when the value cannot be a score.
+    """
+    number = float(value)
+    if maximum is not None:
+        denominator = float(maximum)
+        if denominator <= 0:
+            return None
+        number /= denominator
+    elif percent or number > 10:
+        number /= 100
+    elif number > 1:
+        number /= 10
+    if number < 0 or number > 1:
+        return None
+    return round(number, 2)
+
+
+def _leading_score(text: str, strict: bool = False) -> Optional[Tuple[float, Optional[str]]]:
+    """Parse a score at the start of ``text``, returning the normalized value and label.
+
+    With ``strict`` the score must be all of ``text`` apart from a "(label)" or
+    "- label", so "3 sections lack detail" is prose rather than a score of 0.3.
+    """
+    match = _LEADING_SCORE_RE.match(text)
+    if match is None:
+        return None
+    score = normalize_score(match.group("value"), match.group("percent"), match.group("max"))
+    if score is None:
+        return None
+    label = match.group("label")
+    tail = text[match.end():].strip(" *")
+    if tail:
+        dashed = _SCORE_LABEL_TAIL_RE.match(tail) if label is None else None
+        if dashed is not None:
+            # "0.85 - good" / "0.85, strong"
+            label = dashed.group("label")
+        elif strict:
+            return None
+        elif label is None and len(tail) <= 40 and " " not in tail:
+            label = tail
+    return score, label.strip() if label else None
+
+
+@lru_cache(maxsize=512)
+def _classify(label: str) -> Optional[str]:
+    """Map a header or label to the section it introduces."""
+    label = label.strip()
+    for section, pattern in _SECTION_RES:
+        if pattern.search(label):
+            if section == "score" and not pattern.match(label):
+                continue
+            return section
+    return None
+
+
+def _clean(text: str) -> str:
+    if "*" in text or "_" in text:
+        text = _EMPHASIS_RE.sub("", text)
+    return text.strip()
+
+
+def parse_evaluation(text: str) -> EvaluationResult:
+    """Parse an evaluation response in one pass over its lines.
+
+    Args:
+        text: Raw evaluation response
+
+    Returns:
+        The extracted scores, comments and lists; missing parts are empty
+    """
+    score: Optional[float] = None
+    score_label: Optional[str] = None
+    criteria: List[Dict[str, object]] = []  # validated into CriterionScore with the result
+    lists: Dict[str, List[str]] = {name: [] for name in _LIST_SECTIONS}
+    comments: List[str] = []
+    section: Optional[str] = None
+
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        first = line[0]
+
+        # Only lines with a separator or header markup can be labels; "* item" bullets skip the regexes
+        markup = first == "#" or line.startswith("**")
+        if markup or ":" in line or " - " in line or " – " in line or " — " in line:
+            heading = _HEADING_RE.match(line) if markup else None
+            label_match = None if heading and ":" not in line.rstrip(":") else _LABEL_RE.match(line)
+            if label_match is not None:
+                label = _clean(label_match.group("label"))
+                rest = label_match.group("rest").strip()
+                kind = _classify(label)
+                # Only score and criteria headings may follow their value with prose
+                scored = _leading_score(rest, strict=kind not in ("score", "criteria")) if rest else None
+                if kind == "score" or (kind in ("comments", "criteria") and scored and "overall" in label.lower()):
+                    if scored and score is None:
+                        score, score_label = scored
+                    # "Score:" with the value on the next line
+                    section = None if rest else "score"
+                    continue
+                # Comments are prose: "Comments: 2 of 3 sections ok" is not a criterion
+                if scored and kind not in _LIST_SECTIONS and kind != "comments":
+                    criteria.append({"name": label, "score": scored[0], "label": scored[1]})
+                    continue
+                if kind is not None and (not rest or kind == "comments") and not _BULLET_RE.match(line):
+                    section = kind
+                    if kind == "comments" and rest:
+                        comments.append(_clean(rest))
+                    continue
+
+            if heading is not None:
+                title = _clean(heading.group("hash") or heading.group("bold"))
+                kind = _classify(title)
+                if kind == "score" and score is None:
+                    # A header that carries the score itself, e.g. "## Overall Score (0.85)"
+                    inline = _INLINE_SCORE_RE.search(title)
+                    if inline is not None:
+                        score = normalize_score(inline.group("value"), inline.group("percent"), inline.group("max"))
+                section = kind
+                continue
+
+        if section == "score":
+            # The value under a score header: "## Quality Score" followed by "0.85" or "17/20"
+            scored = _leading_score(line) if score is None else None
+            if scored is not None:
+                score, score_label = scored
+                continue
+        bullet = _BULLET_RE.match(line) if first in _BULLET_STARTS else None
+        if bullet is None and len(line) <= 41 and _PLAIN_HEADING_RE.match(line):
+            # A bare "Strengths" or "Weaknesses" line
+            kind = _classify(line)
+            if kind in _LIST_SECTIONS or kind == "comments":
+                section = kind
+                continue
+        if section in lists:
+            content = _clean(bullet.group("item") if bullet else line)
+            if not content.endswith(":"):
+                lists[section].append(content)
+        elif section == "comments":
+            comments.append(_clean(line))
+
+    if score is None:
+        # Free-text responses: the first percentage or fraction stands for the overall score
+        for match in _INLINE_SCORE_RE.finditer(text):
+            score = normalize_score(match.group("value"), match.group("percent"), match.group("max"))
+            if score is not None:
+                break
+    return EvaluationResult(
+        score=score,
+        score_label=score_label,
+        criteria=criteria,
+        comments=" ".join(comments),
+        **lists
+    )
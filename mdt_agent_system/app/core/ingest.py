@@ -0,0 +1,137 @@
+"""Validation of uploaded patient cases straight from their JSON bytes.
+
+Uploads are read in chunks up to ``MAX_CASE_UPLOAD_BYTES`` and validated with
+pydantic's JSON mode, so the bytes are parsed once into ``PatientCase`` with
+no intermediate dict. The history and lab list limits are enforced inside
+that validation and reported like any other field error. Batch uploads are
+NDJSON bodies split into lines as they arrive, each line being one case.
+"""
+import codecs
+from typing import Any, AsyncIterator, Dict, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.schemas import PatientCase
+
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class CaseTooLargeError(ValueError):
+    """The upload is larger than the accepted size."""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Patient case exceeds the {limit} byte upload limit.")
+        self.limit = limit
+
+
+class InvalidCaseJSONError(ValueError):
+    """The upload is not valid JSON."""
+
+
+def max_upload_bytes() -> int:
+    """The configured upload size limit."""
+    return getattr(get_config(), "MAX_CASE_UPLOAD_BYTES", 10 * 1024 * 1024)
+
+
+def case_list_limits() -> Dict[str, Optional[int]]:
+    """The configured list limits, keyed by PatientCase field."""
+    config = get_config()
+    return {
+        "medical_history": getattr(config, "MAX_CASE_HISTORY_ENTRIES", None),
+        "lab_results": getattr(config, "MAX_CASE_LAB_RESULTS", None),
+    }
+
+
+async def read_limited(file: Any, max_bytes: Optional[int] = None) -> bytes:
+    """Read an upload (anything with ``async read(size)``) in chunks, stopping past ``max_bytes``.
+
+    Raises:
+        CaseTooLargeError: As soon as more than ``max_bytes`` have been read
+    """
+    if max_bytes is None:
+        max_bytes = max_upload_bytes()
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise CaseTooLargeError(max_bytes)
+    data = bytearray()
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            return bytes(data)
+        data += chunk
+        if len(data) > max_bytes:
+            raise CaseTooLargeError(max_bytes)
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes],
+                            max_line_bytes: Optional[int] = None) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """Split a streamed NDJSON body into ``(line_number, line)`` pairs as chunks arrive.
+
+    Line numbers are 1-based and count blank lines, which are skipped. A line
+    longer than ``max_line_bytes`` is yielded once as ``None`` as soon as it
+    passes the limit, and the rest of it is discarded without buffering.
+    """
+    if max_line_bytes is None:
+        max_line_bytes = max_upload_bytes()
+    buffer = bytearray()
+    number = 1
+    skipping = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            if not skipping:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield number, None
+                elif buffer.strip():
+                    yield number, bytes(buffer)
+            skipping = False
+            buffer.clear()
+            number += 1
+            start = end + 1
+        if not skipping:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                yield number, None
+                skipping = True
+                buffer.clear()
+    if not skipping and buffer.strip():
+        yield number, bytes(buffer)
+
+
+def parse_patient_case(data: Union[bytes, bytearray, str],
+                       limits: Optional[Dict[str, Optional[int]]] = None) -> PatientCase:
+    """Validate JSON bytes directly into a PatientCase.
+
+    Args:
+        data: The uploaded JSON document
+        limits: List limits per field, the configured limits by default
+
+    Raises:
+        InvalidCaseJSONError: If ``data`` is not valid JSON
+        ValidationError: If the document does not match PatientCase or exceeds a list limit
+    """
+    if isinstance(data, (bytes, bytearray)) and data.startswith(codecs.BOM_UTF8):
+        data = data[len(codecs.BOM_UTF8):]
+    if limits is None:
+        limits = case_list_limits()
+    try:
+        return PatientCase.model_validate_json(data, context={"list_limits": limits})
+    except ValidationError as e:
+        errors = e.errors(include_url=False, include_input=False)
+        if errors and errors[0]["type"] == "json_invalid":
+            raise InvalidCaseJSONError(errors[0]["msg"]) from e
+        raise
+
+
+def format_validation_errors(error: ValidationError) -> str:
+    """One "field.path: message" entry per error, without echoing the submitted values."""
+    parts = []
+    for item in error.errors(include_url=False, include_input=False):
+        location = ".".join(str(part) for part in item["loc"]) or "<root>"
+        parts.append(f"{location}: {item['msg']}")
+    return "; ".join(parts)
@@ -0,0 +1,116 @@
+"""Shared JSON encoding and decoding.
+
+Status persistence, report emission, prompt building, log formatting and
+memory saves all go through this module. It uses orjson when it is installed
+and the standard library otherwise; both backends produce the same text
+(UTF-8, no ASCII escaping, ``,``/``:`` separators or two-space indentation)
+and encode datetimes, pydantic models, dataclasses, enums and sets the same
+way. Values the backend cannot encode fall back to the standard library, so
+callers never see a serialization error for odd objects: anything unknown is
+encoded through its ``__dict__`` or as ``str()``.
+"""
+import dataclasses
+import json
+from datetime import date, datetime, time
+from enum import Enum
+from typing import IO, Any, Union
+
+from pydantic import BaseModel
+
+try:
+    import orjson as _orjson
+except ImportError:  # pragma: no cover - exercised by patching _orjson
+    _orjson = None
+
+# orjson.JSONDecodeError subclasses this, so callers can catch one type
+JSONDecodeError = json.JSONDecodeError
+
+
+def backend() -> str:
+    """Name of the encoder in use, "orjson" or "json"."""
+    return "orjson" if _orjson is not None else "json"
+
+
+def encode_default(obj: Any) -> Any:
+    """Convert a value JSON cannot represent into one it can."""
+    if isinstance(obj, BaseModel):
+        # Models such as AgentOutputPlaceholder override dict() to shape their output
+        if type(obj).dict is not BaseModel.dict:
+            return obj.dict()
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, "dict") and callable(obj.dict):
+        return obj.dict()
+    if hasattr(obj, "tolist") and callable(obj.tolist):
+        return obj.tolist()
+    if hasattr(obj, "__dict__") and not isinstance(obj, type):
+        return vars(obj)
+    return str(obj)
+
+
+def _stdlib_dumps(obj: Any, indent: bool, sort_keys: bool) -> str:
+    return json.dumps(
+        obj,
+        default=encode_default,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+        sort_keys=sort_keys,
+    )
+
+
+def dumpb(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Encode ``obj`` as UTF-8 JSON bytes.
+
+    Args:
+        obj: Value to encode
+        indent: Indent with two spaces
+        sort_keys: Sort mapping keys
+    """
+    if _orjson is not None:
+        option = _orjson.OPT_NON_STR_KEYS | _orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= _orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= _orjson.OPT_SORT_KEYS
+        try:
+            return _orjson.dumps(obj, default=encode_default, option=option)
+        except _orjson.JSONEncodeError:
+            # Integers beyond 64 bits, cycles handled by encode_default, ...
+            pass
+    return _stdlib_dumps(obj, indent, sort_keys).encode("utf-8")
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """Encode ``obj`` as a JSON string; see ``dumpb``."""
+    if _orjson is None:
+        return _stdlib_dumps(obj, indent, sort_keys)
+    return dumpb(obj, indent, sort_keys).decode("utf-8")
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """Decode JSON text or bytes.
+
+    Raises:
+        JSONDecodeError: If ``data`` is not valid JSON
+    """
+    if _orjson is not None:
+        return _orjson.loads(data)
+    return json.loads(data)
+
+
+def load(fp: IO) -> Any:
+    """Decode JSON from a text or binary file object."""
+    return loads(fp.read())
+
+
+def to_jsonable(obj: Any) -> Any:
+    """Return ``obj`` as plain JSON data (dicts, lists, strings, numbers)."""
+    return loads(dumpb(obj))
@@ -0,0 +1,172 @@
+"""Tolerant parsing for the JSON blocks LLMs emit.
+
+``loads_tolerant`` tries ``json.loads`` first and only on failure applies a
+fixed sequence of regex repairs for the mistakes models actually make:
+markdown code fences, prose around the object, trailing commas, range
+placeholders such as ``0.0-1.0`` copied from prompt templates, Python
+literals, single-quoted strings, comments and output truncated mid-object.
+No repair needs another LLM call.
+"""
+import json
+import re
+from typing import Any, List, Tuple
+
+# Repair kinds, in the order they are applied
+CODE_FENCE = "code_fence"
+SURROUNDING_TEXT = "surrounding_text"
+COMMENTS = "comments"
+RANGE_LITERAL = "range_literal"
+PYTHON_LITERAL = "python_literal"
+SINGLE_QUOTES = "single_quotes"
+TRAILING_COMMA = "trailing_comma"
+TRUNCATED = "truncated"
+
+_FENCE_RE = re.compile(r"```[a-zA-Z]*[ \t]*\n?(.*?)(?:```|\Z)", re.DOTALL)
+_STRING = r'"(?:[^"\\\n]|\\.)*"'
+_STRING_RE = re.compile(_STRING)
+_SINGLE_STRING = r"'(?:[^'\\\n]|\\.)*'"
+# Either kind of string, leftmost first, for bracket matching before single quotes are rewritten
+_ANY_STRING_RE = re.compile(rf"{_STRING}|{_SINGLE_STRING}")
+# Strings are matched first and kept as-is, so the repairs never touch string contents
+_TOKEN_RE = re.compile(
+    rf"""(?P<string>{_STRING})
+    |(?P<comment>//[^\n]*|/\*.*?\*/)
+    |(?P<range>-?\d+(?:\.\d+)?\s*-\s*\d+(?:\.\d+)?(?![\d.]))
+    |(?P<literal>\b(?:True|False|None)\b)
+    |(?P<single>{_SINGLE_STRING})
+    |(?P<comma>,(?=\s*[}}\]]))""",
+    re.VERBOSE | re.DOTALL,
+)
+# A trailing comma or a key without its value, left where the output was cut off
+_DANGLING_RE = re.compile(rf"\s*(?:,\s*)?(?:{_STRING}\s*:)?\s*$")
+_PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+
+class JSONRepairError(ValueError):
+    """Raised when text cannot be parsed even after repairs."""
+
+
+def _strip_fence(text: str, fixes: List[str]) -> str:
+    """Return the contents of the first code fence, if any."""
+    if "```" not in text:
+        return text
+    match = _FENCE_RE.search(text)
+    if match is None:
+        return text
+    fixes.append(CODE_FENCE)
+    return match.group(1)
+
+
+def _extract_object(text: str, fixes: List[str]) -> str:
+    """Drop prose before the first ``{``/``[`` and after its matching closer."""
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    start = min(starts)
+    # Blank out strings without changing offsets so brackets inside them are ignored
+    skeleton = _ANY_STRING_RE.sub(lambda m: m.group(0)[0] + " " * (len(m.group(0)) - 2) + m.group(0)[-1], text)
+    depth = 0
+    end = len(text)
+    for position in range(start, len(skeleton)):
+        char = skeleton[position]
+        if char in "{[":
+            depth += 1
+        elif char in "}]":
+            depth -= 1
+            if depth == 0:
+                end = position + 1
+                break
+    trimmed = text[start:end]
+    if len(trimmed.strip()) != len(text):
+        fixes.append(SURROUNDING_TEXT)
+    return trimmed
+
+
+def _rewrite_tokens(text: str, fixes: List[str]) -> str:
+    """Apply the token-level repairs outside of strings in a single regex pass."""
+    applied = set()
+
+    def replace(match: "re.Match[str]") -> str:
+        kind = match.lastgroup
+        if kind == "string":
+            return match.group(0)
+        if kind == "comment":
+            applied.add(COMMENTS)
+            return ""
+        if kind == "range":
+            # A template placeholder, not a value the model chose
+            applied.add(RANGE_LITERAL)
+            return "null"
+        if kind == "literal":
+            applied.add(PYTHON_LITERAL)
+            return _PYTHON_LITERALS[match.group(0)]
+        if kind == "single":
+            applied.add(SINGLE_QUOTES)
+            inner = match.group(0)[1:-1].replace("\\'", "'")
+            return json.dumps(inner)
+        applied.add(TRAILING_COMMA)
+        return ""
+
+    rewritten = _TOKEN_RE.sub(replace, text)
+    fixes.extend(kind for kind in (COMMENTS, RANGE_LITERAL, PYTHON_LITERAL, SINGLE_QUOTES, TRAILING_COMMA) if kind in applied)
+    return rewritten
+
+
+def _close_truncated(text: str, fixes: List[str]) -> str:
+    """Close an unterminated string and any brackets left open by truncated output."""
+    skeleton = _STRING_RE.sub('""', text)
+    suffix = ""
+    if skeleton.count('"') % 2:
+        # An unterminated string runs to the end of the text
+        suffix = '"'
+        skeleton = skeleton[:skeleton.rfind('"')]
+    closers = []
+    for char in skeleton:
+        if char == "{":
+            closers.append("}")
+        elif char == "[":
+            closers.append("]")
+        elif char in "}]" and closers:
+            closers.pop()
+    if not closers and not suffix:
+        return text
+    fixes.append(TRUNCATED)
+    body = text + suffix if suffix else _DANGLING_RE.sub("", text)
+    return body + "".join(reversed(closers))
+
+
+def repair_json(text: str) -> Tuple[str, List[str]]:
+    """Repair common LLM JSON mistakes.
+
+    Args:
+        text: Candidate JSON text
+
+    Returns:
+        The repaired text and the repair kinds applied, in order
+    """
+    fixes: List[str] = []
+    repaired = _strip_fence(text.strip(), fixes)
+    repaired = _extract_object(repaired.strip(), fixes)
+    repaired = _rewrite_tokens(repaired, fixes)
+    repaired = _close_truncated(repaired, fixes)
+    return repaired, fixes
+
+
+def loads_tolerant(text: str) -> Tuple[Any, List[str]]:
+    """Parse JSON, repairing it only when strict parsing fails.
+
+    Returns:
+        The parsed value and the repair kinds applied (empty for valid JSON)
+
+    Raises:
+        JSONRepairError: If the text is not valid JSON even after repairs
+    """
+    try:
+        return json.loads(text), []
+    except json.JSONDecodeError as e:
+        original_error = e
+    repaired, fixes = repair_json(text)
+    try:
+        return json.loads(repaired), fixes
+    except json.JSONDecodeError as e:
+        raise JSONRepairError(f"{original_error}; after repairs {fixes}: {e}") from e
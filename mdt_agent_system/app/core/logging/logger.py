@@ -1,10 +1,10 @@
-import json
 import logging
 import logging.handlers
 import os
 import uuid
 from datetime import datetime, UTC
 from typing import Dict, Any
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.config import get_config
 import contextvars
 
@@ -50,7 +50,7 @@ class JSONFormatter(logging.Formatter):
                          "threadName", "trace_id"] and key not in log_data:
                 log_data[key] = value
         
-        return json.dumps(log_data, default=str) # Use default=str for non-serializable types
+        return json_codec.dumps(log_data) # The codec stringifies non-serializable types
 
 def close_all_handlers() -> None:
     """Close all handlers on the root logger"""
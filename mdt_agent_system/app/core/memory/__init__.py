@@ -1,9 +1,13 @@
 from .persistence import JSONFileMemoryStore, JSONFileChatMessageHistory, PersistentConversationMemory
 from .manager import MemoryManager
+from .retention import RetentionJob, RetentionPolicy, RetentionReport
 
 __all__ = [
     "JSONFileMemoryStore",
     "JSONFileChatMessageHistory",
     "PersistentConversationMemory",
-    "MemoryManager"
+    "MemoryManager",
+    "RetentionJob",
+    "RetentionPolicy",
+    "RetentionReport"
 ]
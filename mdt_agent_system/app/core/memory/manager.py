@@ -99,29 +99,50 @@ class MemoryManager:
         """
         self.metadata_store.delete_memory(key)
     
-    def list_conversations(self) -> List[str]:
-        """List all conversation session IDs.
+    def list_conversations(self, prefix: Optional[str] = None) -> List[str]:
+        """List conversation session IDs.
         
+        Session IDs are built as ``{run_id}_{agent_id}``, so passing a run_id
+        as the prefix returns every conversation of that run.
+        
+        Args:
+            prefix: Optional key prefix to filter on.
+            
         Returns:
-            List of conversation session IDs.
+            Sorted list of conversation session IDs.
         """
-        data = self.conversation_store._load_data()
-        return list(data.keys())
+        return self.conversation_store.list_keys(prefix)
     
-    def list_agent_states(self) -> List[str]:
-        """List all agent IDs with saved states.
+    def list_agent_states(self, prefix: Optional[str] = None) -> List[str]:
+        """List agent IDs with saved states.
         
+        Args:
+            prefix: Optional key prefix to filter on.
+            
         Returns:
-            List of agent IDs.
+            Sorted list of agent IDs.
         """
-        data = self.state_store._load_data()
-        return list(data.keys())
+        return self.state_store.list_keys(prefix)
     
-    def list_metadata_keys(self) -> List[str]:
-        """List all metadata keys.
+    def list_metadata_keys(self, prefix: Optional[str] = None) -> List[str]:
+        """List metadata keys.
         
+        Args:
+            prefix: Optional key prefix to filter on.
+            
         Returns:
-            List of metadata keys.
+            Sorted list of metadata keys.
         """
-        data = self.metadata_store._load_data()
-        return list(data.keys()) 
\ No newline at end of file
+        return self.metadata_store.list_keys(prefix)
+    
+    def count_conversations(self, prefix: Optional[str] = None) -> int:
+        """Count conversations, optionally restricted to a key prefix such as a run_id."""
+        return self.conversation_store.count(prefix)
+    
+    def count_agent_states(self, prefix: Optional[str] = None) -> int:
+        """Count saved agent states, optionally restricted to a key prefix."""
+        return self.state_store.count(prefix)
+    
+    def count_metadata_keys(self, prefix: Optional[str] = None) -> int:
+        """Count metadata keys, optionally restricted to a key prefix."""
+        return self.metadata_store.count(prefix)
@@ -1,19 +1,30 @@
-import json
+import bisect
+import copy
 import os
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 from langchain_core.memory import BaseMemory
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import BaseMessage, messages_from_dict, messages_to_dict
 from pydantic import BaseModel
 from langchain.memory import ConversationBufferMemory
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.atomic_io import path_lock, write_json_atomic
 from mdt_agent_system.app.core.logging.logger import get_logger
 
 logger = get_logger(__name__)
 
 class JSONFileMemoryStore:
-    """JSON file-based memory store for LangChain."""
+    """JSON file-based memory store for LangChain.
+    
+    Keeps two helpers alongside the JSON file:
+    - an in-process read cache, invalidated when the file's mtime or size changes
+    - a sidecar key index (``<file>.index.json``) so key listing, prefix queries
+      and counts do not need to deserialize the stored values
+    """
+    
+    INDEX_SUFFIX = ".index.json"
     
     def __init__(self, file_path: str):
         """Initialize the memory store.
@@ -22,40 +33,143 @@ class JSONFileMemoryStore:
             file_path: Path to the JSON file for storing memory.
         """
         self.file_path = Path(file_path)
+        self.index_path = self.file_path.with_name(self.file_path.name + self.INDEX_SUFFIX)
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.file_path.exists():
-            self._save_data({})
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cache_signature: Optional[Tuple[int, int]] = None
+        self._keys: Optional[List[str]] = None
+        self._keys_signature: Optional[Tuple[int, int]] = None
+        with path_lock(self.file_path):
+            if not self.file_path.exists():
+                self._save_data({})
+    
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        """Return (mtime_ns, size) of the JSON file, or None if it is missing."""
+        try:
+            stat = self.file_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
     
     def _load_data(self) -> Dict[str, Any]:
-        """Load data from the JSON file."""
+        """Load data from the JSON file, served from the read cache when unchanged."""
+        signature = self._file_signature()
+        if signature is not None and signature == self._cache_signature and self._cache is not None:
+            return self._cache
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            with open(self.file_path, 'rb') as f:
+                data = json_codec.load(f)
+        except (json_codec.JSONDecodeError, FileNotFoundError):
             return {}
+        self._cache = data
+        self._cache_signature = signature
+        return data
     
     def _save_data(self, data: Dict[str, Any]) -> None:
-        """Save data to the JSON file."""
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        """Replace the JSON file atomically and refresh the cache and key index."""
+        try:
+            write_json_atomic(self.file_path, data, indent=True)
+        except Exception:
+            # The cached dict may already hold the unsaved change; force a re-read
+            self._cache = None
+            self._cache_signature = None
+            raise
+        signature = self._file_signature()
+        self._cache = data
+        self._cache_signature = signature
+        self._write_index(sorted(data.keys()), signature)
+    
+    def _write_index(self, keys: List[str], signature: Optional[Tuple[int, int]]) -> None:
+        """Write the sidecar key index for the current file version."""
+        self._keys = keys
+        self._keys_signature = signature
+        if signature is None:
+            return
+        try:
+            write_json_atomic(self.index_path, {"mtime_ns": signature[0], "size": signature[1], "keys": keys})
+        except OSError as e:
+            logger.warning(f"Failed to write key index {self.index_path}: {str(e)}")
+    
+    def _load_keys(self) -> List[str]:
+        """Return the sorted key list, using the sidecar index when it is current."""
+        signature = self._file_signature()
+        if signature is not None and signature == self._keys_signature and self._keys is not None:
+            return self._keys
+        try:
+            with open(self.index_path, 'rb') as f:
+                index = json_codec.load(f)
+            if signature is not None and (index.get("mtime_ns"), index.get("size")) == signature:
+                self._keys = index["keys"]
+                self._keys_signature = signature
+                return self._keys
+        except (json_codec.JSONDecodeError, FileNotFoundError, KeyError, TypeError):
+            pass
+        # Index is missing or stale (e.g. the file was written by another process)
+        keys = sorted(self._load_data().keys())
+        self._write_index(keys, signature)
+        return keys
+    
+    def list_keys(self, prefix: Optional[str] = None) -> List[str]:
+        """List stored keys in sorted order, optionally restricted to a prefix."""
+        keys = self._load_keys()
+        if not prefix:
+            return list(keys)
+        start = bisect.bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        return keys[start:end]
+    
+    def count(self, prefix: Optional[str] = None) -> int:
+        """Count stored keys, optionally restricted to a prefix."""
+        if not prefix:
+            return len(self._load_keys())
+        return len(self.list_keys(prefix))
+    
+    def has_key(self, key: str) -> bool:
+        """Check whether a key exists without loading its value."""
+        keys = self._load_keys()
+        i = bisect.bisect_left(keys, key)
+        return i < len(keys) and keys[i] == key
     
     def get_memory(self, key: str) -> Optional[Dict[str, Any]]:
         """Get memory data for a specific key."""
         data = self._load_data()
-        return data.get(key)
+        value = data.get(key)
+        # Hand out a copy so callers cannot mutate the shared read cache
+        return copy.deepcopy(value) if value is not None else None
     
     def save_memory(self, key: str, memory_data: Dict[str, Any]) -> None:
         """Save memory data for a specific key."""
-        data = self._load_data()
-        data[key] = memory_data
-        self._save_data(data)
+        with path_lock(self.file_path):
+            data = self._load_data()
+            data[key] = memory_data
+            self._save_data(data)
     
     def delete_memory(self, key: str) -> None:
         """Delete memory data for a specific key."""
-        data = self._load_data()
-        if key in data:
-            del data[key]
-            self._save_data(data)
+        with path_lock(self.file_path):
+            data = self._load_data()
+            if key in data:
+                del data[key]
+                self._save_data(data)
+    
+    def delete_memories(self, keys: List[str]) -> int:
+        """Delete several keys with a single rewrite of the file.
+        
+        Returns:
+            Number of keys that were actually removed.
+        """
+        with path_lock(self.file_path):
+            data = self._load_data()
+            removed = 0
+            for key in keys:
+                if key in data:
+                    del data[key]
+                    removed += 1
+            if removed:
+                self._save_data(data)
+        return removed
 
 class JSONFileChatMessageHistory(BaseChatMessageHistory):
     """Chat message history that stores data in a JSON file."""
@@ -0,0 +1,365 @@
+"""Retention, compaction and archival for persisted run data.
+
+Three kinds of per-run data accumulate on disk:
+- agent conversation memories (``<MEMORY_DIR>/<Agent>_memory.json``, keyed ``{run_id}_{agent_id}``)
+- status updates (``<MEMORY_DIR>/status_updates.json``, keyed by run_id)
+- final reports (``report_<run_id>.json`` in the reports directory)
+
+The retention job expires runs by age and by count, optionally archives them
+into a compressed bundle, and rewrites each affected store once. It can be run
+from the command line or as a periodic task inside the API process.
+"""
+import argparse
+import asyncio
+import io
+import tarfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.atomic_io import write_json_atomic
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.logging.logger import get_logger
+from mdt_agent_system.app.core.memory.persistence import JSONFileMemoryStore
+from mdt_agent_system.app.core.status.storage import JSONStore
+
+logger = get_logger(__name__)
+
+STATUS_FILE_NAME = "status_updates.json"
+MEMORY_FILE_GLOB = "*_memory.json"
+REPORT_FILE_GLOB = "report_*.json"
+LEDGER_FILE_NAME = "retention_state.json"
+
+
+def report_file_path(run_id: str, reports_dir: Optional[str] = None) -> Path:
+    """Return where the final report of a run is written, under ``REPORTS_DIR`` by default."""
+    if reports_dir is None:
+        reports_dir = getattr(get_config(), "REPORTS_DIR", ".")
+    return Path(reports_dir) / f"report_{run_id}.json"
+
+
+class RetentionPolicy(BaseModel):
+    """Limits applied by the retention job."""
+    max_age_days: Optional[float] = Field(default=30.0, description="Expire runs inactive for longer than this; None disables")
+    max_runs: Optional[int] = Field(default=500, description="Keep at most this many most recent runs; None disables")
+    archive: bool = Field(default=True, description="Write expired runs to a compressed bundle before deleting them")
+    archive_dir: Optional[str] = Field(default=None, description="Bundle directory, defaults to <memory_dir>/archive")
+    dry_run: bool = Field(default=False, description="Only report what would be expired")
+
+
+class RetentionReport(BaseModel):
+    """Outcome of a single retention pass."""
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    runs_seen: int = 0
+    expired_runs: List[str] = Field(default_factory=list)
+    archive_path: Optional[str] = None
+    archive_bytes: int = 0
+    files_rewritten: List[str] = Field(default_factory=list)
+    reports_removed: int = 0
+    reclaimed_bytes: int = 0
+    duration_seconds: float = 0.0
+    dry_run: bool = False
+
+
+class _RunRecord(BaseModel):
+    """Where a run's data lives and when it was last active."""
+    run_id: str
+    last_seen: datetime
+    memory_keys: Dict[str, List[str]] = Field(default_factory=dict)
+    has_status: bool = False
+    report_path: Optional[str] = None
+
+
+def _run_id_from_session(session_id: str) -> str:
+    """Memory session IDs are ``{run_id}_{agent_id}``; agent IDs contain no underscore."""
+    return session_id.rsplit("_", 1)[0]
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, str):
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+        except ValueError:
+            return None
+    return None
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except FileNotFoundError:
+        return 0
+
+
+class RetentionJob:
+    """Expires, archives and compacts persisted run data."""
+
+    def __init__(self,
+                 memory_dir: str,
+                 reports_dir: Optional[str] = None,
+                 policy: Optional[RetentionPolicy] = None,
+                 protected_run_ids: Optional[Callable[[], Iterable[str]]] = None):
+        """Initialize the retention job.
+
+        Args:
+            memory_dir: Directory holding agent memories and status updates.
+            reports_dir: Directory holding ``report_<run_id>.json`` files,
+                ``REPORTS_DIR`` by default.
+            policy: Retention limits to apply.
+            protected_run_ids: Optional callable returning run IDs that must not
+                be expired (e.g. runs with live SSE subscribers).
+        """
+        self.memory_dir = Path(memory_dir)
+        self.reports_dir = report_file_path("", reports_dir).parent
+        self.policy = policy or RetentionPolicy()
+        self.protected_run_ids = protected_run_ids
+        self.archive_dir = Path(self.policy.archive_dir) if self.policy.archive_dir else self.memory_dir / "archive"
+        self.ledger_path = self.memory_dir / LEDGER_FILE_NAME
+        self._first_seen: Dict[str, str] = {}
+
+    # --- Discovery ---
+
+    def _load_ledger(self) -> Dict[str, str]:
+        try:
+            with open(self.ledger_path, "rb") as f:
+                return json_codec.load(f).get("first_seen", {})
+        except (json_codec.JSONDecodeError, FileNotFoundError, AttributeError):
+            return {}
+
+    def _save_ledger(self, first_seen: Dict[str, str]) -> None:
+        self.ledger_path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.ledger_path, {"first_seen": first_seen})
+
+    def _memory_stores(self) -> List[JSONFileMemoryStore]:
+        if not self.memory_dir.exists():
+            return []
+        return [
+            JSONFileMemoryStore(str(path))
+            for path in sorted(self.memory_dir.glob(MEMORY_FILE_GLOB))
+        ]
+
+    def _collect_runs(self, now: datetime) -> Dict[str, _RunRecord]:
+        """Build the run catalogue from every store without mutating anything.
+
+        A run's age comes from its status-update timestamps and report file
+        mtime. Runs with neither (memory-only sessions) fall back to the time
+        the retention ledger first saw them.
+        """
+        activity: Dict[str, Optional[datetime]] = {}
+        records: Dict[str, _RunRecord] = {}
+
+        def record(run_id: str) -> _RunRecord:
+            if run_id not in records:
+                records[run_id] = _RunRecord(run_id=run_id, last_seen=now)
+                activity[run_id] = None
+            return records[run_id]
+
+        def touch(run_id: str, stamp: Optional[datetime]) -> None:
+            if stamp is not None and (activity[run_id] is None or stamp > activity[run_id]):
+                activity[run_id] = stamp
+
+        status_path = self.memory_dir / STATUS_FILE_NAME
+        if status_path.exists():
+            for run_id, updates in JSONStore(str(status_path)).get_all().items():
+                record(run_id).has_status = True
+                if isinstance(updates, list):
+                    for update in updates:
+                        if isinstance(update, dict):
+                            touch(run_id, _parse_timestamp(update.get("timestamp")))
+
+        for store in self._memory_stores():
+            # Key listing comes from the sidecar index, values are not parsed
+            for key in store.list_keys():
+                rec = record(_run_id_from_session(key))
+                rec.memory_keys.setdefault(store.file_path.name, []).append(key)
+
+        if self.reports_dir.exists():
+            for path in self.reports_dir.glob(REPORT_FILE_GLOB):
+                run_id = path.stem[len("report_"):]
+                record(run_id).report_path = str(path)
+                touch(run_id, datetime.utcfromtimestamp(path.stat().st_mtime))
+
+        ledger = self._load_ledger()
+        first_seen: Dict[str, str] = {}
+        for run_id, rec in records.items():
+            seen = _parse_timestamp(ledger.get(run_id)) or now
+            first_seen[run_id] = seen.isoformat()
+            rec.last_seen = activity[run_id] or seen
+
+        self._first_seen = first_seen
+        return records
+
+    def _select_expired(self, records: Dict[str, _RunRecord], now: datetime) -> List[_RunRecord]:
+        protected: Set[str] = set(self.protected_run_ids() if self.protected_run_ids else [])
+        newest_first = sorted(records.values(), key=lambda r: r.last_seen, reverse=True)
+        expired: Dict[str, _RunRecord] = {}
+
+        if self.policy.max_age_days is not None:
+            cutoff = now - timedelta(days=self.policy.max_age_days)
+            for rec in newest_first:
+                if rec.last_seen < cutoff:
+                    expired[rec.run_id] = rec
+
+        if self.policy.max_runs is not None:
+            for rec in newest_first[self.policy.max_runs:]:
+                expired[rec.run_id] = rec
+
+        return [rec for rec in newest_first if rec.run_id in expired and rec.run_id not in protected]
+
+    # --- Archival ---
+
+    def _write_archive(self, expired: List[_RunRecord], now: datetime) -> Path:
+        """Write one gzip tarball holding every expired run's data."""
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        bundle_path = self.archive_dir / f"mdt_runs_{now.strftime('%Y%m%dT%H%M%S')}.tar.gz"
+        status_data: Dict[str, Any] = {}
+        status_path = self.memory_dir / STATUS_FILE_NAME
+        if status_path.exists() and any(rec.has_status for rec in expired):
+            status_data = JSONStore(str(status_path)).get_all()
+        stores = {store.file_path.name: store for store in self._memory_stores()}
+
+        def add_json(tar: tarfile.TarFile, name: str, payload: Any) -> None:
+            raw = json_codec.dumpb(payload)
+            info = tarfile.TarInfo(name)
+            info.size = len(raw)
+            info.mtime = int(now.timestamp())
+            tar.addfile(info, io.BytesIO(raw))
+
+        with tarfile.open(bundle_path, "w:gz") as tar:
+            for rec in expired:
+                add_json(tar, f"{rec.run_id}/run.json", {
+                    "run_id": rec.run_id,
+                    "last_seen": rec.last_seen.isoformat(),
+                })
+                if rec.run_id in status_data:
+                    add_json(tar, f"{rec.run_id}/{STATUS_FILE_NAME}", status_data[rec.run_id])
+                for file_name, keys in rec.memory_keys.items():
+                    store = stores.get(file_name)
+                    if store is not None:
+                        add_json(tar, f"{rec.run_id}/memory/{file_name}",
+                                 {key: store.get_memory(key) for key in keys})
+                if rec.report_path and Path(rec.report_path).exists():
+                    tar.add(rec.report_path, arcname=f"{rec.run_id}/{Path(rec.report_path).name}")
+        return bundle_path
+
+    # --- Deletion and compaction ---
+
+    def _delete(self, expired: List[_RunRecord], report: RetentionReport) -> None:
+        expired_ids = [rec.run_id for rec in expired]
+
+        status_path = self.memory_dir / STATUS_FILE_NAME
+        if status_path.exists() and any(rec.has_status for rec in expired):
+            before = _file_size(status_path)
+            if JSONStore(str(status_path)).delete_many(expired_ids):
+                report.files_rewritten.append(str(status_path))
+                report.reclaimed_bytes += before - _file_size(status_path)
+
+        keys_by_file: Dict[str, List[str]] = {}
+        for rec in expired:
+            for file_name, keys in rec.memory_keys.items():
+                keys_by_file.setdefault(file_name, []).extend(keys)
+        for file_name, keys in keys_by_file.items():
+            path = self.memory_dir / file_name
+            before = _file_size(path)
+            if JSONFileMemoryStore(str(path)).delete_memories(keys):
+                report.files_rewritten.append(str(path))
+                report.reclaimed_bytes += before - _file_size(path)
+
+        for rec in expired:
+            if rec.report_path:
+                path = Path(rec.report_path)
+                size = _file_size(path)
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    continue
+                report.reports_removed += 1
+                report.reclaimed_bytes += size
+
+    def run(self) -> RetentionReport:
+        """Run a single retention pass and return what it did."""
+        now = datetime.utcnow()
+        report = RetentionReport(started_at=now, dry_run=self.policy.dry_run)
+        records = self._collect_runs(now)
+        report.runs_seen = len(records)
+        expired = self._select_expired(records, now)
+        report.expired_runs = [rec.run_id for rec in expired]
+
+        if expired and not self.policy.dry_run:
+            if self.policy.archive:
+                bundle_path = self._write_archive(expired, now)
+                report.archive_path = str(bundle_path)
+                report.archive_bytes = _file_size(bundle_path)
+            self._delete(expired, report)
+            for run_id in report.expired_runs:
+                self._first_seen.pop(run_id, None)
+
+        if not self.policy.dry_run:
+            self._save_ledger(self._first_seen)
+
+        report.duration_seconds = (datetime.utcnow() - now).total_seconds()
+        logger.info(
+            f"Retention pass expired {len(report.expired_runs)} of {report.runs_seen} runs, "
+            f"reclaimed {report.reclaimed_bytes} bytes",
+            extra={"archive_path": report.archive_path, "dry_run": report.dry_run}
+        )
+        return report
+
+
+async def run_retention_periodically(job: RetentionJob,
+                                     interval_seconds: float,
+                                     on_evicted: Optional[Callable[[List[str]], None]] = None) -> None:
+    """Run the retention job forever, off the event loop, every ``interval_seconds``.
+
+    Safe next to the API's own saves: every store serializes its
+    read-modify-write cycles on a per-file lock and replaces files atomically.
+
+    Args:
+        job: The configured retention job.
+        interval_seconds: Delay between passes.
+        on_evicted: Optional callback receiving expired run IDs, used to drop
+            in-memory caches that mirror the deleted data.
+    """
+    while True:
+        try:
+            report = await asyncio.to_thread(job.run)
+            if on_evicted and report.expired_runs and not report.dry_run:
+                on_evicted(report.expired_runs)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Retention pass failed: {e}", exc_info=True)
+        await asyncio.sleep(interval_seconds)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: ``python -m mdt_agent_system.app.core.memory.retention``."""
+    parser = argparse.ArgumentParser(description="Expire, archive and compact MDT run data.")
+    parser.add_argument("--memory-dir", default="memory_data", help="Directory with agent memories and status updates")
+    parser.add_argument("--reports-dir", default=None, help="Directory with report_<run_id>.json files, defaults to REPORTS_DIR")
+    parser.add_argument("--max-age-days", type=float, default=30.0, help="Expire runs older than this (<=0 disables)")
+    parser.add_argument("--max-runs", type=int, default=500, help="Keep at most this many recent runs (<=0 disables)")
+    parser.add_argument("--archive-dir", default=None, help="Where to write compressed bundles")
+    parser.add_argument("--no-archive", action="store_true", help="Delete expired runs without archiving them")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be expired")
+    args = parser.parse_args(argv)
+
+    policy = RetentionPolicy(
+        max_age_days=args.max_age_days if args.max_age_days > 0 else None,
+        max_runs=args.max_runs if args.max_runs > 0 else None,
+        archive=not args.no_archive,
+        archive_dir=args.archive_dir,
+        dry_run=args.dry_run,
+    )
+    report = RetentionJob(args.memory_dir, args.reports_dir, policy).run()
+    print(report.model_dump_json(indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,89 +1,422 @@
-import json
 import logging
-from typing import Optional, Dict, Any
+import re
+import threading
+from collections import Counter
+from typing import Optional, Dict, Any, List, Literal
 
+from pydantic import BaseModel, Field
+
+from .json_repair import JSONRepairError, loads_tolerant
 from .schemas.agent_output import AgentOutput
 
 logger = logging.getLogger(__name__)
 
+# Metadata parse outcomes per agent, see metadata_repair_stats()
+_repair_stats: Dict[str, Dict[str, Any]] = {}
+_repair_stats_lock = threading.Lock()
+
+
+def _agent_repair_stats(agent_id: str) -> Dict[str, Any]:
+    """Return the mutable statistics entry of an agent; call with the lock held."""
+    stats = _repair_stats.get(agent_id)
+    if stats is None:
+        stats = _repair_stats[agent_id] = {
+            "parsed": 0, "repaired": 0, "failed": 0, "missing": 0, "repairs": Counter(),
+            "retries": 0, "retry_calls": 0, "retry_recovered": 0, "retry_tokens": 0,
+        }
+    return stats
+
+# Anchored on a literal newline rather than re.MULTILINE '^', which re tries at every offset
+_HEADER_LINE_RE = re.compile(r"\n(#{1,6})[ \t]+([^\n]*)")
+_BULLET_RE = re.compile(r"\n[-*][ \t]+([^\n]*)")
+
+
+class MarkdownSection:
+    """One header of a ``MarkdownOutline`` and the span of text it owns.
+
+    ``body`` runs to the next header of any level; ``block`` also includes
+    nested subsections and runs to the next header of the same or a higher level.
+    """
+
+    __slots__ = ("title", "level", "_text", "start", "end", "block_end")
+
+    def __init__(self, title: str, level: int, text: str, start: int, end: int):
+        self.title = title
+        self.level = level
+        self._text = text
+        self.start = start
+        self.end = end
+        self.block_end = end
+
+    @property
+    def body(self) -> str:
+        """Text under the header up to the next header, stripped."""
+        return self._text[self.start:self.end].strip()
+
+    @property
+    def block(self) -> str:
+        """Text under the header including nested subsections, stripped."""
+        return self._text[self.start:self.block_end].strip()
+
+    @property
+    def first_line(self) -> str:
+        """First non-blank line of the body, or an empty string."""
+        for line in self._text[self.start:self.end].splitlines():
+            if line.strip():
+                return line.strip()
+        return ""
+
+    def bullets(self, include_subsections: bool = False) -> List[str]:
+        """Return unindented ``-``/``*`` list items with their markers removed."""
+        end = self.block_end if include_subsections else self.end
+        items = (match.group(1).strip() for match in _BULLET_RE.finditer(self._text, self.start, end))
+        return [item for item in items if item]
+
+    def __repr__(self) -> str:
+        return f"MarkdownSection(title={self.title!r}, level={self.level})"
+
+
+class MarkdownOutline:
+    """Header outline of a markdown document, built in one regex pass.
+
+    Agents look sections up by title instead of re-scanning the text per
+    section. Text before the first header is available as ``preamble``.
+    """
+
+    def __init__(self, markdown: str):
+        """Index every header of ``markdown``.
+
+        Args:
+            markdown: Markdown text, typically ``AgentOutput.markdown_content``
+        """
+        self.text = markdown or ""
+        self.sections: List[MarkdownSection] = []
+        # Offsets index the newline-prefixed copy so a header on the first line matches too
+        text = "\n" + self.text
+        preamble_end = len(text)
+        previous: Optional[MarkdownSection] = None
+        for match in _HEADER_LINE_RE.finditer(text):
+            if previous is None:
+                preamble_end = match.start()
+            else:
+                previous.end = previous.block_end = match.start()
+            title = match.group(2).rstrip(" \t#\r")
+            previous = MarkdownSection(title, len(match.group(1)), text, match.end(), len(text))
+            self.sections.append(previous)
+        self.preamble = text[:preamble_end].strip()
+
+        # Extend each block over the deeper headers nested under it
+        open_sections: List[MarkdownSection] = []
+        for section in self.sections:
+            while open_sections and open_sections[-1].level >= section.level:
+                open_sections.pop()
+            for parent in open_sections:
+                parent.block_end = section.block_end
+            open_sections.append(section)
+
+        self._by_title: Dict[str, MarkdownSection] = {}
+        for section in self.sections:
+            self._by_title.setdefault(section.title.lower(), section)
+
+    def find(self, *titles: str, level: Optional[int] = None) -> Optional[MarkdownSection]:
+        """Return the first section matching any of ``titles``.
+
+        Titles are tried in order and compared case-insensitively, exactly
+        first and then as a prefix of the header text, so "Treatment Guidelines"
+        also matches "Treatment Guidelines (NCCN)".
+
+        Args:
+            titles: Accepted header texts, without the leading '#'
+            level: Only match headers of this level
+
+        Returns:
+            The matching section, or None
+        """
+        for title in titles:
+            section = self._by_title.get(title.lower())
+            if section is not None and (level is None or section.level == level):
+                return section
+        for title in titles:
+            prefix = title.lower()
+            for section in self.sections:
+                if (level is None or section.level == level) and section.title.lower().startswith(prefix):
+                    return section
+        return None
+
+    def subsections(self, section: MarkdownSection) -> List[MarkdownSection]:
+        """Return the headers nested under ``section``, in document order."""
+        return [s for s in self.sections if section.end <= s.start <= section.block_end and s is not section]
+
+    def bullets(self, *titles: str, include_subsections: bool = False) -> List[str]:
+        """Return the list items of the first section matching ``titles``, or an empty list."""
+        section = self.find(*titles)
+        return section.bullets(include_subsections) if section is not None else []
+
+
+def parse_markdown_outline(markdown: str) -> MarkdownOutline:
+    """Build the header outline of ``markdown`` in a single pass."""
+    return MarkdownOutline(markdown)
+
+
+class StreamEvent(BaseModel):
+    """An incremental result of ``StreamingOutputParser.feed``."""
+    kind: Literal["section", "metadata"] = Field(..., description="Completed markdown section or parsed metadata block")
+    title: Optional[str] = Field(None, description="Section header text, None for text before the first header")
+    level: int = Field(0, description="Header level (number of '#'), 0 for text before the first header")
+    content: str = Field("", description="Section body without the header line")
+    metadata: Optional[Dict[str, Any]] = Field(None, description="Parsed metadata for metadata events")
+
+
+class StreamingOutputParser:
+    """Incremental parser for the ``---MARKDOWN---`` / ``---METADATA---`` protocol.
+
+    Token chunks are passed to ``feed``, which returns the markdown sections
+    completed by that chunk and, as soon as the JSON object after the metadata
+    delimiter closes, the parsed metadata. Only the unfinished tail of the
+    stream is buffered; ``close`` returns the final ``AgentOutput``.
+    """
+
+    def __init__(self, markdown_delimiter: str, metadata_delimiter: str, parse_metadata):
+        """Initialize the parser.
+
+        Args:
+            markdown_delimiter: Marker that starts the markdown section
+            metadata_delimiter: Marker that starts the metadata JSON
+            parse_metadata: Converts the metadata JSON string to a dict
+        """
+        self._markdown_delimiter = markdown_delimiter
+        self._metadata_delimiter = metadata_delimiter
+        self._parse_metadata = parse_metadata
+        self._state = "preamble"
+        self._pending = ""
+        self._searched = 0
+        self._markdown: List[str] = []
+        self._section: Optional[StreamEvent] = None
+        self._section_parts: List[str] = []
+        self._metadata_text: List[str] = []
+        self._metadata_length = 0
+        self._json_start: Optional[int] = None
+        self._depth = 0
+        # Quote character of the JSON string being scanned; models sometimes write single-quoted JSON
+        self._quote: Optional[str] = None
+        self._escaped = False
+        self.metadata: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: str) -> List[StreamEvent]:
+        """Consume a chunk of LLM output.
+
+        Returns:
+            Sections completed and metadata parsed by this chunk, in order
+        """
+        events: List[StreamEvent] = []
+        self._pending += chunk
+        if self._state == "preamble":
+            self._scan_preamble()
+        if self._state == "markdown":
+            self._scan_markdown(events, final=False)
+        if self._state == "metadata":
+            self._scan_metadata(events)
+        if self._state == "done":
+            self._pending = ""
+        return events
+
+    def close(self) -> AgentOutput:
+        """Flush buffered text and return the complete parsed output."""
+        if self._state == "preamble":
+            logger.warning(f"Missing {self._markdown_delimiter} section")
+            markdown, self._pending = self._pending, ""
+            return AgentOutput(markdown_content=markdown, metadata=self._parse_metadata(None))
+
+        events: List[StreamEvent] = []
+        if self._state == "markdown":
+            self._scan_markdown(events, final=True)
+            logger.warning(f"Missing {self._metadata_delimiter} section")
+            self.metadata = self._parse_metadata(None)
+        elif self._state == "metadata":
+            # The JSON object never closed; fall back to parsing everything after the delimiter
+            self.metadata = self._parse_metadata("".join(self._metadata_text).strip())
+            self._state = "done"
+        return AgentOutput(markdown_content="".join(self._markdown).strip(), metadata=self.metadata or {})
+
+    def _scan_preamble(self) -> None:
+        """Skip text up to the markdown delimiter, keeping it in case none arrives."""
+        index = self._pending.find(self._markdown_delimiter, self._searched)
+        if index < 0:
+            self._searched = max(0, len(self._pending) - len(self._markdown_delimiter) + 1)
+            return
+        self._pending = self._pending[index + len(self._markdown_delimiter):]
+        self._searched = 0
+        self._state = "markdown"
+
+    def _scan_markdown(self, events: List[StreamEvent], final: bool) -> None:
+        """Consume complete markdown lines, closing sections at headers and the metadata delimiter."""
+        index = self._pending.find(self._metadata_delimiter)
+        if index >= 0:
+            text, self._pending = self._pending[:index], self._pending[index + len(self._metadata_delimiter):]
+            self._state = "metadata"
+        elif final:
+            text, self._pending = self._pending, ""
+        else:
+            # Hold back the partial last line; it may be a header or a split delimiter
+            cut = self._pending.rfind("\n") + 1
+            text, self._pending = self._pending[:cut], self._pending[cut:]
+
+        if text:
+            self._markdown.append(text)
+            # Chunks start at a line boundary, so the newline prefix lets a leading header match
+            padded = "\n" + text
+            last = 1
+            for match in _HEADER_LINE_RE.finditer(padded):
+                self._section_parts.append(padded[last:match.start()])
+                self._finish_section(events)
+                self._section = StreamEvent(
+                    kind="section", title=match.group(2).rstrip(" \t#\r"), level=len(match.group(1))
+                )
+                last = match.end()
+            self._section_parts.append(padded[last:])
+        if self._state != "markdown" or final:
+            self._finish_section(events)
+
+    def _finish_section(self, events: List[StreamEvent]) -> None:
+        """Emit the section being built, skipping empty text before the first header."""
+        content = "".join(self._section_parts).strip()
+        self._section_parts = []
+        section, self._section = self._section, None
+        if section is None:
+            if not content:
+                return
+            section = StreamEvent(kind="section")
+        section.content = content
+        events.append(section)
+
+    def _scan_metadata(self, events: List[StreamEvent]) -> None:
+        """Track JSON nesting and parse the metadata object as soon as it closes."""
+        text, self._pending = self._pending, ""
+        offset = self._metadata_length
+        self._metadata_text.append(text)
+        self._metadata_length += len(text)
+        for position, char in enumerate(text, offset):
+            if self._quote is not None:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in "\"'":
+                if self._json_start is not None:
+                    self._quote = char
+            elif char == "{":
+                if self._json_start is None:
+                    self._json_start = position
+                self._depth += 1
+            elif char == "}" and self._json_start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    block = "".join(self._metadata_text)[self._json_start:position + 1]
+                    self.metadata = self._parse_metadata(block)
+                    self._metadata_text = []
+                    self._state = "done"
+                    events.append(StreamEvent(kind="metadata", metadata=self.metadata))
+                    return
+
+
 class MDTOutputParser:
     """Parser for converting LLM outputs into structured AgentOutput format."""
-    
+
     MARKDOWN_DELIMITER = "---MARKDOWN---"
     METADATA_DELIMITER = "---METADATA---"
-    
-    def __init__(self):
-        """Initialize the MDT output parser."""
-        pass
-    
-    def _extract_sections(self, llm_output: str) -> tuple[Optional[str], Optional[str]]:
-        """
-        Extract markdown and metadata sections from LLM output.
-        
+
+    def __init__(self, agent_id: Optional[str] = None):
+        """Initialize the MDT output parser.
+
         Args:
-            llm_output: Raw LLM output string
-            
-        Returns:
-            Tuple of (markdown_content, metadata_json_str)
+            agent_id: Agent whose metadata repair statistics this parser records
         """
-        try:
-            # Split on markdown section
-            parts = llm_output.split(self.MARKDOWN_DELIMITER)
-            if len(parts) != 2:
-                logger.warning(f"Missing {self.MARKDOWN_DELIMITER} section")
-                return llm_output, None
-                
-            # Split metadata section
-            markdown_and_metadata = parts[1].split(self.METADATA_DELIMITER)
-            if len(markdown_and_metadata) != 2:
-                logger.warning(f"Missing {self.METADATA_DELIMITER} section")
-                return markdown_and_metadata[0].strip(), None
-                
-            return markdown_and_metadata[0].strip(), markdown_and_metadata[1].strip()
-            
-        except Exception as e:
-            logger.error(f"Error extracting sections: {str(e)}")
-            return llm_output, None
-    
+        self.agent_id = agent_id or "unknown"
+
+    def stream(self) -> StreamingOutputParser:
+        """Return an incremental parser for one LLM response."""
+        return StreamingOutputParser(self.MARKDOWN_DELIMITER, self.METADATA_DELIMITER, self._parse_metadata)
+
     def _parse_metadata(self, metadata_str: Optional[str]) -> Dict[str, Any]:
         """
         Parse metadata JSON string into dictionary.
-        
+
+        Malformed JSON is repaired locally (code fences, trailing commas,
+        template range placeholders, truncation); the outcome is counted in
+        this agent's repair statistics.
+
         Args:
             metadata_str: JSON string containing metadata
-            
+
         Returns:
             Dictionary of metadata or empty dict if parsing fails
         """
         if not metadata_str:
+            self._record("missing")
             return {}
-            
+
         try:
-            return json.loads(metadata_str)
-        except json.JSONDecodeError as e:
+            metadata, fixes = loads_tolerant(metadata_str)
+        except JSONRepairError as e:
             logger.error(f"Error parsing metadata JSON: {str(e)}")
+            self._record("failed")
+            return {}
+        if not isinstance(metadata, dict):
+            logger.error(f"Metadata JSON is a {type(metadata).__name__}, expected an object")
+            self._record("failed")
             return {}
-    
-    def parse_llm_output(self, llm_output: str, preserve_legacy: bool = True) -> AgentOutput:
+        if fixes:
+            logger.warning(f"Repaired {self.agent_id} metadata JSON: {', '.join(fixes)}")
+        self._record("repaired" if fixes else "parsed", fixes)
+        return metadata
+
+    def _record(self, outcome: str, fixes: Optional[List[str]] = None) -> None:
+        """Count one metadata parse outcome for this agent."""
+        with _repair_stats_lock:
+            stats = _agent_repair_stats(self.agent_id)
+            stats[outcome] += 1
+            stats["repairs"].update(fixes or ())
+
+    def record_metadata_retry(self, attempts: int, recovered: bool, tokens: int) -> None:
+        """Count follow-up LLM calls made to fix this agent's metadata fields."""
+        with _repair_stats_lock:
+            stats = _agent_repair_stats(self.agent_id)
+            stats["retries"] += 1
+            stats["retry_calls"] += attempts
+            stats["retry_recovered"] += int(recovered)
+            stats["retry_tokens"] += tokens
+
+    def parse_llm_output(self, llm_output: str, preserve_legacy: bool = False) -> AgentOutput:
         """
         Parse LLM output into structured AgentOutput format.
-        
+
         Args:
             llm_output: Raw output string from LLM
             preserve_legacy: Whether to store original output in legacy_output field
-            
+
         Returns:
             AgentOutput object containing parsed content
         """
-        # Extract markdown and metadata sections
-        markdown_content, metadata_str = self._extract_sections(llm_output)
-        
-        # Parse metadata
-        metadata = self._parse_metadata(metadata_str)
-        
-        # Create AgentOutput
-        return AgentOutput(
-            markdown_content=markdown_content,
-            metadata=metadata,
-            legacy_output={"raw_output": llm_output} if preserve_legacy else None
-        ) 
\ No newline at end of file
+        parser = self.stream()
+        parser.feed(llm_output)
+        output = parser.close()
+        if preserve_legacy:
+            output.legacy_output = {"raw_output": llm_output}
+        return output
+
+
+def metadata_repair_stats() -> Dict[str, Dict[str, Any]]:
+    """Return metadata parse outcomes and repair kinds per agent."""
+    with _repair_stats_lock:
+        return {
+            agent_id: {**stats, "repairs": dict(stats["repairs"])}
+            for agent_id, stats in _repair_stats.items()
+        }
+
+
+def reset_metadata_repair_stats() -> None:
+    """Clear the per-agent metadata repair statistics."""
+    with _repair_stats_lock:
+        _repair_stats.clear()
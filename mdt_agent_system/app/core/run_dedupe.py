@@ -0,0 +1,122 @@
+"""Deduplication of repeated simulation submissions.
+
+A submission carrying an ``Idempotency-Key`` that was already seen within
+``IDEMPOTENCY_KEY_TTL_SECONDS`` is attached to the run it started. When
+``CASE_DEDUPE_WINDOW_MINUTES`` is set, an identical patient case submitted
+within that window is attached to the earlier run as well. Runs that fail
+are forgotten so a retry starts a fresh one.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.schemas import PatientCase
+
+# Longest accepted Idempotency-Key header value
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+class IdempotencyKeyConflictError(ValueError):
+    """The Idempotency-Key was already used for a different patient case."""
+
+    def __init__(self, run_id: str):
+        super().__init__("Idempotency-Key was already used for a different patient case.")
+        self.run_id = run_id
+
+
+def case_fingerprint(patient_case: PatientCase) -> str:
+    """SHA-256 of the case content; a defaulted ``created_at`` is left out."""
+    exclude = set() if "created_at" in patient_case.model_fields_set else {"created_at"}
+    data = patient_case.model_dump(mode="json", exclude=exclude)
+    return hashlib.sha256(json_codec.dumpb(data, sort_keys=True)).hexdigest()
+
+
+class RunDeduplicator:
+    """Maps idempotency keys and case fingerprints to the run they started."""
+
+    def __init__(self, key_ttl: float = 24 * 3600.0, case_window: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Initialize the deduplicator.
+
+        Args:
+            key_ttl: Seconds an idempotency key stays attached to its run
+            case_window: Seconds an identical case is attached to its run, None to only use keys
+            clock: Monotonic time source
+        """
+        self.key_ttl = key_ttl
+        self.case_window = case_window
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Entries are inserted with a fixed lifetime, so the oldest expires first
+        self._keys: "OrderedDict[str, Tuple[str, str, float]]" = OrderedDict()
+        self._cases: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+
+    def _prune(self, now: float) -> None:
+        for entries in (self._keys, self._cases):
+            while entries and next(iter(entries.values()))[-1] <= now:
+                entries.popitem(last=False)
+
+    def claim(self, run_id: str, patient_case: PatientCase, idempotency_key: Optional[str] = None) -> str:
+        """Return the run a submission belongs to: an earlier duplicate's run, or ``run_id`` itself.
+
+        Raises:
+            IdempotencyKeyConflictError: If ``idempotency_key`` started a run for a different case
+        """
+        if idempotency_key is None and self.case_window is None:
+            return run_id
+        fingerprint = case_fingerprint(patient_case)
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            if idempotency_key is not None and idempotency_key in self._keys:
+                existing, existing_fingerprint, _ = self._keys[idempotency_key]
+                if existing_fingerprint != fingerprint:
+                    raise IdempotencyKeyConflictError(existing)
+                return existing
+            if self.case_window is not None and fingerprint in self._cases:
+                existing = self._cases[fingerprint][0]
+                if idempotency_key is not None:
+                    self._keys[idempotency_key] = (existing, fingerprint, now + self.key_ttl)
+                return existing
+            if idempotency_key is not None:
+                self._keys[idempotency_key] = (run_id, fingerprint, now + self.key_ttl)
+            if self.case_window is not None:
+                self._cases[fingerprint] = (run_id, now + self.case_window)
+            return run_id
+
+    def forget(self, run_id: str) -> None:
+        """Stop attaching submissions to ``run_id``."""
+        with self._lock:
+            for entries in (self._keys, self._cases):
+                for name in [name for name, entry in entries.items() if entry[0] == run_id]:
+                    del entries[name]
+
+
+_default_deduplicator: Optional[RunDeduplicator] = None
+_default_deduplicator_lock = threading.Lock()
+
+
+def get_run_deduplicator() -> RunDeduplicator:
+    """Return the process-wide deduplicator configured from settings."""
+    global _default_deduplicator
+    if _default_deduplicator is None:
+        with _default_deduplicator_lock:
+            if _default_deduplicator is None:
+                config = get_config()
+                window_minutes = getattr(config, "CASE_DEDUPE_WINDOW_MINUTES", None)
+                _default_deduplicator = RunDeduplicator(
+                    key_ttl=getattr(config, "IDEMPOTENCY_KEY_TTL_SECONDS", 24 * 3600.0),
+                    case_window=window_minutes * 60 if window_minutes is not None else None,
+                )
+    return _default_deduplicator
+
+
+def reset_run_deduplicator() -> None:
+    """Drop the deduplicator so the next submission picks up the current configuration."""
+    global _default_deduplicator
+    with _default_deduplicator_lock:
+        _default_deduplicator = None
@@ -0,0 +1,79 @@
+"""Server-wide limit on concurrently running simulations.
+
+Every run makes a chain of LLM calls, so ``MAX_CONCURRENT_RUNS`` caps how
+many run at once. Single uploads wait for a slot inside their background
+task; the batch endpoint waits before admitting each case, which also stops
+it reading the request body until a running simulation finishes.
+"""
+import asyncio
+import threading
+import weakref
+from typing import Optional
+
+from mdt_agent_system.app.core.config import get_config
+
+
+class RunLimiter:
+    """Counts running simulations and makes new ones wait past ``max_runs``."""
+
+    def __init__(self, max_runs: Optional[int] = None):
+        """Initialize the limiter.
+
+        Args:
+            max_runs: Simulations allowed to run at once, None for no limit
+        """
+        self.max_runs = max_runs
+        self.running = 0
+        self.waiting = 0
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _semaphore(self) -> Optional[asyncio.Semaphore]:
+        """Return the slot semaphore for the running event loop."""
+        if self.max_runs is None:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_runs)
+        return semaphore
+
+    async def acquire(self) -> None:
+        """Wait for a free run slot; pair every call with ``release``."""
+        semaphore = self._semaphore()
+        if semaphore is not None:
+            self.waiting += 1
+            try:
+                await semaphore.acquire()
+            finally:
+                self.waiting -= 1
+        self.running += 1
+
+    def release(self) -> None:
+        """Free the slot of a finished run."""
+        self.running -= 1
+        semaphore = self._semaphore()
+        if semaphore is not None:
+            semaphore.release()
+
+
+_default_limiter: Optional[RunLimiter] = None
+_default_limiter_lock = threading.Lock()
+
+
+def get_run_limiter() -> RunLimiter:
+    """Return the process-wide run limiter, sized by ``MAX_CONCURRENT_RUNS``."""
+    global _default_limiter
+    if _default_limiter is None:
+        with _default_limiter_lock:
+            if _default_limiter is None:
+                _default_limiter = RunLimiter(getattr(get_config(), "MAX_CONCURRENT_RUNS", None))
+    return _default_limiter
+
+
+def reset_run_limiter() -> None:
+    """Drop the limiter so the next run picks up the current configuration."""
+    global _default_limiter
+    with _default_limiter_lock:
+        _default_limiter = None
@@ -1,7 +1,8 @@
-import json
 import os
 from pathlib import Path
 
+from mdt_agent_system.app.core import json_codec
+
 def get_sample_case():
     """
     Loads the sample patient case from the JSON file.
@@ -18,7 +19,7 @@ def get_sample_case():
         raise FileNotFoundError(f"Sample patient case file not found at {sample_case_path}")
     
     # Load the JSON file
-    with open(sample_case_path, "r") as f:
-        patient_case = json.load(f)
+    with open(sample_case_path, "rb") as f:
+        patient_case = json_codec.load(f)
     
     return patient_case 
\ No newline at end of file
@@ -1,6 +1,36 @@
-"""Agent prompt templates for the MDT system."""
+"""Agent prompt templates for the MDT system.
+
+Templates are compiled once by a ``PromptRegistry``: the shared intro and
+ethics blocks are substituted, the result is parsed into a
+``ChatPromptTemplate`` and tagged with a content hash. Files in
+``PROMPT_TEMPLATE_DIR`` named ``<agent_type>.txt`` or
+``<agent_type>_template.txt`` override the built-in templates and are
+reloaded when they change.
+
+Rendered prompts are laid out for provider-side prefix caching, most stable
+part first: the system message shared by every agent and run, then an
+optional per-run section (the patient case) shared by a run's stages, then
+the agent's instructions followed by the stage context and task.
+"""
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.logging import get_logger
 
-from typing import Dict
+logger = get_logger(__name__)
+
+# Seconds between checks of the template directory when hot reload is enabled
+SOURCE_CHECK_INTERVAL = 2.0
 
 # Common elements that can be reused across prompts
 MEDICAL_EXPERTISE_INTRO = """You are an expert medical professional with extensive experience in multidisciplinary team (MDT) settings. 
@@ -14,6 +44,12 @@ ETHICAL_GUIDELINES = """Always maintain:
 4. Recognition of limitations and uncertainties
 5. Focus on patient-centered care"""
 
+# System message of every agent: identical across agents and runs, so it is always a cacheable prefix
+SHARED_PREFIX = f"{MEDICAL_EXPERTISE_INTRO}\n\n{ETHICAL_GUIDELINES}"
+
+_PLACEHOLDER_RE = re.compile(r"\{(context|task)\}")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
 # Coordinator Agent Template
 COORDINATOR_TEMPLATE = """
 {medical_expertise}
@@ -293,6 +329,241 @@ Remember:
 4. Focus only on information that would immediately impact clinical decisions
 """
 
+BUILTIN_TEMPLATES: Dict[str, str] = {
+    "coordinator": COORDINATOR_TEMPLATE,
+    "ehr": EHR_TEMPLATE,
+    "imaging": IMAGING_TEMPLATE,
+    "pathology": PATHOLOGY_TEMPLATE,
+    "guideline": GUIDELINE_TEMPLATE,
+    "specialist": SPECIALIST_TEMPLATE,
+    "evaluation": EVALUATION_TEMPLATE,
+    "summary": SUMMARY_TEMPLATE
+}
+
+
+def template_version(text: str) -> str:
+    """Return the short content hash that identifies a compiled template."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class CompiledPrompt:
+    """A template compiled once and ready to render.
+
+    ``version`` is a hash of the compiled text, so it changes whenever the
+    template or the shared blocks change and can key caches or tag A/B runs.
+    """
+    agent_type: str
+    text: str
+    version: str
+    chat_template: ChatPromptTemplate = field(repr=False, compare=False)
+    source: Optional[str] = None
+    instructions: str = ""
+    stage: str = ""
+
+    def format_messages(self, context: str, task: str, shared: Optional[str] = None,
+                        prefix_cached: bool = False) -> List[BaseMessage]:
+        """Render the prompt messages for one call, stable prefix first.
+
+        The per-run section opens the user message rather than being a message
+        of its own, since Gemini expects user and model turns to alternate.
+
+        Args:
+            context: Stage context prepared by the agent
+            task: Stage task
+            shared: Per-run section shared by all stages of a run, if any
+            prefix_cached: The system message and ``shared`` are held in a
+                provider context cache, so leave them out
+        """
+        values = {"context": context, "task": task}
+        stage = _PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], self.stage)
+        parts = [self.instructions, stage] if prefix_cached else [shared, self.instructions, stage]
+        user = HumanMessage(content="\n\n".join(part for part in parts if part))
+        return [user] if prefix_cached else [SystemMessage(content=SHARED_PREFIX), user]
+
+
+def render_shared_case(patient_case: Any) -> str:
+    """Render the per-run patient case section; identical text for every stage of a run."""
+    data = patient_case.model_dump(mode="json")
+    return "Patient Case (shared by all MDT stages of this run):\n" + json_codec.dumps(data, indent=True, sort_keys=True)
+
+
+def _split_stage(body: str) -> Tuple[str, str]:
+    """Split a template body into static instructions and the context/task block.
+
+    The block is the ``{context}`` line with its label line (the line before,
+    when it ends with a colon) and the ``{task}`` line.
+    """
+    lines = body.split("\n")
+    stage_lines: List[int] = []
+    for placeholder in ("{context}", "{task}"):
+        index = next((i for i, line in enumerate(lines) if placeholder in line), None)
+        if index is None or index in stage_lines:
+            continue
+        if placeholder == "{context}" and index > 0 and lines[index - 1].strip().endswith(":"):
+            stage_lines.append(index - 1)
+        stage_lines.append(index)
+    instructions = "\n".join(line for i, line in enumerate(lines) if i not in stage_lines)
+    stage = "\n".join(lines[i] for i in stage_lines)
+    if "{task}" in stage and "{context}" in stage:
+        stage = stage.replace("\nTask:", "\n\nTask:", 1)
+    return _BLANK_LINES_RE.sub("\n\n", instructions).strip(), stage.strip()
+
+
+def compile_prompt(agent_type: str, template: str, source: Optional[str] = None) -> CompiledPrompt:
+    """Substitute the shared blocks into a template and parse it once.
+
+    The full text keeps the template's own layout and defines the version;
+    rendering moves the shared blocks into the system message and the
+    context/task block after the agent's instructions.
+    """
+    placeholders = {"context": "{context}", "task": "{task}"}  # Left as placeholders for actual use
+    text = template.format(
+        medical_expertise=MEDICAL_EXPERTISE_INTRO,
+        ethical_guidelines=ETHICAL_GUIDELINES,
+        **placeholders
+    )
+    instructions, stage = _split_stage(template.format(medical_expertise="", ethical_guidelines="", **placeholders))
+    return CompiledPrompt(
+        agent_type=agent_type,
+        text=text,
+        version=template_version(text),
+        chat_template=ChatPromptTemplate.from_template(text),
+        source=source,
+        instructions=instructions,
+        stage=stage
+    )
+
+
+def _override_files(directory: Path) -> Dict[str, Path]:
+    """Map agent types to override files in ``directory``."""
+    files: Dict[str, Path] = {}
+    for path in sorted(directory.glob("*.txt")):
+        agent_type = path.stem.lower()
+        if agent_type.endswith("_template"):
+            agent_type = agent_type[:-len("_template")]
+        if agent_type in BUILTIN_TEMPLATES:
+            files[agent_type] = path
+    return files
+
+
+class PromptRegistry:
+    """Compiled prompt templates, optionally overridden from a directory.
+
+    Override files are re-read when their modification time or size changes,
+    checked at most every ``SOURCE_CHECK_INTERVAL`` seconds when
+    ``hot_reload`` is set, or on an explicit ``reload()``.
+    """
+
+    def __init__(self, template_dir: Optional[str] = None, hot_reload: bool = False):
+        self.template_dir = Path(template_dir) if template_dir else None
+        self.hot_reload = hot_reload
+        self._lock = threading.Lock()
+        self._prompts: Dict[str, CompiledPrompt] = {}
+        self._signature: Tuple[Tuple[str, int, int], ...] = ()
+        self._last_check = 0.0
+        self.reload()
+
+    def _file_signature(self) -> Tuple[Tuple[str, int, int], ...]:
+        if self.template_dir is None or not self.template_dir.is_dir():
+            return ()
+        signature = []
+        for path in _override_files(self.template_dir).values():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def reload(self) -> Dict[str, str]:
+        """Recompile all templates, reading override files again.
+
+        An override that fails to compile is logged and the built-in template kept.
+
+        Returns:
+            Agent type to template version after the reload
+        """
+        with self._lock:
+            signature = self._file_signature()
+            overrides = _override_files(self.template_dir) if signature else {}
+            prompts: Dict[str, CompiledPrompt] = {}
+            for agent_type, template in BUILTIN_TEMPLATES.items():
+                path = overrides.get(agent_type)
+                if path is not None:
+                    try:
+                        prompts[agent_type] = compile_prompt(agent_type, path.read_text(encoding="utf-8"), str(path))
+                        continue
+                    except (OSError, KeyError, IndexError, ValueError) as e:
+                        logger.error(f"Ignoring prompt template override {path}: {e}")
+                current = self._prompts.get(agent_type)
+                # Built-in templates never change within a process, so keep them compiled
+                prompts[agent_type] = current if current is not None and current.source is None else compile_prompt(agent_type, template)
+            changed = [t for t, p in prompts.items() if t in self._prompts and self._prompts[t].version != p.version]
+            self._prompts = prompts
+            self._signature = signature
+            self._last_check = time.monotonic()
+        if changed:
+            logger.info(f"Reloaded prompt templates: {', '.join(sorted(changed))}")
+        return self.versions()
+
+    def _check_sources(self) -> None:
+        if not self.hot_reload or self.template_dir is None:
+            return
+        now = time.monotonic()
+        if now - self._last_check < SOURCE_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        if self._file_signature() != self._signature:
+            self.reload()
+
+    def get(self, agent_type: str) -> CompiledPrompt:
+        """Return the compiled prompt for an agent type.
+
+        Raises:
+            ValueError: If the agent type has no template
+        """
+        self._check_sources()
+        prompt = self._prompts.get(agent_type.lower())
+        if prompt is None:
+            raise ValueError(f"Unknown agent type: {agent_type}")
+        return prompt
+
+    def versions(self) -> Dict[str, str]:
+        """Return agent type to template version."""
+        return {agent_type: prompt.version for agent_type, prompt in self._prompts.items()}
+
+
+_default_registry: Optional[PromptRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_prompt_registry() -> PromptRegistry:
+    """Return the process-wide registry configured from the settings."""
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                config = get_config()
+                _default_registry = PromptRegistry(
+                    template_dir=getattr(config, "PROMPT_TEMPLATE_DIR", None),
+                    hot_reload=getattr(config, "PROMPT_TEMPLATE_HOT_RELOAD", False)
+                )
+    return _default_registry
+
+
+def reset_prompt_registry() -> None:
+    """Drop the process-wide registry so the next use re-reads the settings."""
+    global _default_registry
+    with _default_registry_lock:
+        _default_registry = None
+
+
+def get_prompt(agent_type: str) -> CompiledPrompt:
+    """Return the compiled prompt for an agent type from the default registry."""
+    return get_prompt_registry().get(agent_type)
+
+
 def get_prompt_template(agent_type: str) -> str:
     """Get the prompt template for a specific agent type.
     
@@ -302,24 +573,4 @@ def get_prompt_template(agent_type: str) -> str:
     Returns:
         The prompt template string with placeholders for context and task.
     """
-    templates: Dict[str, str] = {
-        "coordinator": COORDINATOR_TEMPLATE,
-        "ehr": EHR_TEMPLATE,
-        "imaging": IMAGING_TEMPLATE,
-        "pathology": PATHOLOGY_TEMPLATE,
-        "guideline": GUIDELINE_TEMPLATE,
-        "specialist": SPECIALIST_TEMPLATE,
-        "evaluation": EVALUATION_TEMPLATE,
-        "summary": SUMMARY_TEMPLATE
-    }
-    
-    template = templates.get(agent_type.lower())
-    if not template:
-        raise ValueError(f"Unknown agent type: {agent_type}")
-        
-    return template.format(
-        medical_expertise=MEDICAL_EXPERTISE_INTRO,
-        ethical_guidelines=ETHICAL_GUIDELINES,
-        context="{context}",  # Left as placeholder for actual use
-        task="{task}"        # Left as placeholder for actual use
-    ) 
\ No newline at end of file
+    return get_prompt(agent_type).text
@@ -2,5 +2,13 @@ from .patient import PatientCase
 from .report import MDTReport
 from .status import StatusUpdate
 from .agent_output import AgentOutput
+from .metadata import (
+    AgentMetadata, EHRMetadata, ImagingMetadata, PathologyMetadata, GuidelineMetadata, SpecialistMetadata,
+    get_metadata_schema
+)
 
-__all__ = ["PatientCase", "MDTReport", "StatusUpdate", "AgentOutput"]
+__all__ = [
+    "PatientCase", "MDTReport", "StatusUpdate", "AgentOutput",
+    "AgentMetadata", "EHRMetadata", "ImagingMetadata", "PathologyMetadata", "GuidelineMetadata",
+    "SpecialistMetadata", "get_metadata_schema"
+]
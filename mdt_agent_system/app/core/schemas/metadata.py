@@ -0,0 +1,94 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Any, Dict, List, Optional, Type
+
+# Confidence value; templates show it as the placeholder 0.0-1.0
+Score = Annotated[float, Field(ge=0.0, le=1.0)]
+
+
+class AgentMetadata(BaseModel):
+    """Base schema for the ---METADATA--- block of agent responses.
+
+    Unknown keys are kept, so agents may report more than their schema requires.
+    """
+    model_config = ConfigDict(extra="allow")
+
+    key_findings: List[str] = Field(..., min_length=1, description="Most important findings as short statements")
+
+
+class EHRClinicalMetrics(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    active_conditions: List[str] = Field(..., description="Currently active diagnoses")
+    current_medications: List[str] = Field(..., description="Current medications with dose and frequency")
+
+
+class EHRMetadata(AgentMetadata):
+    """Metadata returned by the EHR agent."""
+    clinical_metrics: EHRClinicalMetrics = Field(..., description="Object with active_conditions and current_medications lists")
+    risk_assessment: Dict[str, Any] = Field(default_factory=dict, description="Risk category to level, e.g. {\"comorbidity\": \"moderate\"}")
+
+
+class ImagingMetadata(AgentMetadata):
+    """Metadata returned by the imaging agent."""
+    measurements: Dict[str, Any] = Field(default_factory=dict, description="Lesion measurements, e.g. primary_lesion and significant_nodes")
+    confidence_scores: Dict[str, Score] = Field(..., description="Finding to confidence between 0.0 and 1.0")
+
+
+class MolecularProfile(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    mutations: List[str] = Field(default_factory=list, description="Detected mutations")
+    biomarkers: Dict[str, str] = Field(default_factory=dict, description="Biomarker to status")
+    therapeutic_targets: List[str] = Field(default_factory=list, description="Actionable targets")
+
+
+class PathologyConfidenceScores(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    diagnosis: Score
+    molecular_results: Score
+    treatment_implications: Score
+
+
+class PathologyMetadata(AgentMetadata):
+    """Metadata returned by the pathology agent."""
+    molecular_profile: MolecularProfile = Field(..., description="Object with mutations, biomarkers and therapeutic_targets")
+    confidence_scores: PathologyConfidenceScores = Field(
+        ..., description="Numbers between 0.0 and 1.0 for diagnosis, molecular_results and treatment_implications"
+    )
+
+
+class GuidelineMetadata(BaseModel):
+    """Metadata returned by the guideline agent."""
+    model_config = ConfigDict(extra="allow")
+
+    guideline_sources: List[str] = Field(..., min_length=1, description="Guidelines cited, with version")
+    evidence_levels: Dict[str, str] = Field(..., description="Recommendation area to evidence level, e.g. {\"primary_treatment\": \"1A\"}")
+    key_recommendations: List[str] = Field(default_factory=list, description="Most important recommendations")
+
+
+class SpecialistClinicalMetrics(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    case_complexity: str = Field(..., description="low, medium or high")
+    treatment_urgency: str = Field(..., description="e.g. routine, urgent or emergent")
+
+
+class SpecialistMetadata(AgentMetadata):
+    """Metadata returned by the specialist agent."""
+    confidence_scores: Dict[str, Score] = Field(..., description="Aspect (diagnosis, treatment_plan, prognosis) to confidence between 0.0 and 1.0")
+    clinical_metrics: SpecialistClinicalMetrics = Field(..., description="Object with case_complexity and treatment_urgency")
+
+
+METADATA_SCHEMAS: Dict[str, Type[BaseModel]] = {
+    "ehr": EHRMetadata,
+    "imaging": ImagingMetadata,
+    "pathology": PathologyMetadata,
+    "guideline": GuidelineMetadata,
+    "specialist": SpecialistMetadata,
+}
+
+
+def get_metadata_schema(agent_type: str) -> Optional[Type[BaseModel]]:
+    """Return the metadata schema for an agent type, or None if it has none."""
+    return METADATA_SCHEMAS.get(agent_type)
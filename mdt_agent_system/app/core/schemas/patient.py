@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationInfo, field_validator
+from pydantic_core import PydanticCustomError
 
 class PatientCase(BaseModel):
     """Schema for patient case data."""
@@ -13,6 +14,19 @@ class PatientCase(BaseModel):
     lab_results: Optional[List[Dict[str, Any]]] = Field(None, description="Laboratory test results")
     created_at: datetime = Field(default_factory=datetime.utcnow, description="Timestamp of case creation")
     
+    @field_validator("medical_history", "lab_results")
+    @classmethod
+    def _within_list_limits(cls, value: Optional[List[Dict[str, Any]]], info: ValidationInfo):
+        """Enforce the list limits passed as ``{"list_limits": {field: n}}`` validation context."""
+        limit = ((info.context or {}).get("list_limits") or {}).get(info.field_name)
+        if limit is not None and value is not None and len(value) > limit:
+            raise PydanticCustomError(
+                "too_long",
+                "List should have at most {max_length} items, not {actual_length}",
+                {"max_length": limit, "actual_length": len(value)},
+            )
+        return value
+    
     class Config:
         json_schema_extra = {
             "example": {
@@ -1,12 +1,12 @@
 from typing import Dict, List, Optional, Any, AsyncIterator
 from datetime import datetime
 import asyncio
+from mdt_agent_system.app.core import json_codec
 from mdt_agent_system.app.core.schemas.status import StatusUpdate
 from mdt_agent_system.app.core.status.storage import JSONStore
 from mdt_agent_system.app.core.logging.logger import get_logger
 from mdt_agent_system.app.core.config.settings import settings
 import os
-import json
 
 logger = get_logger(__name__)
 
@@ -113,9 +113,9 @@ class StatusUpdateService:
                         report_data = report_data.__dict__
                         print("===> Converted using .__dict__ attribute")
                     else:
-                        # Last resort: convert to string and back to dict
-                        report_data = json.loads(json.dumps(report_data, default=str))
-                        print("===> Converted using json dumps/loads")
+                        # Last resort: encode and decode through the JSON codec
+                        report_data = json_codec.to_jsonable(report_data)
+                        print("===> Converted using the JSON codec")
                 except Exception as conv_error:
                     print(f"===> ERROR CONVERTING REPORT DATA: {conv_error}")
                     # Create a minimal valid report
@@ -127,13 +127,8 @@ class StatusUpdateService:
                         "original_type": str(type(report_data))
                     }
             
-            # Convert any datetime objects to strings in the report data
-            def convert_datetime(obj):
-                if isinstance(obj, datetime):
-                    return obj.isoformat()
-                return obj
-            
-            report_data = json.loads(json.dumps(report_data, default=convert_datetime))
+            # Convert datetime objects and models in the report data to plain JSON values
+            report_data = json_codec.to_jsonable(report_data)
             
             # Create a special status update for the report using a valid status
             event_id = self._get_next_event_id(run_id)
@@ -317,6 +312,17 @@ class StatusUpdateService:
         except Exception as e:
              logger.error(f"Failed to clear persisted status updates for run_id {run_id}: {e}", exc_info=True)
 
+    def evict_runs(self, run_ids: List[str]) -> None:
+        """Drop in-memory state for runs whose persisted data was removed.
+
+        Used by the retention job; runs with live subscribers are left alone.
+        """
+        for run_id in run_ids:
+            if self.subscribers.get(run_id):
+                continue
+            self.active_runs.pop(run_id, None)
+            self.run_event_counters.pop(run_id, None)
+
     def emit_status(self, update: StatusUpdate) -> None:
         """Synchronously emit a status update for compatibility with existing tests."""
         # Assign next event ID
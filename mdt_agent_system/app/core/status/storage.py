@@ -1,14 +1,8 @@
-import json
 from pathlib import Path
 from typing import Dict, List, Optional, Any
-from datetime import datetime
 
-class DateTimeEncoder(json.JSONEncoder):
-    """JSON encoder that can handle datetime objects."""
-    def default(self, obj):
-        if isinstance(obj, datetime):
-            return obj.isoformat()
-        return super().default(obj)
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.atomic_io import path_lock, write_json_atomic
 
 class JSONStore:
     """Simple JSON file-based storage for status updates."""
@@ -21,21 +15,21 @@ class JSONStore:
         """
         self.file_path = Path(file_path)
         self.file_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.file_path.exists():
-            self._save_data({})
+        with path_lock(self.file_path):
+            if not self.file_path.exists():
+                self._save_data({})
     
     def _load_data(self) -> Dict[str, Any]:
         """Load data from the JSON file."""
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, FileNotFoundError):
+            with open(self.file_path, 'rb') as f:
+                return json_codec.load(f)
+        except (json_codec.JSONDecodeError, FileNotFoundError):
             return {}
     
     def _save_data(self, data: Dict[str, Any]) -> None:
-        """Save data to the JSON file."""
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False, cls=DateTimeEncoder)
+        """Save data to the JSON file, replacing it atomically."""
+        write_json_atomic(self.file_path, data, indent=True)
     
     def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
         """Get stored data for a specific key."""
@@ -48,13 +42,32 @@ class JSONStore:
     
     def save(self, key: str, value: List[Dict[str, Any]]) -> None:
         """Save data for a specific key."""
-        data = self._load_data()
-        data[key] = value
-        self._save_data(data)
+        with path_lock(self.file_path):
+            data = self._load_data()
+            data[key] = value
+            self._save_data(data)
     
     def delete(self, key: str) -> None:
         """Delete data for a specific key."""
-        data = self._load_data()
-        if key in data:
-            del data[key]
-            self._save_data(data) 
\ No newline at end of file
+        with path_lock(self.file_path):
+            data = self._load_data()
+            if key in data:
+                del data[key]
+                self._save_data(data)
+    
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several keys with a single rewrite of the file.
+        
+        Returns:
+            Number of keys that were actually removed.
+        """
+        with path_lock(self.file_path):
+            data = self._load_data()
+            removed = 0
+            for key in keys:
+                if key in data:
+                    del data[key]
+                    removed += 1
+            if removed:
+                self._save_data(data)
+        return removed
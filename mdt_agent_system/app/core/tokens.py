@@ -0,0 +1,137 @@
+"""Local prompt-size estimates and per-run token accounting.
+
+The provider reports token usage only after a call; these estimates are used
+beforehand to size prompts, keep each stage within its budget and compare
+what was estimated with what the provider reported.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.case_projection import history_age_key
+from mdt_agent_system.app.core.schemas import PatientCase
+
+# Role and framing tokens added by chat APIs around each message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of ``text`` (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def estimate_json_tokens(value: Any) -> int:
+    """Estimate the tokens of ``value`` serialized the way agents put it in prompts."""
+    return estimate_tokens(json_codec.dumps(value, indent=True))
+
+
+def estimate_prompt_tokens(messages: Sequence[Any]) -> int:
+    """Estimate the prompt tokens of a list of chat messages."""
+    return sum(estimate_tokens(str(getattr(m, "content", m))) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def reported_prompt_tokens(message: Any) -> Optional[int]:
+    """Return the prompt tokens the provider reported for a response, if it did.
+
+    Checks ``usage_metadata`` and the ``response_metadata`` keys used by the
+    LangChain integrations; langchain-google-genai 0.0.5 reports none of them.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if isinstance(usage, dict) and usage.get("input_tokens") is not None:
+        return int(usage["input_tokens"])
+    metadata = getattr(message, "response_metadata", None) or {}
+    for key in ("usage_metadata", "token_usage", "usage"):
+        usage = metadata.get(key)
+        if isinstance(usage, dict):
+            for field in ("prompt_token_count", "prompt_tokens", "input_tokens", "promptTokenCount"):
+                if usage.get(field) is not None:
+                    return int(usage[field])
+    return None
+
+
+def _drop_oldest(entries: List[Any]) -> List[Any]:
+    """Remove the oldest entry; undated entries count as oldest, ties go to the earliest listed."""
+    oldest = min(range(len(entries)), key=lambda i: (history_age_key(entries[i]), i))
+    return entries[:oldest] + entries[oldest + 1:]
+
+
+def trim_candidates(patient_case: PatientCase, context: Dict[str, Any]) -> Iterator[Tuple[PatientCase, Dict[str, Any]]]:
+    """Yield successively smaller versions of a stage's input, lowest priority first.
+
+    The order is fixed, so the same input and budget always give the same
+    prompt: the oldest medical history entries down to the most recent one,
+    then the oldest lab results, then the full markdown of upstream stages.
+    """
+    history = list(patient_case.medical_history)
+    while len(history) > 1:
+        history = _drop_oldest(history)
+        patient_case = patient_case.model_copy(update={"medical_history": history})
+        yield patient_case, context
+    labs = list(patient_case.lab_results or [])
+    while labs:
+        labs = _drop_oldest(labs)
+        patient_case = patient_case.model_copy(update={"lab_results": labs or None})
+        yield patient_case, context
+    if any(isinstance(value, dict) and "markdown_content" in value for value in context.values()):
+        context = {
+            key: {k: v for k, v in value.items() if k != "markdown_content"} if isinstance(value, dict) else value
+            for key, value in context.items()
+        }
+        yield patient_case, context
+
+
+class TokenLedger:
+    """Estimated and provider-reported prompt tokens per run and stage."""
+
+    def __init__(self, max_runs: int = 256):
+        self.max_runs = max_runs
+        self._runs: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, run_id: str, agent_id: str, estimated: int, reported: Optional[int] = None,
+               budget: Optional[int] = None, trimmed: int = 0) -> None:
+        """Record one stage's prompt; the oldest runs are forgotten past ``max_runs``."""
+        with self._lock:
+            entries = self._runs.setdefault(run_id, [])
+            self._runs.move_to_end(run_id)
+            entries.append({
+                "agent_id": agent_id,
+                "estimated_prompt_tokens": estimated,
+                "reported_prompt_tokens": reported,
+                "budget": budget,
+                "trimmed_sections": trimmed,
+            })
+            while len(self._runs) > self.max_runs:
+                self._runs.popitem(last=False)
+
+    def estimated_total(self, run_id: str) -> int:
+        """Estimated prompt tokens spent by the run so far."""
+        with self._lock:
+            return sum(entry["estimated_prompt_tokens"] for entry in self._runs.get(run_id, []))
+
+    def usage(self, run_id: str) -> List[Dict[str, Any]]:
+        """Per-stage records of a run, in call order."""
+        with self._lock:
+            return [dict(entry) for entry in self._runs.get(run_id, [])]
+
+
+_default_ledger: Optional[TokenLedger] = None
+_default_ledger_lock = threading.Lock()
+
+
+def get_token_ledger() -> TokenLedger:
+    """Return the process-wide token ledger."""
+    global _default_ledger
+    if _default_ledger is None:
+        with _default_ledger_lock:
+            if _default_ledger is None:
+                _default_ledger = TokenLedger()
+    return _default_ledger
+
+
+def reset_token_ledger() -> None:
+    """Forget all recorded usage."""
+    global _default_ledger
+    with _default_ledger_lock:
+        _default_ledger = None
@@ -1,10 +1,25 @@
-from .base import MDTTool
-from .medical import PharmacologyReferenceTool, GuidelineReferenceTool
+from .base import MDTTool, MDTToolConfig
+from .cache import CachedToolMixin, ToolResultCache, invalidate_tool_caches, tool_cache_stats
+from .guideline_index import GuidelineKnowledgeBase
+from .pharmacology_db import PharmacologyDatabase
+from .medical import PharmacologyReferenceTool, GuidelineReferenceTool, DrugInteractionMatrixTool
 from .registry import ToolRegistry
+from .prefetch import PrefetchPlan, plan_prefetch, prefetch_tool_context
 
 __all__ = [
     "MDTTool",
+    "MDTToolConfig",
+    "CachedToolMixin",
+    "ToolResultCache",
+    "invalidate_tool_caches",
+    "tool_cache_stats",
     "PharmacologyReferenceTool",
     "GuidelineReferenceTool",
-    "ToolRegistry"
+    "DrugInteractionMatrixTool",
+    "GuidelineKnowledgeBase",
+    "PharmacologyDatabase",
+    "ToolRegistry",
+    "PrefetchPlan",
+    "plan_prefetch",
+    "prefetch_tool_context"
 ]
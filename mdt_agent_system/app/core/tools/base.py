@@ -1,34 +1,86 @@
+import asyncio
+import functools
+import random
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, Optional
 from langchain.tools import BaseTool
 from pydantic import Field, BaseModel, ConfigDict
 
+from mdt_agent_system.app.core.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
 class MDTToolConfig(BaseModel):
     """Configuration for MDT tools."""
-    max_retries: int = Field(default=3, description="Maximum number of retry attempts")
-    retry_delay: float = Field(default=1.0, description="Delay between retries in seconds")
+    max_retries: int = Field(default=3, ge=0, description="Maximum number of retry attempts")
+    retry_delay: float = Field(default=1.0, ge=0, description="Delay between retries in seconds")
+    retry_backoff: float = Field(default=2.0, ge=1.0, description="Multiplier applied to the delay after each retry")
+    retry_jitter: float = Field(default=0.5, ge=0, le=1.0, description="Random spread applied to each delay, as a fraction of it")
+    timeout: Optional[float] = Field(default=30.0, gt=0, description="Per-attempt timeout in seconds, None to disable")
+    max_concurrency: int = Field(default=4, ge=1, description="Maximum concurrent executions of this tool per event loop")
+
+# Errors caused by the call itself; retrying them cannot succeed
+NON_RETRYABLE_ERRORS = (TypeError, ValueError, KeyError, NotImplementedError)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """Return the bounded thread pool shared by all synchronous tools."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from mdt_agent_system.app.core.config import get_config
+                workers = getattr(get_config(), "TOOL_EXECUTOR_MAX_WORKERS", 8)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mdt-tool")
+    return _executor
+
+def shutdown_tool_executor() -> None:
+    """Shut down the shared tool thread pool; it is recreated on next use."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
 
 class MDTTool(BaseTool):
-    """Base class for all MDT tools extending LangChain's BaseTool."""
+    """Base class for all MDT tools extending LangChain's BaseTool.
+
+    Subclasses implement the synchronous ``_run`` or, for natively asynchronous
+    tools, ``_acall``. ``_arun`` is the async entry point: it applies the
+    per-tool concurrency limit, timeout and jittered retry policy from
+    ``MDTToolConfig`` and offloads synchronous tools to the shared executor so
+    they never block the event loop.
+    """
     name: str = Field("base_tool", description="The name of the tool")
     description: str = Field("Base tool class", description="A description of what the tool does")
-    
+
     model_config = ConfigDict(arbitrary_types_allowed=True, extra="ignore")
-    
-    def __init__(self, **data: Any):
+
+    def __init__(self, config: Optional[MDTToolConfig] = None, **data: Any):
         super().__init__(**data)
         # Store config as a private attribute
-        self.__dict__['_config'] = MDTToolConfig()
-    
+        self.__dict__['_config'] = config or MDTToolConfig()
+        self.__dict__['_semaphores'] = weakref.WeakKeyDictionary()
+
     @property
     def max_retries(self) -> int:
         """Get maximum number of retries."""
         return self._config.max_retries
-    
+
     @property
     def retry_delay(self) -> float:
         """Get delay between retries."""
         return self._config.retry_delay
-    
+
+    @property
+    def tool_config(self) -> MDTToolConfig:
+        """Get the tool's execution configuration."""
+        return self._config
+
     def _handle_error(self, error: Exception) -> Dict[str, Any]:
         """Handle tool execution errors."""
         return {
@@ -36,12 +88,58 @@ class MDTTool(BaseTool):
             "error": str(error),
             "error_type": error.__class__.__name__
         }
-    
+
     def _run(self, *args: Any, **kwargs: Any) -> Any:
         """Execute the tool synchronously."""
         raise NotImplementedError("Tool must implement _run method")
-    
+
+    async def _acall(self, *args: Any, **kwargs: Any) -> Any:
+        """Execute one attempt asynchronously.
+
+        The default offloads ``_run`` to the shared executor. Natively async
+        tools override this instead of ``_arun`` to keep the execution policy.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_tool_executor(), functools.partial(self._run, *args, **kwargs))
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        """Return this tool's concurrency limiter for the running event loop."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self._config.max_concurrency)
+        return semaphore
+
+    def _retry_delay_for(self, attempt: int) -> float:
+        """Return the jittered backoff delay before retry number ``attempt`` (1-based)."""
+        config = self._config
+        delay = config.retry_delay * config.retry_backoff ** (attempt - 1)
+        return max(0.0, delay * random.uniform(1 - config.retry_jitter, 1 + config.retry_jitter))
+
     async def _arun(self, *args: Any, **kwargs: Any) -> Any:
-        """Execute the tool asynchronously."""
-        # Default to synchronous execution
-        return self._run(*args, **kwargs) 
\ No newline at end of file
+        """Execute the tool asynchronously with concurrency limit, timeout and retries.
+
+        A timed-out synchronous call cannot be interrupted; its worker thread
+        finishes in the background while the caller moves on.
+
+        Raises:
+            asyncio.TimeoutError: If the last attempt timed out
+            Exception: The last error raised by the tool
+        """
+        config = self._config
+        for attempt in range(config.max_retries + 1):
+            try:
+                async with self._semaphore():
+                    return await asyncio.wait_for(self._acall(*args, **kwargs), timeout=config.timeout)
+            except NON_RETRYABLE_ERRORS:
+                raise
+            except Exception as e:
+                if attempt >= config.max_retries:
+                    raise
+                # Back off outside the semaphore so waiting retries do not hold a slot
+                delay = self._retry_delay_for(attempt + 1)
+                logger.warning(
+                    f"Tool '{self.name}' attempt {attempt + 1} failed ({e.__class__.__name__}: {e}), "
+                    f"retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
@@ -0,0 +1,267 @@
+"""Result caching for deterministic MDT tools.
+
+``CachedToolMixin`` memoizes a tool's results keyed by its normalized
+arguments, with a TTL, an LRU bound on entries and hit/miss metrics. Each tool
+instance owns one ``ToolResultCache``; the cache watches the knowledge-base
+files the tool reads and drops every entry when one of them changes.
+"""
+import copy
+import functools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, ClassVar, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+_MISSING = object()
+
+# Seconds between checks of the watched knowledge-base files
+SOURCE_CHECK_INTERVAL = 2.0
+
+
+def normalize_cache_value(value: Any) -> Any:
+    """Normalize an argument so equivalent calls share a cache key.
+
+    Strings are stripped, lowercased and whitespace-collapsed; mappings are
+    key-sorted when the key is encoded; pydantic models become plain data.
+    """
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, BaseModel):
+        return normalize_cache_value(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(k): normalize_cache_value(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [normalize_cache_value(v) for v in value]
+    return value
+
+
+def _file_signature(paths: Iterable[Path]) -> Tuple[Tuple[str, int, int], ...]:
+    """Return (path, mtime_ns, size) for every watched file, expanding directories."""
+    signature = []
+    for path in paths:
+        files = sorted(p for p in path.iterdir() if p.is_file()) if path.is_dir() else [path]
+        for file_path in files:
+            try:
+                stat = file_path.stat()
+                signature.append((str(file_path), stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append((str(file_path), -1, -1))
+    return tuple(signature)
+
+
+class ToolResultCache:
+    """Thread-safe TTL + LRU cache with hit-ratio metrics."""
+
+    _instances: "weakref.WeakSet[ToolResultCache]" = weakref.WeakSet()
+
+    def __init__(self, name: str, ttl: Optional[float] = 3600.0, max_entries: int = 1024,
+                 sources: Optional[Callable[[], List[Path]]] = None,
+                 on_sources_changed: Optional[Callable[[], None]] = None):
+        """Initialize the cache.
+
+        Args:
+            name: Name of the owning tool, used in metrics
+            ttl: Seconds an entry stays valid, None for no expiry
+            max_entries: Least recently used entries are evicted beyond this
+            sources: Returns the knowledge-base files to watch
+            on_sources_changed: Called after a source change cleared the cache
+        """
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._sources = sources
+        self._on_sources_changed = on_sources_changed
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._source_signature: Optional[Tuple] = None
+        self._last_source_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        ToolResultCache._instances.add(self)
+
+    @staticmethod
+    def make_key(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+        """Build a stable key from normalized call arguments."""
+        return json_codec.dumps(
+            [normalize_cache_value(list(args)), normalize_cache_value(kwargs)], sort_keys=True
+        )
+
+    def _check_sources(self) -> None:
+        """Clear the cache if a watched file changed since the last check."""
+        if self._sources is None:
+            return
+        now = time.monotonic()
+        if now - self._last_source_check < SOURCE_CHECK_INTERVAL:
+            return
+        self._last_source_check = now
+        signature = _file_signature(self._sources())
+        if self._source_signature is None:
+            self._source_signature = signature
+        elif signature != self._source_signature:
+            self._source_signature = signature
+            logger.info(f"Knowledge-base files for '{self.name}' changed, invalidating cached results")
+            self.invalidate()
+            if self._on_sources_changed is not None:
+                self._on_sources_changed()
+
+    def get(self, key: str, count_miss: bool = True) -> Any:
+        """Return a copy of the cached value, or the module-private missing sentinel."""
+        self._check_sources()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at and expires_at < time.monotonic():
+                    del self._entries[key]
+                    self.expirations += 1
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+            if count_miss:
+                self.misses += 1
+        return _MISSING
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a copy of ``value`` under ``key``."""
+        expires_at = time.monotonic() + self.ttl if self.ttl else 0.0
+        with self._lock:
+            self._entries[key] = (expires_at, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> int:
+        """Drop every entry and return how many were removed."""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self.invalidations += 1
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit-ratio metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "tool": self.name,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+def invalidate_tool_caches() -> int:
+    """Clear every live tool cache and return the number of entries removed."""
+    return sum(cache.invalidate() for cache in list(ToolResultCache._instances))
+
+
+def tool_cache_stats() -> List[Dict[str, Any]]:
+    """Return metrics for every live tool cache."""
+    return [cache.stats() for cache in list(ToolResultCache._instances)]
+
+
+def _cached_run(run: Callable[..., Any]) -> Callable[..., Any]:
+    """Wrap a tool's ``_run`` with its result cache."""
+    @functools.wraps(run)
+    def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+        cache = self.result_cache
+        if cache is None:
+            return run(self, *args, **kwargs)
+        key = cache.make_key(args, kwargs)
+        cached = cache.get(key)
+        if cached is not _MISSING:
+            return cached
+        result = run(self, *args, **kwargs)
+        if not (isinstance(result, dict) and result.get("status") == "error"):
+            cache.set(key, result)
+        return result
+    wrapper._result_cached = True
+    return wrapper
+
+
+class CachedToolMixin:
+    """Memoize an ``MDTTool``'s results by normalized arguments.
+
+    Place before ``MDTTool`` in the bases; the subclass's ``_run`` is wrapped
+    automatically and ``_arun`` serves hits without the executor hop. Results
+    with ``status == "error"`` are never cached. Override the class flags with
+    ``ClassVar`` annotations (BaseTool treats plain attributes as fields), and
+    ``_cache_sources``/``_on_cache_sources_changed`` to watch and reload the
+    files a tool's results derive from.
+    """
+
+    cache_enabled: ClassVar[bool] = True
+    cache_ttl: ClassVar[Optional[float]] = None
+    cache_max_entries: ClassVar[Optional[int]] = None
+
+    @property
+    def result_cache(self) -> Optional[ToolResultCache]:
+        """Return this tool's cache, or None when caching is disabled for it."""
+        cache = self.__dict__.get("_result_cache", _MISSING)
+        if cache is _MISSING:
+            from mdt_agent_system.app.core.config import get_config
+            config = get_config()
+            enabled = self.__dict__.get("_cache_override")
+            if enabled is None:
+                enabled = (
+                    self.cache_enabled
+                    and getattr(config, "TOOL_CACHE_ENABLED", True)
+                    and self.name not in getattr(config, "TOOL_CACHE_DISABLED_TOOLS", [])
+                )
+            cache = ToolResultCache(
+                self.name,
+                ttl=self.cache_ttl if self.cache_ttl is not None else getattr(config, "TOOL_CACHE_TTL_SECONDS", 3600.0),
+                max_entries=self.cache_max_entries or getattr(config, "TOOL_CACHE_MAX_ENTRIES", 1024),
+                sources=self._cache_sources,
+                on_sources_changed=self._on_cache_sources_changed,
+            ) if enabled else None
+            self.__dict__["_result_cache"] = cache
+        return cache
+
+    def set_cache_enabled(self, enabled: bool) -> None:
+        """Turn caching on or off for this tool instance, overriding class and settings flags."""
+        self.__dict__["_cache_override"] = enabled
+        self.__dict__.pop("_result_cache", None)
+
+    def _cache_sources(self) -> List[Path]:
+        """Return the knowledge-base files this tool's results are derived from."""
+        return []
+
+    def _on_cache_sources_changed(self) -> None:
+        """Reload knowledge bases after their files changed."""
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        # Tools define _run on the subclass, which would shadow a mixin method, so wrap it here
+        run = cls.__dict__.get("_run")
+        if run is not None and not getattr(run, "_result_cached", False):
+            cls._run = _cached_run(run)
+
+    async def _arun(self, *args: Any, **kwargs: Any) -> Any:
+        # Serve hits without the executor hop; misses are counted by _run
+        cache = self.result_cache
+        if cache is not None:
+            cached = cache.get(cache.make_key(args, kwargs), count_miss=False)
+            if cached is not _MISSING:
+                return cached
+        return await super()._arun(*args, **kwargs)
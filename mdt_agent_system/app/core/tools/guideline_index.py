@@ -0,0 +1,233 @@
+"""In-memory inverted index over clinical guideline entries.
+
+Guideline entries are loaded from local JSON or YAML files. Each entry is a
+dict with an ``id`` and any of ``name``, ``synonyms``, ``icd_codes`` and
+``tags`` (stage, biomarker and specialty labels); every other field is passed
+through untouched as the guideline payload.
+
+The index is built once. A lookup touches only the posting lists of the
+query's n-grams and ICD codes; terms shared by a large share of the corpus
+only re-rank candidates found through selective terms, so the cost grows
+with the number of matches rather than with the size of the corpus.
+"""
+import heapq
+import math
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_GUIDELINE_PATH = Path(__file__).parent / "data" / "guidelines.json"
+
+# Field weights before IDF scaling
+NAME_PHRASE_WEIGHT = 6.0
+SYNONYM_PHRASE_WEIGHT = 4.0
+TAG_PHRASE_WEIGHT = 3.0
+NAME_TOKEN_WEIGHT = 1.0
+SYNONYM_TOKEN_WEIGHT = 0.5
+TAG_TOKEN_WEIGHT = 0.5
+ICD_EXACT_WEIGHT = 8.0
+ICD_CATEGORY_WEIGHT = 4.0
+
+MAX_NGRAM = 6
+
+# Terms posted on more than this share of entries only re-rank candidates
+COMMON_TERM_FRACTION = 0.02
+COMMON_TERM_MIN_DF = 50
+
+_STOP_WORDS = frozenset({
+    "a", "an", "and", "at", "by", "for", "in", "is", "of", "on", "or", "the", "to", "with",
+})
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+_ICD_PATTERN = re.compile(r"\b([A-Z][0-9]{2})(?:\.([0-9A-Z]{1,4}))?\b")
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase, split on anything that is not a letter or digit and drop stop words."""
+    return [t for t in _NON_ALNUM.split(str(text).lower()) if t and t not in _STOP_WORDS]
+
+
+def _normalize_icd(code: str) -> Tuple[str, str]:
+    """Return (full code, three-character category) for an ICD-10 code."""
+    code = str(code).strip().upper()
+    return code, code.split(".", 1)[0][:3]
+
+
+def load_guideline_files(paths: Iterable[Union[str, Path]]) -> List[Dict[str, Any]]:
+    """Load guideline entries from JSON/YAML files or directories of such files.
+
+    A file may contain a list of entries or a mapping with a ``guidelines`` list.
+    """
+    entries: List[Dict[str, Any]] = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(p for p in path.iterdir() if p.suffix.lower() in (".json", ".yaml", ".yml"))
+        else:
+            files = [path]
+        for file_path in files:
+            with open(file_path, "r", encoding="utf-8") as f:
+                if file_path.suffix.lower() in (".yaml", ".yml"):
+                    try:
+                        import yaml
+                    except ImportError as e:
+                        raise ImportError("PyYAML is required to load YAML guideline files") from e
+                    data = yaml.safe_load(f)
+                else:
+                    data = json_codec.load(f)
+            if isinstance(data, dict):
+                data = data.get("guidelines", [])
+            if not isinstance(data, list):
+                raise ValueError(f"Guideline file {file_path} must contain a list of entries")
+            entries.extend(data)
+    return entries
+
+
+class GuidelineKnowledgeBase:
+    """Prebuilt inverted index over guideline entries with ranked lookup."""
+
+    def __init__(self, entries: Iterable[Dict[str, Any]], source_paths: Iterable[Union[str, Path]] = ()):
+        """Build the index.
+
+        Args:
+            entries: Guideline entries; each must have a unique ``id``.
+            source_paths: Files or directories the entries were loaded from.
+        """
+        self.source_paths: List[Path] = [Path(p) for p in source_paths]
+        self._entries: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, int] = {}
+        # key -> {doc index: weight}; keys are normalized phrases and single tokens
+        self._postings: Dict[str, Dict[int, float]] = {}
+        self._icd_postings: Dict[str, Dict[int, float]] = {}
+
+        for entry in entries:
+            self._add(entry)
+        self._apply_idf()
+        logger.info(f"Built guideline index with {len(self._entries)} entries and {len(self._postings)} terms")
+
+    @classmethod
+    def from_paths(cls, paths: Iterable[Union[str, Path]]) -> "GuidelineKnowledgeBase":
+        """Build a knowledge base from JSON/YAML files or directories."""
+        paths = list(paths)
+        return cls(load_guideline_files(paths), source_paths=paths)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _post(self, postings: Dict[str, Dict[int, float]], key: str, doc: int, weight: float) -> None:
+        bucket = postings.setdefault(key, {})
+        if weight > bucket.get(doc, 0.0):
+            bucket[doc] = weight
+
+    def _add(self, entry: Dict[str, Any]) -> None:
+        entry_id = str(entry.get("id") or "").strip()
+        if not entry_id:
+            raise ValueError(f"Guideline entry without id: {entry.get('name', entry)}")
+        if entry_id in self._by_id:
+            raise ValueError(f"Duplicate guideline id: {entry_id}")
+
+        doc = len(self._entries)
+        self._entries.append(entry)
+        self._by_id[entry_id] = doc
+
+        fields = [
+            ([entry_id.replace("_", " "), entry.get("name", "")], NAME_PHRASE_WEIGHT, NAME_TOKEN_WEIGHT),
+            (entry.get("synonyms", []), SYNONYM_PHRASE_WEIGHT, SYNONYM_TOKEN_WEIGHT),
+            (entry.get("tags", []), TAG_PHRASE_WEIGHT, TAG_TOKEN_WEIGHT),
+        ]
+        for values, phrase_weight, token_weight in fields:
+            for value in values:
+                tokens = _tokenize(value)
+                if not tokens:
+                    continue
+                if len(tokens) <= MAX_NGRAM:
+                    self._post(self._postings, " ".join(tokens), doc, phrase_weight)
+                for token in tokens:
+                    self._post(self._postings, token, doc, token_weight)
+
+        for code in entry.get("icd_codes", []):
+            full, category = _normalize_icd(code)
+            self._post(self._icd_postings, full, doc, ICD_EXACT_WEIGHT)
+            self._post(self._icd_postings, category, doc, ICD_CATEGORY_WEIGHT)
+
+    def _apply_idf(self) -> None:
+        """Scale term weights so rare terms rank above ubiquitous ones."""
+        total = max(len(self._entries), 1)
+        for bucket in self._postings.values():
+            idf = 1.0 + math.log(total / len(bucket))
+            for doc in bucket:
+                bucket[doc] *= idf
+
+    def get(self, guideline_id: str) -> Optional[Dict[str, Any]]:
+        """Return a guideline entry by id."""
+        doc = self._by_id.get(guideline_id)
+        return self._entries[doc] if doc is not None else None
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+        """Return up to ``limit`` (entry, score) pairs ranked by relevance."""
+        buckets: List[Dict[int, float]] = []
+        tokens = _tokenize(query)
+        for start in range(len(tokens)):
+            for end in range(start + 1, min(start + MAX_NGRAM, len(tokens)) + 1):
+                bucket = self._postings.get(" ".join(tokens[start:end]))
+                if bucket:
+                    buckets.append(bucket)
+
+        for match in _ICD_PATTERN.finditer(str(query).upper()):
+            category, sub = match.group(1), match.group(2)
+            keys = [f"{category}.{sub}", category] if sub else [category]
+            for key in keys:
+                bucket = self._icd_postings.get(key)
+                if bucket:
+                    buckets.append(bucket)
+
+        # Selective terms pick the candidates; common terms ("cancer", "stage iv")
+        # only re-rank them, unless nothing selective matched at all.
+        common_limit = max(COMMON_TERM_MIN_DF, int(len(self._entries) * COMMON_TERM_FRACTION))
+        selective = [b for b in buckets if len(b) <= common_limit]
+        common = [b for b in buckets if len(b) > common_limit]
+
+        scores: Dict[int, float] = {}
+        for bucket in selective or common:
+            for doc, weight in bucket.items():
+                scores[doc] = scores.get(doc, 0.0) + weight
+        if selective:
+            for bucket in common:
+                for doc in scores:
+                    weight = bucket.get(doc)
+                    if weight:
+                        scores[doc] += weight
+
+        ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self._entries[doc], round(score, 4)) for doc, score in ranked]
+
+
+_default_kb: Optional[GuidelineKnowledgeBase] = None
+_default_kb_lock = threading.Lock()
+
+
+def get_default_knowledge_base() -> GuidelineKnowledgeBase:
+    """Return the process-wide knowledge base, building it on first use.
+
+    Uses ``GUIDELINE_DATA_PATH`` from settings when set, else the bundled dataset.
+    """
+    global _default_kb
+    if _default_kb is None:
+        with _default_kb_lock:
+            if _default_kb is None:
+                from mdt_agent_system.app.core.config import get_config
+                configured = getattr(get_config(), "GUIDELINE_DATA_PATH", None)
+                _default_kb = GuidelineKnowledgeBase.from_paths([configured or DEFAULT_GUIDELINE_PATH])
+    return _default_kb
+
+
+def reset_default_knowledge_base() -> None:
+    """Drop the cached knowledge base so the next lookup reloads the files."""
+    global _default_kb
+    with _default_kb_lock:
+        _default_kb = None
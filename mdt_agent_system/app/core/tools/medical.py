@@ -1,95 +1,261 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+import copy
 import json
+from pathlib import Path
+import numpy as np
+# BaseTool.args_schema is typed against pydantic v1 in the pinned langchain-core
+from langchain_core.pydantic_v1 import BaseModel as ToolArgs, Field as ToolArg
+from mdt_agent_system.app.core.schemas import PatientCase
 from .base import MDTTool
+from .cache import CachedToolMixin
+from .guideline_index import (
+    GuidelineKnowledgeBase, get_default_knowledge_base, reset_default_knowledge_base
+)
+from .pharmacology_db import (
+    SEVERITY_ORDER, PharmacologyDatabase, get_default_pharmacology_db, reset_default_pharmacology_db
+)
 
-class PharmacologyReferenceTool(MDTTool):
+# Index-only fields that are not part of the guideline payload returned to agents
+_INDEX_FIELDS = frozenset({"id", "synonyms", "icd_codes", "tags"})
+
+# current_condition keys that may hold the active medication list
+_MEDICATION_KEYS = ("medications", "current_medications", "medication", "treatment", "treatments")
+_SEVERITY_NAMES = {code: name for name, code in SEVERITY_ORDER.items()}
+
+
+def _flatten_strings(value: Any) -> List[str]:
+    """Collect the string leaves of a nested list/dict value."""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [s for v in value.values() for s in _flatten_strings(v)]
+    if isinstance(value, (list, tuple)):
+        return [s for v in value for s in _flatten_strings(v)]
+    return []
+
+
+def extract_medications(patient_case: Union[PatientCase, Dict[str, Any]]) -> List[str]:
+    """Collect medication strings from medical_history[].treatment and current_condition."""
+    if isinstance(patient_case, PatientCase):
+        history, condition = patient_case.medical_history, patient_case.current_condition
+    else:
+        history, condition = patient_case.get("medical_history", []), patient_case.get("current_condition", {})
+    
+    medications: List[str] = []
+    for entry in history or []:
+        medications.extend(_flatten_strings(entry.get("treatment")))
+    for key in _MEDICATION_KEYS:
+        medications.extend(_flatten_strings((condition or {}).get(key)))
+    return list(dict.fromkeys(m.strip() for m in medications if m and m.strip()))
+
+class PharmacologyReferenceInput(ToolArgs):
+    """Arguments the LLM may pass to pharmacology_reference."""
+    query: str = ToolArg("", description="A single drug name, brand name or drug class")
+    medications: Optional[List[str]] = ToolArg(
+        None, description="A patient's whole medication list, resolved in one call with the interactions between them"
+    )
+
+class GuidelineReferenceInput(ToolArgs):
+    """Arguments the LLM may pass to guideline_reference."""
+    condition: str = ToolArg(..., description="Condition name, synonym, ICD-10 code or stage/biomarker description")
+    limit: int = ToolArg(5, description="Maximum number of ranked matches to return")
+
+class DrugInteractionMatrixInput(ToolArgs):
+    """Arguments the LLM may pass to drug_interaction_matrix.
+
+    ``patient_case`` is accepted by ``_run`` for in-process callers only; it is
+    not part of the schema sent to the model.
+    """
+    medications: List[str] = ToolArg(..., description="Medications to check against each other")
+    min_severity: str = ToolArg("minor", description="Lowest severity to report: " + ", ".join(SEVERITY_ORDER))
+
+class PharmacologyReferenceTool(CachedToolMixin, MDTTool):
     """Tool for accessing pharmacology reference data."""
     name: str = "pharmacology_reference"
-    description: str = "Access pharmacology reference data for medications"
+    description: str = (
+        "Access pharmacology reference data for medications: class, indications, contraindications "
+        "and interactions. Pass a single drug as query, or a patient's whole medication list as "
+        "medications to resolve it in one call together with the interactions between them"
+    )
+    args_schema: Type[ToolArgs] = PharmacologyReferenceInput
+    database: Optional[PharmacologyDatabase] = None
     
-    def _run(self, query: str, **kwargs: Any) -> Dict[str, Any]:
-        """Simulate pharmacology reference lookup."""
-        # Simulated data - in production would query a real database
-        sample_data = {
-            "aspirin": {
-                "class": "NSAID",
-                "indications": ["Pain", "Fever", "Prevention of cardiovascular events"],
-                "contraindications": ["Active bleeding", "Aspirin allergy"],
-                "interactions": ["Warfarin", "Other NSAIDs"]
-            },
-            "metformin": {
-                "class": "Biguanide",
-                "indications": ["Type 2 Diabetes"],
-                "contraindications": ["Severe renal impairment"],
-                "interactions": ["Contrast media", "ACE inhibitors"]
-            }
-        }
+    def _cache_sources(self) -> List[Path]:
+        """Watch the dataset the pharmacology database is built from."""
+        return [(self.database or get_default_pharmacology_db()).dataset_path]
+    
+    def _on_cache_sources_changed(self) -> None:
+        """Rebuild the shared database from the changed dataset."""
+        if self.database is None:
+            reset_default_pharmacology_db()
+    
+    def _run(self, query: str = "", medications: Optional[List[str]] = None, **kwargs: Any) -> Dict[str, Any]:
+        """Look up one drug, or a medication list when ``medications`` is given."""
+        db = self.database or get_default_pharmacology_db()
+        if medications:
+            return self._run_batch(db, medications)
         
-        # Simple fuzzy matching
-        query = query.lower()
-        for drug, info in sample_data.items():
-            if drug in query:
-                return {
-                    "status": "success",
-                    "drug": drug,
-                    "data": info
-                }
+        found = db.lookup(query)
+        if found:
+            drug, info = found
+            return {
+                "status": "success",
+                "drug": drug,
+                "data": info
+            }
         
         return {
             "status": "not_found",
-            "message": f"No pharmacology data found for query: {query}"
+            "message": f"No pharmacology data found for query: {query.lower()}",
+            "related": db.search(query, limit=3)
+        }
+    
+    def _run_batch(self, db: PharmacologyDatabase, medications: List[str]) -> Dict[str, Any]:
+        """Resolve a medication list with one alias query, one data query and one interaction query."""
+        resolved = db.lookup_many(medications)
+        drug_ids = [drug_id for ids in resolved.values() for drug_id in ids]
+        data = db.get_drugs(drug_ids)
+        return {
+            "status": "success" if drug_ids else "not_found",
+            "medications": {
+                medication: [{"drug": drug_id, "data": data[drug_id]} for drug_id in ids]
+                for medication, ids in resolved.items()
+            },
+            "not_found": [medication for medication, ids in resolved.items() if not ids],
+            "interactions": db.interactions_among(drug_ids)
         }
 
-class GuidelineReferenceTool(MDTTool):
+class GuidelineReferenceTool(CachedToolMixin, MDTTool):
     """Tool for accessing medical guidelines."""
     name: str = "guideline_reference"
-    description: str = "Access medical guidelines and recommendations"
+    description: str = (
+        "Access medical guidelines and recommendations. Accepts a condition name, "
+        "synonym, ICD-10 code or stage/biomarker description"
+    )
+    args_schema: Type[ToolArgs] = GuidelineReferenceInput
+    knowledge_base: Optional[GuidelineKnowledgeBase] = None
     
-    def _run(self, condition: str, **kwargs: Any) -> Dict[str, Any]:
-        """Simulate guideline reference lookup."""
-        # Simulated data - in production would query a real guideline database
-        sample_guidelines = {
-            "chest_pain": {
-                "source": "AHA/ACC",
-                "version": "2021",
-                "recommendations": [
-                    "Perform initial risk stratification",
-                    "Obtain 12-lead ECG within 10 minutes",
-                    "Consider early cardiac biomarkers"
-                ],
-                "risk_factors": [
-                    "Age > 65",
-                    "Known CAD",
-                    "Diabetes",
-                    "Hypertension"
-                ]
-            },
-            "type_2_diabetes": {
-                "source": "ADA",
-                "version": "2024",
-                "recommendations": [
-                    "Regular HbA1c monitoring",
-                    "Lifestyle modifications",
-                    "Consider metformin as first-line therapy"
-                ],
-                "targets": {
-                    "HbA1c": "< 7.0%",
-                    "Blood Pressure": "< 140/90 mmHg"
-                }
+    def _cache_sources(self) -> List[Path]:
+        """Watch the files the knowledge base was loaded from."""
+        return list((self.knowledge_base or get_default_knowledge_base()).source_paths)
+    
+    def _on_cache_sources_changed(self) -> None:
+        """Reload the shared knowledge base from the changed files."""
+        if self.knowledge_base is None:
+            reset_default_knowledge_base()
+    
+    def _run(self, condition: str, limit: int = 5, **kwargs: Any) -> Dict[str, Any]:
+        """Look up the best matching guidelines in the indexed knowledge base."""
+        kb = self.knowledge_base or get_default_knowledge_base()
+        ranked = kb.search(condition, limit=limit)
+        if not ranked:
+            return {
+                "status": "not_found",
+                "message": f"No guidelines found for condition: {condition.lower()}"
             }
+        
+        best, score = ranked[0]
+        return {
+            "status": "success",
+            "condition": best["id"],
+            "guidelines": copy.deepcopy({k: v for k, v in best.items() if k not in _INDEX_FIELDS}),
+            "score": score,
+            "matches": [
+                {"condition": entry["id"], "name": entry.get("name", entry["id"]), "score": match_score}
+                for entry, match_score in ranked
+            ]
         }
+
+class DrugInteractionMatrixTool(CachedToolMixin, MDTTool):
+    """Tool for checking every pairwise interaction in a medication list at once."""
+    name: str = "drug_interaction_matrix"
+    description: str = (
+        "Check all pairwise drug-drug interactions for a patient's medication list (or a patient case) "
+        "and return the flagged pairs with severity"
+    )
+    args_schema: Type[ToolArgs] = DrugInteractionMatrixInput
+    database: Optional[PharmacologyDatabase] = None
+    
+    def _cache_sources(self) -> List[Path]:
+        """Watch the dataset the pharmacology database is built from."""
+        return [(self.database or get_default_pharmacology_db()).dataset_path]
+    
+    def _on_cache_sources_changed(self) -> None:
+        """Rebuild the shared database from the changed dataset."""
+        if self.database is None:
+            reset_default_pharmacology_db()
+    
+    def _interaction_index(self, db: PharmacologyDatabase) -> Tuple[List[str], Dict[str, int], np.ndarray, np.ndarray, List[str]]:
+        """Build the sparse interaction table once per database.
+        
+        Returns:
+            (drug ids, drug id -> position, sorted pair keys a*n+b with a<b, severity codes, effects)
+        """
+        cached = self.__dict__.get("_index")
+        if cached is not None and cached[0] is db:
+            return cached[1]
         
-        # Simple fuzzy matching
-        condition = condition.lower()
-        for disease, info in sample_guidelines.items():
-            if disease in condition:
-                return {
-                    "status": "success",
-                    "condition": disease,
-                    "guidelines": info
-                }
+        names = db.drug_ids()
+        positions = {drug_id: i for i, drug_id in enumerate(names)}
+        n = len(positions)
+        rows = [(min(positions[a], positions[b]) * n + max(positions[a], positions[b]), SEVERITY_ORDER[sev], effect)
+                for a, b, sev, effect in db.interaction_table()]
+        rows.sort()
+        keys = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+        severities = np.fromiter((r[1] for r in rows), dtype=np.int8, count=len(rows))
+        index = (names, positions, keys, severities, [r[2] for r in rows])
+        self.__dict__["_index"] = (db, index)
+        return index
+    
+    def check(self, drug_ids: List[str], db: Optional[PharmacologyDatabase] = None,
+              min_severity: str = "minor") -> List[Dict[str, Any]]:
+        """Return the interacting pairs among ``drug_ids``, most severe first."""
+        db = db or self.database or get_default_pharmacology_db()
+        names, positions, keys, severities, effects = self._interaction_index(db)
+        ids = sorted({positions[d] for d in drug_ids if d in positions})
+        if len(ids) < 2 or not len(keys):
+            return []
         
+        # Upper triangle of the patient's k x k matrix as pair keys, looked up in the sparse table
+        idx = np.asarray(ids, dtype=np.int64)
+        rows, cols = np.triu_indices(len(idx), k=1)
+        pair_keys = idx[rows] * len(positions) + idx[cols]
+        hits = np.searchsorted(keys, pair_keys)
+        hits[hits == len(keys)] = 0
+        found = keys[hits] == pair_keys
+        found &= severities[hits] >= SEVERITY_ORDER[min_severity]
+        
+        flagged = [
+            {
+                "drugs": [names[idx[r]], names[idx[c]]],
+                "severity": _SEVERITY_NAMES[int(severities[h])],
+                "effect": effects[h]
+            }
+            for r, c, h in zip(rows[found], cols[found], hits[found])
+        ]
+        flagged.sort(key=lambda p: (-SEVERITY_ORDER[p["severity"]], p["drugs"]))
+        return flagged
+    
+    def _run(self, medications: Optional[List[str]] = None,
+             patient_case: Optional[Union[PatientCase, Dict[str, Any]]] = None,
+             min_severity: str = "minor", **kwargs: Any) -> Dict[str, Any]:
+        """Map medications to drug ids and flag every interacting pair."""
+        if min_severity not in SEVERITY_ORDER:
+            return self._handle_error(ValueError(f"min_severity must be one of {list(SEVERITY_ORDER)}"))
+        db = self.database or get_default_pharmacology_db()
+        medications = list(medications or [])
+        if patient_case is not None:
+            medications += [m for m in extract_medications(patient_case) if m not in medications]
+        
+        resolved = db.lookup_many(medications)
+        drug_ids = list(dict.fromkeys(d for ids in resolved.values() for d in ids))
+        flagged = self.check(drug_ids, db, min_severity)
         return {
-            "status": "not_found",
-            "message": f"No guidelines found for condition: {condition}"
-        } 
\ No newline at end of file
+            "status": "success",
+            "medications": resolved,
+            "unmatched": [m for m, ids in resolved.items() if not ids],
+            "drug_ids": drug_ids,
+            "pairs_checked": len(drug_ids) * (len(drug_ids) - 1) // 2,
+            "flagged_pairs": flagged,
+            "max_severity": flagged[0]["severity"] if flagged else None
+        }
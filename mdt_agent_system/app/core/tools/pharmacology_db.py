@@ -0,0 +1,284 @@
+"""Embedded SQLite pharmacology database with full-text search.
+
+The database is built from a shipped JSON dataset (``data/pharmacology.json``)
+holding drug entries (class, indications, contraindications, synonyms) and a
+symmetric interaction table. It lives in memory by default; when given a file
+path the built database is reused across processes for as long as the
+dataset hash recorded in it still matches.
+
+Drug names are resolved through an alias table (names, brand names and
+synonyms), so a whole medication list is resolved with a single query.
+Free-text queries over classes, indications and contraindications go through
+an FTS5 index.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PHARMACOLOGY_PATH = Path(__file__).parent / "data" / "pharmacology.json"
+
+SEVERITY_ORDER = {"minor": 1, "moderate": 2, "major": 3, "contraindicated": 4}
+
+# Longest alias, in tokens, that is matched inside free-text medication strings
+MAX_ALIAS_TOKENS = 6
+# Stay under SQLite's default bound-parameter limit
+_SQL_CHUNK = 900
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE drugs (id TEXT PRIMARY KEY, name TEXT NOT NULL, class TEXT, data TEXT NOT NULL);
+CREATE TABLE aliases (alias TEXT PRIMARY KEY, drug_id TEXT NOT NULL REFERENCES drugs(id));
+CREATE TABLE interactions (
+    drug_a TEXT NOT NULL, drug_b TEXT NOT NULL, severity TEXT NOT NULL, effect TEXT,
+    PRIMARY KEY (drug_a, drug_b)
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE drugs_fts USING fts5(
+    drug_id UNINDEXED, name, synonyms, class, indications, contraindications,
+    tokenize = 'porter unicode61'
+);
+"""
+
+
+def normalize_drug_text(text: str) -> str:
+    """Lowercase and collapse anything that is not a letter or digit to single spaces."""
+    return " ".join(t for t in _NON_ALNUM.split(str(text).lower()) if t)
+
+
+def _chunks(values: Sequence[str]) -> Iterable[Sequence[str]]:
+    for i in range(0, len(values), _SQL_CHUNK):
+        yield values[i:i + _SQL_CHUNK]
+
+
+class PharmacologyDatabase:
+    """SQLite-backed drug reference with alias resolution, FTS and interactions."""
+
+    def __init__(self, db_path: Union[str, Path] = ":memory:",
+                 dataset_path: Union[str, Path] = DEFAULT_PHARMACOLOGY_PATH):
+        """Open the database, building it from the dataset when needed.
+
+        Args:
+            db_path: SQLite file, or ":memory:" for a process-local database.
+            dataset_path: JSON dataset with ``drugs`` and ``interactions`` lists.
+        """
+        self.db_path = str(db_path)
+        self.dataset_path = Path(dataset_path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+
+        raw = self.dataset_path.read_bytes()
+        dataset_hash = hashlib.sha256(raw).hexdigest()
+        if self._stored_hash() != dataset_hash:
+            self._build(json_codec.loads(raw), dataset_hash)
+        self._drug_count = self._conn.execute("SELECT COUNT(*) FROM drugs").fetchone()[0]
+
+    def __len__(self) -> int:
+        return self._drug_count
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _stored_hash(self) -> Optional[str]:
+        try:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'dataset_hash'").fetchone()
+        except sqlite3.DatabaseError:
+            return None
+        return row[0] if row else None
+
+    def _build(self, dataset: Dict[str, Any], dataset_hash: str) -> None:
+        """(Re)create all tables from the dataset in one transaction."""
+        drugs = dataset.get("drugs", [])
+        known = {d["id"] for d in drugs}
+
+        interactions: Dict[str, List[Dict[str, Any]]] = {drug_id: [] for drug_id in known}
+        interaction_rows = []
+        for item in dataset.get("interactions", []):
+            a, b = item["drugs"]
+            severity = item["severity"].lower()
+            if a not in known or b not in known:
+                raise ValueError(f"Interaction references unknown drug: {a} / {b}")
+            if severity not in SEVERITY_ORDER:
+                raise ValueError(f"Unknown interaction severity: {severity}")
+            effect = item.get("effect", "")
+            interaction_rows += [(a, b, severity, effect), (b, a, severity, effect)]
+            interactions[a].append({"drug": b, "severity": severity, "effect": effect})
+            interactions[b].append({"drug": a, "severity": severity, "effect": effect})
+
+        drug_rows, alias_rows, fts_rows = [], {}, []
+        for drug in drugs:
+            data = {
+                "name": drug["name"],
+                "class": drug.get("class"),
+                "indications": drug.get("indications", []),
+                "contraindications": drug.get("contraindications", []),
+                "interactions": interactions[drug["id"]],
+            }
+            drug_rows.append((drug["id"], drug["name"], drug.get("class"), json_codec.dumps(data)))
+            for alias in [drug["id"], drug["name"], *drug.get("synonyms", [])]:
+                alias_rows.setdefault(normalize_drug_text(alias), drug["id"])
+            fts_rows.append((
+                drug["id"], drug["name"], " ".join(drug.get("synonyms", [])), drug.get("class") or "",
+                " ; ".join(data["indications"]), " ; ".join(data["contraindications"]),
+            ))
+
+        with self._lock, self._conn:
+            for table in ("meta", "drugs", "aliases", "interactions", "drugs_fts"):
+                self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+            self._conn.executescript(_SCHEMA)
+            self._conn.executemany("INSERT INTO drugs VALUES (?, ?, ?, ?)", drug_rows)
+            self._conn.executemany("INSERT INTO aliases VALUES (?, ?)", alias_rows.items())
+            self._conn.executemany("INSERT OR REPLACE INTO interactions VALUES (?, ?, ?, ?)", interaction_rows)
+            self._conn.executemany("INSERT INTO drugs_fts VALUES (?, ?, ?, ?, ?, ?)", fts_rows)
+            self._conn.execute("INSERT INTO meta VALUES ('dataset_hash', ?)", (dataset_hash,))
+        logger.info(f"Built pharmacology database with {len(drug_rows)} drugs and "
+                    f"{len(interaction_rows) // 2} interactions from {self.dataset_path}")
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _aliases_in(self, candidates: Sequence[str]) -> Dict[str, str]:
+        found: Dict[str, str] = {}
+        for chunk in _chunks(candidates):
+            placeholders = ",".join("?" * len(chunk))
+            found.update(self._query(f"SELECT alias, drug_id FROM aliases WHERE alias IN ({placeholders})", chunk))
+        return found
+
+    def match_drug_ids(self, texts: Sequence[str]) -> List[List[str]]:
+        """Find every known drug mentioned in each text, in order of appearance.
+
+        Free text such as "Carboplatin AUC5 + pemetrexed 500mg/m2" is supported:
+        all token n-grams of all texts are resolved against the alias table in
+        one query, and the longest alias wins where matches overlap.
+        """
+        tokenized = [normalize_drug_text(text).split() for text in texts]
+        candidates = {
+            " ".join(tokens[i:j])
+            for tokens in tokenized
+            for i in range(len(tokens))
+            for j in range(i + 1, min(i + MAX_ALIAS_TOKENS, len(tokens)) + 1)
+        }
+        aliases = self._aliases_in(sorted(candidates)) if candidates else {}
+
+        results = []
+        for tokens in tokenized:
+            ids: List[str] = []
+            i = 0
+            while i < len(tokens):
+                for j in range(min(i + MAX_ALIAS_TOKENS, len(tokens)), i, -1):
+                    drug_id = aliases.get(" ".join(tokens[i:j]))
+                    if drug_id:
+                        if drug_id not in ids:
+                            ids.append(drug_id)
+                        i = j
+                        break
+                else:
+                    i += 1
+            results.append(ids)
+        return results
+
+    def get_drugs(self, drug_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        """Return reference data for the given drug ids in one query per chunk."""
+        found: Dict[str, Dict[str, Any]] = {}
+        unique = list(dict.fromkeys(drug_ids))
+        for chunk in _chunks(unique):
+            placeholders = ",".join("?" * len(chunk))
+            for drug_id, data in self._query(f"SELECT id, data FROM drugs WHERE id IN ({placeholders})", chunk):
+                found[drug_id] = json_codec.loads(data)
+        return found
+
+    def lookup(self, query: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Return (drug id, data) for the first drug named in ``query``."""
+        ids = self.match_drug_ids([query])[0]
+        if not ids:
+            return None
+        return ids[0], self.get_drugs(ids[:1])[ids[0]]
+
+    def lookup_many(self, medications: Sequence[str]) -> Dict[str, List[str]]:
+        """Resolve a medication list to drug ids, keyed by the original strings."""
+        return dict(zip(medications, self.match_drug_ids(medications)))
+
+    def interactions_among(self, drug_ids: Sequence[str]) -> List[Dict[str, Any]]:
+        """Return each interacting pair among ``drug_ids`` once, most severe first."""
+        unique = sorted(set(drug_ids))
+        if len(unique) < 2:
+            return []
+        if len(unique) > _SQL_CHUNK // 2:
+            wanted = set(unique)
+            rows = [row for row in self.interaction_table() if row[0] in wanted and row[1] in wanted]
+        else:
+            placeholders = ",".join("?" * len(unique))
+            rows = self._query(
+                f"SELECT drug_a, drug_b, severity, effect FROM interactions "
+                f"WHERE drug_a < drug_b AND drug_a IN ({placeholders}) AND drug_b IN ({placeholders})",
+                unique + unique,
+            )
+        pairs = [{"drugs": [a, b], "severity": severity, "effect": effect} for a, b, severity, effect in rows]
+        pairs.sort(key=lambda p: (-SEVERITY_ORDER[p["severity"]], p["drugs"]))
+        return pairs
+
+    def interaction_table(self) -> List[Tuple[str, str, str, str]]:
+        """Return every interaction once as (drug_a, drug_b, severity, effect) with drug_a < drug_b."""
+        return self._query("SELECT drug_a, drug_b, severity, effect FROM interactions WHERE drug_a < drug_b")
+
+    def drug_ids(self) -> List[str]:
+        """Return all drug ids in a stable order."""
+        return [row[0] for row in self._query("SELECT id FROM drugs ORDER BY id")]
+
+    def search(self, text: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """Full-text search over names, classes, indications and contraindications."""
+        tokens = normalize_drug_text(text).split()
+        if not tokens:
+            return []
+        match = " OR ".join(f'"{token}"' for token in tokens)
+        rows = self._query(
+            "SELECT drug_id, name, class, bm25(drugs_fts) AS rank FROM drugs_fts "
+            "WHERE drugs_fts MATCH ? ORDER BY rank LIMIT ?",
+            (match, limit),
+        )
+        return [{"drug": drug_id, "name": name, "class": drug_class, "score": round(-rank, 4)}
+                for drug_id, name, drug_class, rank in rows]
+
+
+_default_db: Optional[PharmacologyDatabase] = None
+_default_db_lock = threading.Lock()
+
+
+def get_default_pharmacology_db() -> PharmacologyDatabase:
+    """Return the process-wide pharmacology database, building it on first use.
+
+    Uses ``PHARMACOLOGY_DB_PATH`` and ``PHARMACOLOGY_DATA_PATH`` from settings when set.
+    """
+    global _default_db
+    if _default_db is None:
+        with _default_db_lock:
+            if _default_db is None:
+                from mdt_agent_system.app.core.config import get_config
+                config = get_config()
+                _default_db = PharmacologyDatabase(
+                    getattr(config, "PHARMACOLOGY_DB_PATH", None) or ":memory:",
+                    getattr(config, "PHARMACOLOGY_DATA_PATH", None) or DEFAULT_PHARMACOLOGY_PATH,
+                )
+    return _default_db
+
+
+def reset_default_pharmacology_db() -> None:
+    """Drop the cached database so the next lookup opens a new connection.
+
+    The old database is not closed: a lookup running in an executor thread may
+    still hold it. Its connection closes once the last reference is released.
+    """
+    global _default_db
+    with _default_db_lock:
+        _default_db = None
@@ -0,0 +1,149 @@
+"""Pre-fetch reference lookups from patient data before the LLM call.
+
+Conditions, medications and biomarkers are extracted from the ``PatientCase``
+up front, the matching tool lookups run concurrently, and the results are
+condensed into a compact context block. Agents get the references in their
+first prompt instead of spending an LLM turn requesting them as tool calls.
+"""
+import asyncio
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from mdt_agent_system.app.core.logging.logger import get_logger
+from mdt_agent_system.app.core.schemas import PatientCase
+from .medical import extract_medications
+from .registry import ToolRegistry
+
+logger = get_logger(__name__)
+
+# Upper bound on guideline lookups issued for one case
+MAX_GUIDELINE_QUERIES = 8
+
+_CONDITION_KEYS = ("primary_diagnosis", "diagnosis", "primary_complaint")
+# Marker names as written in result dicts and lab panels
+BIOMARKER_NAMES = frozenset({
+    "egfr", "alk", "ros1", "kras", "braf", "met", "ret", "ntrk", "her2", "er", "pr", "pd-l1", "pdl1",
+    "msi", "brca1", "brca2", "tmb", "psa", "cea", "ca-125",
+})
+_NEGATIVE = re.compile(r"\b(wild[\s-]?type|negative|no rearrangement|not detected|absent|normal)\b", re.IGNORECASE)
+
+
+class PrefetchPlan(BaseModel):
+    """Lookups derived from a patient case."""
+    conditions: List[str] = Field(default_factory=list, description="Diagnoses and comorbidities to look up guidelines for")
+    medications: List[str] = Field(default_factory=list, description="Medication strings from history and current condition")
+    biomarkers: List[str] = Field(default_factory=list, description="Positive biomarker findings, e.g. 'KRAS G12C mutation detected'")
+    primary_condition: Optional[str] = Field(None, description="Main diagnosis, combined with biomarkers for targeted lookups")
+
+    def guideline_queries(self) -> List[str]:
+        """Return the guideline queries to issue, primary diagnosis and biomarker combinations first."""
+        queries: List[str] = []
+        if self.primary_condition:
+            queries.append(self.primary_condition)
+            queries += [f"{self.primary_condition} {biomarker}" for biomarker in self.biomarkers]
+        queries += self.conditions
+        return list(dict.fromkeys(queries))[:MAX_GUIDELINE_QUERIES]
+
+
+def _collect_biomarkers(value: Any, found: List[str]) -> None:
+    """Collect positive ``marker: finding`` leaves from nested result dicts."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            if isinstance(item, str) and key.strip().lower() in BIOMARKER_NAMES:
+                if not _NEGATIVE.search(item):
+                    found.append(f"{key} {item}")
+            else:
+                _collect_biomarkers(item, found)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_biomarkers(item, found)
+
+
+def plan_prefetch(patient_case: PatientCase) -> PrefetchPlan:
+    """Extract conditions, medications and biomarkers from a patient case."""
+    current = patient_case.current_condition or {}
+    primary = next((current[k] for k in _CONDITION_KEYS if isinstance(current.get(k), str) and current[k].strip()), None)
+
+    # Pathology diagnoses and imaging impressions are more specific than the presenting complaint
+    for result in (patient_case.pathology_results or {}).values():
+        if isinstance(result, dict) and isinstance(result.get("diagnosis"), str):
+            primary = result["diagnosis"]
+            break
+    conditions = [
+        result["impression"] for result in (patient_case.imaging_results or {}).values()
+        if isinstance(result, dict) and isinstance(result.get("impression"), str)
+    ]
+    conditions += [
+        entry["condition"] for entry in patient_case.medical_history or []
+        if isinstance(entry.get("condition"), str)
+    ]
+
+    biomarkers: List[str] = []
+    _collect_biomarkers(patient_case.pathology_results or {}, biomarkers)
+    _collect_biomarkers(current, biomarkers)
+
+    return PrefetchPlan(
+        conditions=list(dict.fromkeys(c.strip() for c in conditions if c.strip())),
+        medications=extract_medications(patient_case),
+        biomarkers=list(dict.fromkeys(biomarkers)),
+        primary_condition=primary,
+    )
+
+
+async def _call_tool(name: str, **kwargs: Any) -> Optional[Dict[str, Any]]:
+    """Run one registry tool, returning None when it is missing or fails."""
+    try:
+        return await ToolRegistry.get_tool(name)._arun(**kwargs)
+    except Exception as e:
+        logger.warning(f"Pre-fetch lookup with '{name}' failed: {str(e)}")
+        return None
+
+
+async def prefetch_tool_context(plan: PrefetchPlan, tool_names: List[str]) -> Dict[str, Any]:
+    """Run the planned lookups concurrently and condense the results.
+
+    Args:
+        plan: Lookups extracted from the patient case
+        tool_names: Tools the calling agent may use
+
+    Returns:
+        Compact reference data keyed by kind; empty when nothing matched
+    """
+    started = time.perf_counter()
+    guideline_queries = plan.guideline_queries() if "guideline_reference" in tool_names else []
+    lookups = [_call_tool("guideline_reference", condition=query) for query in guideline_queries]
+    pharmacology = "pharmacology_reference" in tool_names and bool(plan.medications)
+    if pharmacology:
+        lookups.append(_call_tool("pharmacology_reference", medications=plan.medications))
+    results = await asyncio.gather(*lookups)
+
+    context: Dict[str, Any] = {}
+    guidelines: Dict[str, Dict[str, Any]] = {}
+    for query, result in zip(guideline_queries, results):
+        if result and result.get("status") == "success" and result["condition"] not in guidelines:
+            payload = result["guidelines"]
+            guidelines[result["condition"]] = {
+                "query": query,
+                "guideline": payload.get("name", result["condition"]),
+                "source": f"{payload.get('source', '')} {payload.get('version', '')}".strip(),
+                "recommendations": payload.get("recommendations", []),
+            }
+    if guidelines:
+        context["guidelines"] = list(guidelines.values())
+
+    if pharmacology and results[-1] and results[-1].get("status") == "success":
+        batch = results[-1]
+        context["medications"] = {
+            medication: [f"{entry['drug']} ({entry['data'].get('class')})" for entry in entries]
+            for medication, entries in batch["medications"].items() if entries
+        }
+        if batch["interactions"]:
+            context["drug_interactions"] = batch["interactions"]
+
+    if plan.biomarkers and context:
+        context["biomarkers"] = plan.biomarkers
+    logger.info(f"Pre-fetched {len(lookups)} tool lookups in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return context
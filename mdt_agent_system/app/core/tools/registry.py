@@ -1,75 +1,149 @@
-from typing import Dict, List, Type
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Type
 from .base import MDTTool
-from .medical import PharmacologyReferenceTool, GuidelineReferenceTool
+from .medical import PharmacologyReferenceTool, GuidelineReferenceTool, DrugInteractionMatrixTool
+
+from mdt_agent_system.app.core.logging.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Entry-point group third-party packages use to contribute tools
+ENTRY_POINT_GROUP = "mdt_agent_system.tools"
+
+DEFAULT_TOOL_CLASSES: Tuple[Type[MDTTool], ...] = (
+    PharmacologyReferenceTool,
+    GuidelineReferenceTool,
+    DrugInteractionMatrixTool,
+)
+
+def _tool_class_name(tool_cls: Type[MDTTool]) -> str:
+    """Read a tool class's default name without instantiating it."""
+    return tool_cls.__fields__["name"].default
+
+def _entry_points(group: str) -> Iterable[Any]:
+    """Return the installed entry points of ``group`` across Python versions."""
+    from importlib import metadata
+    eps = metadata.entry_points()
+    if hasattr(eps, "select"):
+        return eps.select(group=group)
+    return eps.get(group, [])
 
 class ToolRegistry:
-    """Registry for managing and accessing MDT tools."""
-    
+    """Registry for managing and accessing MDT tools.
+
+    Default tools and entry-point plugins are registered once, on first use,
+    under a lock. Afterwards ``get_tool`` is a single dict lookup; the
+    initialization check only runs when a name is missing.
+    """
+
     # Class-level registry
     _tools: Dict[str, MDTTool] = {}
-    
+    # The _tools dict that defaults were registered into; replacing _tools re-arms initialization
+    _initialized_for: Optional[Dict[str, MDTTool]] = None
+    _lock = threading.RLock()
+
+    @classmethod
+    def _ensure_initialized(cls) -> None:
+        """Register default and plugin tools exactly once per registry dict."""
+        if cls._initialized_for is cls._tools:
+            return
+        with cls._lock:
+            if cls._initialized_for is cls._tools:
+                return
+            cls._register_default_tools()
+            from mdt_agent_system.app.core.config import get_config
+            if getattr(get_config(), "TOOL_PLUGIN_DISCOVERY", True):
+                cls.discover_plugins()
+            cls._initialized_for = cls._tools
+
     @classmethod
     def _register_default_tools(cls):
-        """Register the default set of tools."""
-        if not cls._tools:  # Only register defaults if the registry is empty
-            default_tools = [
-                PharmacologyReferenceTool(),
-                GuidelineReferenceTool()
-            ]
-            for tool in default_tools:
-                if tool.name not in cls._tools:  # Check if the tool is already registered
-                    cls.register_tool(tool)
-        else:
-            # Ensure all default tools are registered even if some tools already exist
-            default_tools = [
-                PharmacologyReferenceTool(),
-                GuidelineReferenceTool()
-            ]
-            for tool in default_tools:
-                if tool.name not in cls._tools:  # Only register if not already present
-                    cls.register_tool(tool)
-    
+        """Register the default set of tools that are not registered yet."""
+        with cls._lock:
+            for tool_cls in DEFAULT_TOOL_CLASSES:
+                if _tool_class_name(tool_cls) not in cls._tools:
+                    cls.register_tool(tool_cls())
+
+    @classmethod
+    def discover_plugins(cls, group: str = ENTRY_POINT_GROUP) -> List[str]:
+        """Register tools exposed through installed entry points.
+
+        An entry point may reference an ``MDTTool`` subclass, an instance, or a
+        callable returning one tool or a list of tools. Broken plugins are
+        logged and skipped.
+
+        Returns:
+            Names of the newly registered tools
+        """
+        registered = []
+        for entry_point in _entry_points(group):
+            try:
+                loaded = entry_point.load()
+                if isinstance(loaded, type) and issubclass(loaded, MDTTool):
+                    tools = [loaded()]
+                elif isinstance(loaded, MDTTool):
+                    tools = [loaded]
+                else:
+                    produced = loaded()
+                    tools = list(produced) if isinstance(produced, (list, tuple)) else [produced]
+                with cls._lock:
+                    for tool in tools:
+                        if getattr(tool, "name", None) in cls._tools:
+                            logger.warning(f"Plugin tool '{tool.name}' from {entry_point.name} skipped: name already registered")
+                            continue
+                        cls.register_tool(tool)
+                        registered.append(tool.name)
+            except Exception as e:
+                logger.error(f"Failed to load tool plugin '{entry_point.name}': {e}")
+        if registered:
+            logger.info(f"Registered plugin tools: {registered}")
+        return registered
+
     @classmethod
     def register_tool(cls, tool: MDTTool) -> None:
         """Register a new tool."""
         if not isinstance(tool, MDTTool):
             raise ValueError(f"Tool must be an instance of MDTTool, got {type(tool)}")
-        
-        if tool.name in cls._tools:
-            raise ValueError(f"Tool with name '{tool.name}' is already registered")
-        
-        cls._tools[tool.name] = tool
-    
+
+        with cls._lock:
+            if tool.name in cls._tools:
+                raise ValueError(f"Tool with name '{tool.name}' is already registered")
+            cls._tools[tool.name] = tool
+
     @classmethod
     def get_tool(cls, name: str) -> MDTTool:
         """Get a tool by name."""
-        # Ensure defaults are registered
-        cls._register_default_tools()
-        
-        if name not in cls._tools:
+        tool = cls._tools.get(name)
+        if tool is not None:
+            return tool
+
+        cls._ensure_initialized()
+        tool = cls._tools.get(name)
+        if tool is None:
             raise KeyError(f"Tool '{name}' not found in registry")
-        return cls._tools[name]
-    
+        return tool
+
     @classmethod
     def list_tools(cls) -> List[str]:
         """List all registered tool names."""
-        # Ensure defaults are registered
-        cls._register_default_tools()
-        
+        cls._ensure_initialized()
         return list(cls._tools.keys())
-    
+
     @classmethod
     def get_tool_descriptions(cls) -> Dict[str, str]:
         """Get descriptions of all registered tools."""
-        # Ensure defaults are registered
-        cls._register_default_tools()
-        
+        cls._ensure_initialized()
         return {name: tool.description for name, tool in cls._tools.items()}
-    
+
     @classmethod
     def tool_count(cls) -> int:
         """Get the number of registered tools."""
-        # Ensure defaults are registered
-        cls._register_default_tools()
-        
-        return len(cls._tools) 
\ No newline at end of file
+        cls._ensure_initialized()
+        return len(cls._tools)
+
+    @classmethod
+    def reset(cls) -> None:
+        """Remove every tool; defaults are registered again on next use."""
+        with cls._lock:
+            cls._tools = {}
+            cls._initialized_for = None
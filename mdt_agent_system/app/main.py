@@ -1,3 +1,4 @@
+import asyncio
 import uvicorn
 import logging.config
 from contextlib import asynccontextmanager
@@ -9,6 +10,8 @@ import os
 from mdt_agent_system.app.core.config.settings import settings
 from mdt_agent_system.app.core.logging.log_config import LOGGING_CONFIG
 from mdt_agent_system.app.core.status.service import StatusUpdateService, get_status_service
+from mdt_agent_system.app.core.memory.retention import RetentionJob, RetentionPolicy, run_retention_periodically
+from mdt_agent_system.app.core.tools.base import shutdown_tool_executor
 
 logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
@@ -18,8 +21,36 @@ async def lifespan(app: FastAPI):
     logger.info("Application startup...")
     status_service = get_status_service()
     logger.info(f"StatusUpdateService initialized: {status_service}")
+
+    retention_task = None
+    if settings.RETENTION_ENABLED:
+        retention_job = RetentionJob(
+            memory_dir=settings.MEMORY_DIR,
+            reports_dir=settings.REPORTS_DIR,
+            policy=RetentionPolicy(
+                max_age_days=settings.RETENTION_MAX_AGE_DAYS,
+                max_runs=settings.RETENTION_MAX_RUNS,
+                archive=settings.RETENTION_ARCHIVE,
+                archive_dir=settings.RETENTION_ARCHIVE_DIR,
+            ),
+            # Never expire runs that clients are still streaming
+            protected_run_ids=lambda: list(status_service.subscribers.keys()),
+        )
+        retention_task = asyncio.create_task(run_retention_periodically(
+            retention_job,
+            settings.RETENTION_INTERVAL_SECONDS,
+            on_evicted=status_service.evict_runs,
+        ))
+        logger.info(f"Retention task started, interval {settings.RETENTION_INTERVAL_SECONDS}s")
     yield
     logger.info("Application shutdown...")
+    if retention_task is not None:
+        retention_task.cancel()
+        try:
+            await retention_task
+        except asyncio.CancelledError:
+            pass
+    shutdown_tool_executor()
 
 app = FastAPI(
     title="MDT Agent System",
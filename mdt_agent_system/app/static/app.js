@@ -71,6 +71,7 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Variables
     let patientCaseFile = null;
+    let submissionKey = null; // Idempotency-Key reused when a submission is retried
     let currentRunId = null;
     let eventSource = null;
     let reconnectAttempts = 0;
@@ -146,6 +147,7 @@ document.addEventListener('DOMContentLoaded', () => {
             
             fileName.textContent = file.name;
             patientCaseFile = file;
+            submissionKey = null;
             runSimulation.disabled = false;
         } else {
             fileName.textContent = 'No file selected';
@@ -176,9 +178,15 @@ document.addEventListener('DOMContentLoaded', () => {
             const formData = new FormData();
             formData.append('file', patientCaseFile);
             
+            // Keep the key until the server accepts the request, so a retry can't start a second run
+            if (!submissionKey) {
+                submissionKey = crypto.randomUUID();
+            }
+            
             // Send request to API
             const response = await fetch(`${apiBase}/simulate`, {
                 method: 'POST',
+                headers: { 'Idempotency-Key': submissionKey },
                 body: formData
             });
             
@@ -188,16 +196,28 @@ document.addEventListener('DOMContentLoaded', () => {
             }
             
             const data = await response.json();
+            submissionKey = null;
             currentRunId = data.run_id;
             console.log(`===> SIMULATION STARTED WITH RUN ID: ${currentRunId}`);
+            if (data.deduplicated) {
+                showMessage('This case was already submitted; following the existing run', 'info');
+            }
             
             // Update the runIdInput with the current run_id
             if (runIdInput) {
                 runIdInput.value = currentRunId;
             }
             
-            // Connect to SSE stream
-            connectSSE(currentRunId);
+            // A finished run has no events left to stream, only its report
+            if (data.completed) {
+                await fetchReportDirectly();
+                runSimulation.disabled = false;
+                runSimulation.innerHTML = '<i class="fas fa-play-circle"></i> Run Simulation';
+                return;
+            }
+            
+            // Connect to SSE stream, replaying earlier events when attached to an existing run
+            connectSSE(currentRunId, data.deduplicated);
             
             // Update UI to show simulation is running
             markdownSummary.innerHTML = '<div class="loading">Simulation in progress...</div>';
@@ -231,7 +251,7 @@ document.addEventListener('DOMContentLoaded', () => {
     }
 
     // Connect to SSE stream
-    function connectSSE(runId) {
+    function connectSSE(runId, replay = false) {
         // Close existing connection if any
         if (eventSource) {
             eventSource.close();
@@ -242,7 +262,7 @@ document.addEventListener('DOMContentLoaded', () => {
         reconnectAttempts = 0;
         
         // Create new EventSource - update URL to match backend
-        const sseUrl = `${apiBase}/status/${runId}/stream`;
+        const sseUrl = `${apiBase}/status/${runId}/stream` + (replay ? '?last_event_id=0' : '');
         console.log(`Connecting to SSE stream: ${sseUrl}`);
         
         // Add connection timeout
@@ -210,4 +210,90 @@ def test_ehr_agent_structure_output(mock_status_service):
     # Verify content mapping
     assert "Test patient summary" in structured["patient_summary"]
     assert "Condition 1" in structured["active_conditions"]
-    assert "Med 1" in structured["medications"] 
\ No newline at end of file
+    assert "Med 1" in structured["medications"] 
+
+@pytest.mark.asyncio
+async def test_prompt_budget_drops_oldest_history_first(mock_status_service, monkeypatch):
+    """Over budget, the oldest history entries are dropped and usage is recorded per run."""
+    from types import SimpleNamespace
+    from mdt_agent_system.app.core.config import get_config
+    from mdt_agent_system.app.core.tokens import get_token_ledger, reset_token_ledger
+    
+    reset_token_ledger()
+    history = [{"condition": f"Condition {i}", "diagnosed": f"20{10 + i}-01-01", "notes": "n" * 200} for i in range(10)]
+    case = PatientCase(patient_id="BUDGET1", demographics={}, medical_history=history, current_condition={})
+    agent = EHRAgent(run_id="budget-run", status_service=mock_status_service)
+    prompts = []
+    
+    async def ainvoke(prompt, config=None):
+        prompts.append("\n".join(m.content for m in prompt))
+        return SimpleNamespace(content="---MARKDOWN---\n# EHR\n---METADATA---\n{}", response_metadata={"usage_metadata": {"prompt_token_count": 900}})
+    
+    agent.llm = SimpleNamespace(ainvoke=ainvoke)
+    budget = agent._estimate_input_tokens(agent._prepare_input(case, {})) - 200
+    monkeypatch.setattr(get_config(), "AGENT_PROMPT_TOKEN_BUDGETS", {"ehr": budget})
+    monkeypatch.setattr(get_config(), "METADATA_RETRY_MAX_ATTEMPTS", 0)
+    
+    await agent.process(case, {})
+    
+    assert "Condition 0" not in prompts[0] and "Condition 9" in prompts[0]
+    usage = get_token_ledger().usage("budget-run")
+    assert usage[0]["budget"] == budget and usage[0]["trimmed_sections"] >= 1
+    assert usage[0]["reported_prompt_tokens"] == 900
+    assert usage[0]["estimated_prompt_tokens"] <= budget + 20
+    reset_token_ledger()
+
+
+@pytest.mark.asyncio
+async def test_prompt_budget_covers_the_shared_case(mock_status_service, monkeypatch):
+    """With PROMPT_SHARED_CASE the shared case section is counted and trimmed under the stage budget."""
+    from types import SimpleNamespace
+    from mdt_agent_system.app.agents import base_agent
+    from mdt_agent_system.app.core.config import get_config
+    from mdt_agent_system.app.core.tokens import estimate_tokens, get_token_ledger, reset_token_ledger
+    
+    reset_token_ledger()
+    history = [{"condition": f"Condition {i}", "diagnosed": f"20{10 + i}-01-01", "notes": "n" * 200} for i in range(10)]
+    case = PatientCase(patient_id="BUDGET2", demographics={}, medical_history=history, current_condition={})
+    monkeypatch.setattr(get_config(), "PROMPT_SHARED_CASE", True)
+    monkeypatch.setattr(get_config(), "METADATA_RETRY_MAX_ATTEMPTS", 0)
+    monkeypatch.setattr(base_agent, "get_context_cache", lambda: None)
+    agent = EHRAgent(run_id="shared-budget-run", status_service=mock_status_service)
+    agent.prefetch_tools = False
+    agent.tool_names = []
+    prompts = []
+    
+    async def ainvoke(prompt, config=None):
+        prompts.append("\n".join(m.content for m in prompt))
+        return SimpleNamespace(content="---MARKDOWN---\n# EHR\n---METADATA---\n{}")
+    
+    agent.llm = SimpleNamespace(ainvoke=ainvoke)
+    full = agent._estimate_input_tokens(agent._prepare_within_budget(case, {}))
+    # The untrimmed shared case dominates the estimate
+    assert full - estimate_tokens(agent.prompt.text) > 5 * 200 // 4
+    budget = full - 200
+    monkeypatch.setattr(get_config(), "AGENT_PROMPT_TOKEN_BUDGETS", {"ehr": budget})
+    
+    await agent.process(case, {})
+    
+    assert "Condition 0" not in prompts[0] and "Condition 9" in prompts[0]
+    usage = get_token_ledger().usage("shared-budget-run")
+    assert usage[0]["trimmed_sections"] >= 1
+    assert budget - 200 < usage[0]["estimated_prompt_tokens"] <= budget + 20
+    reset_token_ledger()
+
+
+@pytest.mark.asyncio
+async def test_agents_prepare_their_case_projection(mock_status_service, sample_patient_case):
+    """process() hands _prepare_input the agent type's view of the case."""
+    from mdt_agent_system.app.agents.imaging_agent import ImagingAgent
+    
+    agent = ImagingAgent(run_id="projection-run", status_service=mock_status_service)
+    seen = []
+    agent._prepare_input = lambda case, context: seen.append(case) or {"context": "{}", "task": "t"}
+    agent._run_analysis = AsyncMock(return_value="---MARKDOWN---\n# Imaging\n---METADATA---\n{}")
+    agent._repair_metadata = AsyncMock(side_effect=lambda output: output)
+    
+    await agent.process(sample_patient_case, {})
+    
+    assert seen[0].medical_history == [] and seen[0].current_condition == sample_patient_case.current_condition
@@ -244,4 +244,25 @@ async def test_process_flow(mock_run_analysis, sample_patient_case, sample_agent
     # Verify the LLM was called with appropriate input
     mock_run_analysis.assert_called_once()
     input_data = agent._prepare_input(sample_patient_case, sample_agent_context)
-    assert "MDT Report" in input_data["context"] 
\ No newline at end of file
+    assert "MDT Report" in input_data["context"] 
+
+def test_structure_output_accepts_parsed_agent_output():
+    """Criterion scores are returned and parsed AgentOutput is accepted."""
+    from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
+
+    service = AsyncMock(spec=StatusUpdateService)
+    agent = EvaluationAgent(run_id="test-run", status_service=service)
+    markdown = (
+        "**Overall Quality Score:** 0.82/1.0 (good)\n"
+        "1. Completeness: 0.9\n2. Documentation: 0.7\n\n"
+        "## Strengths\n- Consistent staging\n"
+    )
+
+    result = agent._structure_output(AgentOutput(markdown_content=markdown, metadata={}))
+
+    assert result["score"] == 0.82
+    assert result["score_label"] == "good"
+    assert result["criteria_scores"] == {"completeness": 0.9, "documentation": 0.7}
+    assert result["strengths"] == ["Consistent staging"]
+    assert result["areas_for_improvement"] == ["Consider providing more detailed treatment rationale."]
+    assert "Overall Score: 0.82" in result["evaluation_formatted"]
@@ -7,6 +7,7 @@ from mdt_agent_system.app.agents.specialist_agent import SpecialistAgent
 from mdt_agent_system.app.core.schemas import PatientCase
 from mdt_agent_system.app.core.schemas.agent_output import AgentOutput
 from mdt_agent_system.app.core.status import StatusUpdateService
+from mdt_agent_system.app.core.tools import ToolRegistry
 
 @pytest.fixture
 def mock_status_service():
@@ -178,4 +179,95 @@ def test_specialist_agent_structure_output(mock_status_service):
     assert "Finding 1" in structured["overall_assessment"]
     assert "Test treatment 1" in structured["treatment_considerations"]
     assert "Test followup 1" in structured["follow_up_recommendations"]
-    assert "Case complexity: low" in structured["risk_assessment"] 
\ No newline at end of file
+    assert "Case complexity: low" in structured["risk_assessment"]
+
+@pytest.mark.asyncio
+async def test_specialist_agent_drug_interactions(mock_status_service, sample_patient_case, sample_context, monkeypatch):
+    agent = SpecialistAgent(run_id="test_run", status_service=mock_status_service)
+    
+    # No recognisable medications: no interaction context
+    assert await agent._check_drug_interactions(sample_patient_case) is None
+    context_dict = json.loads(agent._prepare_input(sample_patient_case, sample_context)["context"])
+    assert "drug_interactions" not in context_dict
+    
+    sample_patient_case.medical_history.append({"condition": "Hypertension", "treatment": "Lisinopril 20mg daily"})
+    sample_patient_case.current_condition["medications"] = ["Ibuprofen 400mg PRN"]
+    interactions = await agent._check_drug_interactions(sample_patient_case)
+    assert interactions["drugs"] == ["lisinopril", "ibuprofen"]
+    assert interactions["flagged_pairs"][0]["drugs"] == ["ibuprofen", "lisinopril"]
+    assert interactions["flagged_pairs"][0]["severity"] == "moderate"
+    
+    # process() awaits the tool's async path and hands the result to _prepare_input
+    tool = ToolRegistry.get_tool("drug_interaction_matrix")
+    arun = AsyncMock(return_value={"status": "success", "drug_ids": ["lisinopril"], "unmatched": [], "flagged_pairs": []})
+    monkeypatch.setattr(type(tool), "_arun", arun)
+    prepared = []
+    original_prepare = agent._prepare_input
+    monkeypatch.setattr(agent, "_prepare_input", lambda case, ctx: prepared.append(ctx) or original_prepare(case, ctx))
+    monkeypatch.setattr(agent, "_run_analysis", AsyncMock(return_value="plain response"))
+    await agent.process(sample_patient_case, sample_context)
+    arun.assert_awaited_once_with(patient_case=sample_patient_case)
+    assert prepared[0]["drug_interactions"]["drugs"] == ["lisinopril"]
+    assert json.loads(agent._prepare_input(sample_patient_case, prepared[0])["context"])["drug_interactions"]["drugs"] == ["lisinopril"]
+
+@pytest.mark.asyncio
+async def test_specialist_agent_retries_only_invalid_metadata_fields(mock_status_service, sample_patient_case, monkeypatch):
+    from langchain_core.messages import AIMessage
+    agent = SpecialistAgent(run_id="test_run", status_service=mock_status_service)
+    
+    async def mock_run_analysis(*args, **kwargs):
+        return (
+            "---MARKDOWN---\n# Clinical Assessment\n- Stable\n"
+            "---METADATA---\n"
+            '{"key_findings": ["Stage II"], "confidence_scores": {"diagnosis": 0.0-1.0}}'
+        )
+    
+    prompts = []
+    async def fake_ainvoke(messages, config=None):
+        prompts.append(messages[0].content)
+        return AIMessage(content=(
+            '```json\n{"confidence_scores": {"diagnosis": 0.9}, '
+            '"clinical_metrics": {"case_complexity": "medium", "treatment_urgency": "routine"}, '
+            '"key_findings": ["ignored"]}\n```'
+        ))
+    
+    monkeypatch.setattr(agent, "_run_analysis", mock_run_analysis)
+    agent.llm = Mock(ainvoke=fake_ainvoke)
+    result = await agent.process(sample_patient_case, {})
+    
+    # One follow-up call carrying only the previous metadata and the errors
+    assert len(prompts) == 1
+    assert "Stable" not in prompts[0] and "Breast cancer" not in prompts[0]
+    assert "confidence_scores.diagnosis" in prompts[0]
+    assert '["clinical_metrics","confidence_scores"]' in prompts[0]
+    assert result["metadata"]["confidence_scores"] == {"diagnosis": 0.9}
+    assert result["metadata"]["key_findings"] == ["Stage II"]
+    assert "Case complexity: medium" in result["risk_assessment"]
+
+@pytest.mark.asyncio
+async def test_specialist_agent_metadata_retry_limits(mock_status_service, sample_patient_case, monkeypatch):
+    from langchain_core.messages import AIMessage
+    from mdt_agent_system.app.core.config import get_config
+    agent = SpecialistAgent(run_id="test_run", status_service=mock_status_service)
+    
+    async def mock_run_analysis(*args, **kwargs):
+        return "---MARKDOWN---\n# Clinical Assessment\n- Stable\n---METADATA---\n{}"
+    
+    calls = []
+    async def fake_ainvoke(messages, config=None):
+        calls.append(messages)
+        return AIMessage(content="I cannot provide that.")
+    
+    monkeypatch.setattr(agent, "_run_analysis", mock_run_analysis)
+    agent.llm = Mock(ainvoke=fake_ainvoke)
+    
+    monkeypatch.setattr(get_config(), "METADATA_RETRY_MAX_ATTEMPTS", 2)
+    result = await agent.process(sample_patient_case, {})
+    assert len(calls) == 2
+    assert result["metadata"] == {}
+    
+    # A budget smaller than one follow-up prompt prevents the call entirely
+    calls.clear()
+    monkeypatch.setattr(get_config(), "METADATA_RETRY_MAX_TOKENS", 10)
+    await agent.process(sample_patient_case, {})
+    assert calls == []
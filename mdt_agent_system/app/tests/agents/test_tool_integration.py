@@ -47,4 +47,243 @@ async def test_guideline_agent_tool_integration(mock_status_service):
             
             # Verify that the _prepare_input method includes tool information
             input_data = agent._prepare_input(patient_case, {})
-            assert "available_tools" in input_data["context"] 
\ No newline at end of file
+            assert "available_tools" in input_data["context"] 
+
+class _ScriptedLLM:
+    """Fake chat model that replays scripted responses and records the messages it saw."""
+    
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+        self.tool_choices = []
+    
+    def bind_tools(self, tools, tool_choice=None):
+        self.bound = list(tools)
+        self.tool_choices.append(tool_choice)
+        return self
+    
+    async def ainvoke(self, messages, config=None):
+        self.calls.append(list(messages))
+        return self.responses.pop(0)
+
+@pytest.mark.asyncio
+async def test_tool_loop_executes_calls_concurrently(mock_status_service):
+    """Every tool call of a turn runs concurrently and its result is fed back."""
+    import threading
+    from langchain_core.messages import AIMessage, ToolMessage
+    from mdt_agent_system.app.core.tools import MDTTool, MDTToolConfig
+    
+    # Each call waits for the other, so both only succeed if they run at the same time
+    barrier = threading.Barrier(2, timeout=5)
+    
+    class SlowTool(MDTTool):
+        name: str = "slow_lookup"
+        description: str = "Slow synchronous lookup"
+        
+        def _run(self, condition: str, **kwargs):
+            barrier.wait()
+            return {"status": "success", "condition": condition}
+    
+    ToolRegistry._tools = {}
+    ToolRegistry.register_tool(SlowTool(config=MDTToolConfig(max_retries=0)))
+    agent = GuidelineAgent(run_id="test_run", status_service=mock_status_service)
+    agent.tool_names = ["slow_lookup"]
+    agent.llm = _ScriptedLLM([
+        AIMessage(content="", tool_calls=[
+            {"name": "slow_lookup", "args": {"condition": "nsclc"}, "id": "call-1"},
+            {"name": "slow_lookup", "args": {"condition": "copd"}, "id": "call-2"},
+            {"name": "missing_tool", "args": {}, "id": "call-3"},
+        ]),
+        AIMessage(content="final answer"),
+    ])
+    
+    result = await agent._run_analysis({"context": "{}", "task": "t"})
+    
+    assert result == "final answer"
+    tool_messages = [m for m in agent.llm.calls[1] if isinstance(m, ToolMessage)]
+    assert [m.tool_call_id for m in tool_messages] == ["call-1", "call-2", "call-3"]
+    assert '"condition":"copd"' in tool_messages[1].content
+    assert "Unknown tool" in tool_messages[2].content
+    
+    details = mock_status_service.emit_status_update.call_args.kwargs["status_update_data"]["details"]
+    assert details["iteration"] == 1
+    assert [t["tool"] for t in details["tool_calls"]] == ["slow_lookup", "slow_lookup", "missing_tool"]
+    assert [t["status"] for t in details["tool_calls"]] == ["success", "success", "error"]
+    assert all(t["latency_ms"] >= 0 for t in details["tool_calls"])
+    ToolRegistry._tools = {}
+
+@pytest.mark.asyncio
+async def test_tool_loop_max_iterations(mock_status_service):
+    """The loop stops after max_tool_iterations and asks for a final answer."""
+    from langchain_core.messages import AIMessage
+    
+    ToolRegistry._tools = {}
+    agent = GuidelineAgent(run_id="test_run", status_service=mock_status_service)
+    agent.max_tool_iterations = 2
+    looping = AIMessage(content="", tool_calls=[{"name": "guideline_reference", "args": {"condition": "chest pain"}, "id": "c"}])
+    agent.llm = _ScriptedLLM([looping, looping, AIMessage(content="forced answer")])
+    
+    assert await agent._run_analysis({"context": "{}", "task": "t"}) == "forced answer"
+    assert len(agent.llm.calls) == 3
+    # The forced answer keeps the tools bound but disables calling them
+    assert agent.llm.tool_choices == [None, "none"]
+    assert [tool.name for tool in agent.llm.bound] == ["guideline_reference"]
+
+
+def test_tools_bind_with_explicit_argument_schemas():
+    """The model sees each tool's declared arguments, never _run's kwargs or in-process-only arguments."""
+    from langchain_core.utils.function_calling import convert_to_openai_tool
+    
+    ToolRegistry.reset()
+    parameters = {
+        name: convert_to_openai_tool(ToolRegistry.get_tool(name))["function"]["parameters"]
+        for name in ("guideline_reference", "pharmacology_reference", "drug_interaction_matrix")
+    }
+    assert set(parameters["guideline_reference"]["properties"]) == {"condition", "limit"}
+    assert parameters["guideline_reference"]["required"] == ["condition"]
+    assert set(parameters["pharmacology_reference"]["properties"]) == {"query", "medications"}
+    assert set(parameters["drug_interaction_matrix"]["properties"]) == {"medications", "min_severity"}
+
+@pytest.mark.asyncio
+async def test_prefetched_context_injected_before_analysis(mock_status_service):
+    """Guideline lookups derivable from the case reach the first prompt."""
+    ToolRegistry.reset()
+    agent = GuidelineAgent(run_id="test_run", status_service=mock_status_service)
+    patient_case = PatientCase(
+        patient_id="TEST123",
+        demographics={"age": 65, "gender": "male"},
+        current_condition={"primary_diagnosis": "Stage III non-small cell lung cancer"},
+        medical_history=[{"condition": "Hypertension", "treatment": "Lisinopril 20mg daily"}]
+    )
+    captured = {}
+    
+    async def fake_run_analysis(agent_input):
+        captured.update(agent_input)
+        return "Mocked LLM response"
+    
+    with patch.object(agent, "_run_analysis", side_effect=fake_run_analysis):
+        with patch.object(agent, "_structure_output", return_value={"summary": "Test summary"}):
+            await agent.process(patient_case, {})
+    
+    assert "PRE-FETCHED REFERENCE DATA" in captured["context"]
+    assert "Non-small cell lung cancer, stage III" in captured["context"]
+    assert "ACC/AHA 2017" in captured["context"]
+    
+    agent.prefetch_tools = False
+    with patch.object(agent, "_run_analysis", side_effect=fake_run_analysis):
+        with patch.object(agent, "_structure_output", return_value={"summary": "Test summary"}):
+            await agent.process(patient_case, {})
+    assert "PRE-FETCHED" not in captured["context"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_sections_emitted_as_they_complete(mock_status_service):
+    """With stream_sections, each markdown section is pushed as a status update."""
+    from types import SimpleNamespace
+    from mdt_agent_system.app.agents.summary_agent import SummaryAgent
+    
+    response = (
+        "---MARKDOWN---\n# Summary\nStable.\n## Plan\n- Follow up\n"
+        "---METADATA---\n{\"confidence\": 0.8}"
+    )
+    
+    async def astream(prompt, config=None):
+        for start in range(0, len(response), 5):
+            yield SimpleNamespace(content=response[start:start + 5])
+    
+    agent = SummaryAgent(run_id="test_run", status_service=mock_status_service)
+    agent.stream_sections = True
+    agent.llm = SimpleNamespace(astream=astream)
+    patient_case = PatientCase(patient_id="TEST123", demographics={}, medical_history=[], current_condition={})
+    
+    result = await agent.process(patient_case, {})
+    
+    assert result["markdown_content"] == "# Summary\nStable.\n## Plan\n- Follow up"
+    assert result["metadata"] == {"confidence": 0.8}
+    details = [c.kwargs["status_update_data"]["details"] for c in mock_status_service.emit_status_update.call_args_list]
+    assert [d.get("section") for d in details if "section" in d] == ["Summary", "Plan"]
+    assert details[2]["markdown"] == "- Follow up"
+
+
+@pytest.mark.asyncio
+async def test_stream_agent_sections_setting_streams_summary_step(mock_status_service, monkeypatch):
+    """STREAM_AGENT_SECTIONS turns on streaming for the agents the coordinator builds."""
+    from types import SimpleNamespace
+    from mdt_agent_system.app.agents import base_agent
+    from mdt_agent_system.app.agents.coordinator import AgentContext, _run_summary_step
+    from mdt_agent_system.app.core.config import get_config
+    
+    response = "---MARKDOWN---\n# Summary\nStable.\n## Plan\n- Follow up\n---METADATA---\n{}"
+    
+    async def astream(prompt, config=None):
+        for start in range(0, len(response), 7):
+            yield SimpleNamespace(content=response[start:start + 7])
+    
+    async def ainvoke(prompt, config=None):
+        raise AssertionError("summary step should stream")
+    
+    monkeypatch.setattr(get_config(), "STREAM_AGENT_SECTIONS", ["summary"])
+    monkeypatch.setattr(base_agent, "get_llm", lambda callbacks=None: SimpleNamespace(astream=astream, ainvoke=ainvoke))
+    patient_case = PatientCase(patient_id="TEST123", demographics={}, medical_history=[], current_condition={})
+    context = AgentContext.model_construct(
+        run_id="test_run", patient_case=patient_case, status_service=mock_status_service,
+        ehr_analysis=None, imaging_analysis=None, pathology_analysis=None,
+        guideline_recommendations=None, specialist_assessment=None, evaluation=None, summary=None
+    )
+    
+    context = await _run_summary_step(context)
+    
+    assert context.summary["markdown_content"] == "# Summary\nStable.\n## Plan\n- Follow up"
+    details = [c.kwargs["status_update_data"].get("details", {}) for c in mock_status_service.emit_status_update.call_args_list]
+    assert [d["section"] for d in details if "section" in d] == ["Summary", "Plan"]
+
+
+@pytest.mark.asyncio
+async def test_shared_case_prefix_references_provider_cache(mock_status_service, monkeypatch):
+    """With PROMPT_SHARED_CASE, stages send the case once per run through the context cache."""
+    from types import SimpleNamespace
+    from mdt_agent_system.app.agents import base_agent
+    from mdt_agent_system.app.agents.imaging_agent import ImagingAgent
+    from mdt_agent_system.app.agents.pathology_agent import PathologyAgent
+    from mdt_agent_system.app.core.config import get_config
+    from mdt_agent_system.app.core.context_cache import ContextCache
+    
+    class FakeCache(ContextCache):
+        def __init__(self):
+            super().__init__()
+            self.uploads = []
+        
+        def _create(self, system, shared):
+            self.uploads.append(shared)
+            return "cachedContents/run"
+        
+        def bind(self, llm, name):
+            return SimpleNamespace(ainvoke=lambda prompt, config=None: llm.ainvoke(prompt, config, cached=name))
+    
+    calls = []
+    
+    async def ainvoke(prompt, config=None, cached=None):
+        calls.append((cached, prompt))
+        return SimpleNamespace(content="---MARKDOWN---\n# Findings\n---METADATA---\n{}")
+    
+    cache = FakeCache()
+    monkeypatch.setattr(get_config(), "PROMPT_SHARED_CASE", True)
+    monkeypatch.setattr(get_config(), "METADATA_RETRY_MAX_ATTEMPTS", 0)
+    monkeypatch.setattr(base_agent, "get_context_cache", lambda: cache)
+    patient_case = PatientCase(
+        patient_id="SHARED1", demographics={"age": 70}, medical_history=[{"condition": "COPD"}],
+        current_condition={"primary_diagnosis": "NSCLC"}
+    )
+    
+    for agent_class in (ImagingAgent, PathologyAgent):
+        agent = agent_class(run_id="shared-run", status_service=mock_status_service)
+        agent.prefetch_tools = False
+        agent.tool_names = []
+        agent.llm = SimpleNamespace(ainvoke=ainvoke)
+        await agent.process(patient_case, {})
+    
+    assert len(cache.uploads) == 1 and "COPD" in cache.uploads[0]
+    assert [cached for cached, _ in calls] == ["cachedContents/run", "cachedContents/run"]
+    for _, prompt in calls:
+        # Only the stage part is sent; the case lives in the cached prefix
+        assert len(prompt) == 1 and "COPD" not in prompt[0].content
@@ -87,4 +87,162 @@ def test_simulate_schema_validation_error(invalid_patient_case_data):
     assert "PatientCase validation failed:" in response_data["detail"]
     # Check for specific validation errors if needed, e.g.:
     # assert "'demographics'" in response_data["detail"]
-    # assert "Field required" in response_data["detail"] 
\ No newline at end of file
+    # assert "Field required" in response_data["detail"] 
+def test_simulate_rejects_oversized_upload(valid_patient_case_data, monkeypatch):
+    """Uploads past MAX_CASE_UPLOAD_BYTES are refused with 413."""
+    from mdt_agent_system.app.core.config import get_config
+    monkeypatch.setattr(get_config(), "MAX_CASE_UPLOAD_BYTES", 64)
+    file = io.BytesIO(json.dumps(valid_patient_case_data).encode('utf-8'))
+
+    response = client.post("/api/simulate", files={"file": ("case.json", file, "application/json")})
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Patient case exceeds the 64 byte upload limit."}
+
+def test_simulate_reports_list_limit_by_field(valid_patient_case_data, monkeypatch):
+    """List limits come back as precise per-field validation errors."""
+    from mdt_agent_system.app.core.config import get_config
+    monkeypatch.setattr(get_config(), "MAX_CASE_LAB_RESULTS", 1)
+    valid_patient_case_data["lab_results"] = [{"test": "Hb"}, {"test": "WBC"}]
+    file = io.BytesIO(json.dumps(valid_patient_case_data).encode('utf-8'))
+
+    response = client.post("/api/simulate", files={"file": ("case.json", file, "application/json")})
+
+    assert response.status_code == 422
+    assert response.json() == {
+        "detail": "PatientCase validation failed: lab_results: List should have at most 1 items, not 2"
+    }
+
+def test_simulate_batch_streams_a_record_per_line(valid_patient_case_data, monkeypatch):
+    """Batch lines start runs as they parse, one at a time with MAX_CONCURRENT_RUNS=1."""
+    import asyncio
+    import time
+    from mdt_agent_system.app.api import endpoints
+    from mdt_agent_system.app.core.config import get_config
+    from mdt_agent_system.app.core.run_limits import reset_run_limiter
+
+    runs = {"active": 0, "peak": 0, "done": []}
+
+    async def fake_simulation(patient_case, run_id, status_service):
+        runs["active"] += 1
+        runs["peak"] = max(runs["peak"], runs["active"])
+        await asyncio.sleep(0.01)
+        runs["active"] -= 1
+        runs["done"].append(patient_case.patient_id)
+
+    monkeypatch.setattr(endpoints, "run_mdt_simulation", fake_simulation)
+    monkeypatch.setattr(get_config(), "MAX_CONCURRENT_RUNS", 1)
+    reset_run_limiter()
+    second = dict(valid_patient_case_data, patient_id="test-003")
+    body = b"\n".join([
+        json.dumps(valid_patient_case_data).encode("utf-8"),
+        b"",
+        b'{"patient_id": "broken",}',
+        json.dumps({"patient_id": "test-004"}).encode("utf-8"),
+        json.dumps(second).encode("utf-8"),
+    ]) + b"\n"
+    try:
+        with TestClient(app) as batch_client:
+            response = batch_client.post("/api/simulate/batch", content=body,
+                                         headers={"Content-Type": "application/x-ndjson"})
+            deadline = time.monotonic() + 5
+            while len(runs["done"]) < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+    finally:
+        reset_run_limiter()
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+    assert [record["line"] for record in records] == [1, 3, 4, 5]
+    assert set(records[0]) == {"line", "run_id"} and set(records[3]) == {"line", "run_id"}
+    assert records[1]["error"].startswith("Invalid JSON:")
+    assert records[2]["error"].startswith("PatientCase validation failed: demographics: Field required")
+    assert runs["done"] == ["test-001", "test-003"]
+    assert runs["peak"] == 1
+
+def test_simulate_batch_requires_ndjson():
+    response = client.post("/api/simulate/batch", content=b"{}", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid content type. Only NDJSON is accepted."}
+
+@pytest.fixture
+def fake_runs(monkeypatch):
+    """Replace the coordinator with a stub recording the runs it was started for."""
+    from mdt_agent_system.app.api import endpoints
+    from mdt_agent_system.app.core.run_dedupe import reset_run_deduplicator
+
+    started = []
+
+    async def fake_simulation(patient_case, run_id, status_service):
+        started.append(run_id)
+
+    monkeypatch.setattr(endpoints, "run_mdt_simulation", fake_simulation)
+    reset_run_deduplicator()
+    yield started
+    reset_run_deduplicator()
+
+def _post_case(data, **headers):
+    file = io.BytesIO(json.dumps(data).encode('utf-8'))
+    return client.post("/api/simulate", files={"file": ("case.json", file, "application/json")}, headers=headers)
+
+def test_simulate_repeated_idempotency_key_attaches_to_the_run(valid_patient_case_data, fake_runs):
+    first = _post_case(valid_patient_case_data, **{"Idempotency-Key": "submit-1"})
+    retry = _post_case(valid_patient_case_data, **{"Idempotency-Key": "submit-1"})
+    other = _post_case(valid_patient_case_data, **{"Idempotency-Key": "submit-2"})
+
+    assert first.status_code == retry.status_code == 202
+    assert first.json()["deduplicated"] is False
+    assert retry.json()["completed"] is False
+    assert retry.json()["run_id"] == first.json()["run_id"]
+    assert retry.json()["deduplicated"] is True
+    assert other.json()["run_id"] != first.json()["run_id"]
+    assert fake_runs == [first.json()["run_id"], other.json()["run_id"]]
+
+    changed = dict(valid_patient_case_data, patient_id="test-099")
+    conflict = _post_case(changed, **{"Idempotency-Key": "submit-1"})
+    assert conflict.status_code == 422
+    assert conflict.json() == {"detail": "Idempotency-Key was already used for a different patient case."}
+
+def test_simulate_dedupes_identical_cases_in_the_window(valid_patient_case_data, fake_runs, monkeypatch):
+    from mdt_agent_system.app.core.config import get_config
+    monkeypatch.setattr(get_config(), "CASE_DEDUPE_WINDOW_MINUTES", 5)
+
+    first = _post_case(valid_patient_case_data)
+    second = _post_case(valid_patient_case_data)
+    other = _post_case(dict(valid_patient_case_data, patient_id="test-099"))
+
+    assert second.json()["run_id"] == first.json()["run_id"]
+    assert second.json()["deduplicated"] is True
+    assert other.json()["deduplicated"] is False
+    assert len(fake_runs) == 2
+
+def test_simulate_retry_of_a_finished_run_points_at_its_report(valid_patient_case_data, monkeypatch, tmp_path):
+    """Once a run has ended its events are gone, so a duplicate is sent to the report instead."""
+    from mdt_agent_system.app.api import endpoints
+    from mdt_agent_system.app.core.config import get_config
+    from mdt_agent_system.app.core.memory.retention import report_file_path
+    from mdt_agent_system.app.core.run_dedupe import reset_run_deduplicator
+
+    async def finished_simulation(patient_case, run_id, status_service):
+        report_file_path(run_id).write_text(json.dumps({"patient_id": patient_case.patient_id, "summary": "done"}))
+
+    monkeypatch.setattr(endpoints, "run_mdt_simulation", finished_simulation)
+    monkeypatch.setattr(get_config(), "REPORTS_DIR", str(tmp_path))
+    reset_run_deduplicator()
+    try:
+        # The test client runs the background task before returning, so the run has finished
+        first = _post_case(valid_patient_case_data, **{"Idempotency-Key": "submit-done"})
+        retry = _post_case(valid_patient_case_data, **{"Idempotency-Key": "submit-done"})
+    finally:
+        reset_run_deduplicator()
+
+    run_id = first.json()["run_id"]
+    assert retry.status_code == 202
+    assert retry.json() == {
+        "run_id": run_id,
+        "message": "Identical simulation request already completed; its report is available.",
+        "deduplicated": True,
+        "completed": True,
+    }
+    assert client.get(f"/api/report/{run_id}").json() == {"patient_id": "test-001", "summary": "done"}
@@ -0,0 +1,71 @@
+"""Compare peak memory of reading a whole NDJSON batch before splitting it with incremental line parsing.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_batch_ingest [--cases 2000] [--chunk-kb 64]
+"""
+import argparse
+import asyncio
+import json
+import time
+import tracemalloc
+from typing import AsyncIterator, Awaitable, Callable
+
+from mdt_agent_system.app.core.ingest import iter_ndjson_lines, parse_patient_case
+from mdt_agent_system.app.core.samples.patient_case import get_sample_case
+
+
+def batch_bytes(cases: int) -> bytes:
+    case = get_sample_case()
+    lines = []
+    for i in range(cases):
+        case["patient_id"] = f"BATCH-{i}"
+        lines.append(json.dumps(case))
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+async def body_chunks(data: bytes, chunk_size: int) -> AsyncIterator[bytes]:
+    """The request body as the server receives it, in chunks."""
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+async def read_all(data: bytes, chunk_size: int) -> int:
+    """Buffer the whole body, then validate every line."""
+    body = b"".join([chunk async for chunk in body_chunks(data, chunk_size)])
+    return sum(1 for line in body.splitlines() if line.strip() and parse_patient_case(line, limits={}))
+
+
+async def incremental(data: bytes, chunk_size: int) -> int:
+    """Validate each line as soon as it is complete."""
+    count = 0
+    async for _, line in iter_ndjson_lines(body_chunks(data, chunk_size), max_line_bytes=len(data)):
+        count += parse_patient_case(line, limits={}) is not None
+    return count
+
+
+def measure(ingest: Callable[[bytes, int], Awaitable[int]], data: bytes, chunk_size: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = asyncio.run(ingest(data, chunk_size))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--chunk-kb", type=int, default=64)
+    args = parser.parse_args()
+
+    data = batch_bytes(args.cases)
+    chunk_size = args.chunk_kb * 1024
+    print(f"batch of {args.cases} cases, {len(data) / (1024 * 1024):.1f} MB")
+    for name, ingest in (("read whole body", read_all), ("incremental lines", incremental)):
+        count, elapsed, peak = measure(ingest, data, chunk_size)
+        print(f"  {name:<18} {count} cases {elapsed * 1e3:8.1f} ms  peak {peak:6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
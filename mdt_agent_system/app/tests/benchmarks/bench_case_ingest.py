@@ -0,0 +1,91 @@
+"""Compare read + json.loads + PatientCase(**data) with direct bytes-to-model validation for large uploads.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_case_ingest [--repeat 20] [--sizes 1,4,8]
+"""
+import argparse
+import asyncio
+import io
+import json
+import timeit
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+from mdt_agent_system.app.core.ingest import parse_patient_case, read_limited
+from mdt_agent_system.app.core.schemas import PatientCase
+
+
+class Upload:
+    """UploadFile stand-in over an in-memory body."""
+
+    def __init__(self, data: bytes):
+        self._stream = io.BytesIO(data)
+        self.size = None
+
+    async def read(self, size: int = -1) -> bytes:
+        return self._stream.read(size)
+
+
+def case_bytes(megabytes: float) -> bytes:
+    """A case of at least ``megabytes`` MB, mostly lab results with some history."""
+    labs: List[Dict[str, Any]] = []
+    history = [
+        {"condition": f"Condition {i}", "diagnosed": f"20{i % 20:02d}-03-01", "status": "Resolved",
+         "treatment": "Conservative management, reviewed annually"}
+        for i in range(200)
+    ]
+    case = {
+        "patient_id": "BENCH-1",
+        "demographics": {"age": 67, "gender": "F"},
+        "medical_history": history,
+        "current_condition": {"primary_complaint": "Persistent cough", "onset": "2024-01-10"},
+        "lab_results": labs,
+    }
+    target = int(megabytes * 1024 * 1024)
+    size = len(json.dumps(case))
+    i = 0
+    while size < target:
+        lab = {"test": f"Panel {i % 40}", "date": f"2024-{i % 12 + 1:02d}-15", "value": round(3.5 + i % 50 / 10, 2),
+               "unit": "mmol/L", "reference_range": "3.5-5.1", "flag": "normal" if i % 7 else "high"}
+        labs.append(lab)
+        size += len(json.dumps(lab)) + 2
+        i += 1
+    return json.dumps(case).encode("utf-8")
+
+
+def legacy_ingest(data: bytes) -> PatientCase:
+    """The former endpoint: read everything, json.loads, then PatientCase(**dict)."""
+    contents = asyncio.run(Upload(data).read())
+    return PatientCase(**json.loads(contents))
+
+
+def direct_ingest(data: bytes) -> PatientCase:
+    contents = asyncio.run(read_limited(Upload(data), max_bytes=len(data)))
+    return parse_patient_case(contents, limits={})
+
+
+def peak_mb(run: Callable[[], Any]) -> float:
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / (1024 * 1024)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--sizes", default="1,4,8", help="Comma-separated case sizes in MB")
+    args = parser.parse_args()
+
+    for megabytes in (float(size) for size in args.sizes.split(",")):
+        data = case_bytes(megabytes)
+        assert legacy_ingest(data).lab_results == direct_ingest(data).lab_results
+        print(f"case {len(data) / (1024 * 1024):.2f} MB")
+        for name, ingest in (("read+loads+model", legacy_ingest), ("direct JSON mode", direct_ingest)):
+            total = timeit.timeit(lambda: ingest(data), number=args.repeat)
+            print(f"  {name:<18} {total / args.repeat * 1e3:8.1f} ms  peak {peak_mb(lambda: ingest(data)):6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Compare per-step upstream context rebuilding with serialize-once stage snapshots.
+
+Before snapshots every step re-ran ``dict()`` on each completed stage output,
+compacted the result and serialized it twice for the token estimates; with
+snapshots each output is serialized once when its stage completes.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_context_snapshots [--repeat 200] [--history 40]
+"""
+import argparse
+import timeit
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+from mdt_agent_system.app.agents.coordinator import AgentContext, AgentOutputPlaceholder, _upstream_context
+from mdt_agent_system.app.core.context_compaction import compact_context
+from mdt_agent_system.app.core.schemas import PatientCase
+from mdt_agent_system.app.core.tokens import estimate_json_tokens
+
+# (stage key, agent reading the stages before it, whether that agent keeps the markdown)
+STAGES = (
+    ("ehr_analysis", "ImagingAgent", False),
+    ("imaging_analysis", "PathologyAgent", False),
+    ("pathology_analysis", "GuidelineAgent", False),
+    ("guideline_recommendations", "SpecialistAgent", False),
+    ("specialist_assessment", "EvaluationAgent", True),
+    ("evaluation", "SummaryAgent", False),
+)
+
+
+def stage_output(name: str, history: int) -> Dict[str, Any]:
+    findings = [f"{name} finding {i}" for i in range(12)]
+    markdown = f"# {name}\n## Findings\n" + "".join(f"- {f}\n" for f in findings)
+    markdown += "## Detail\n" + "".join(f"- Entry {i}: reviewed, stable, no change in management\n" for i in range(history))
+    return {
+        "summary": f"{name} completed",
+        "findings": findings,
+        "markdown_content": markdown,
+        "metadata": {"key_findings": findings[:4], "clinical_metrics": {"entries": history}},
+    }
+
+
+def completed_stages(history: int) -> Dict[str, Any]:
+    values: Dict[str, Any] = {}
+    for key, _, _ in STAGES:
+        output = stage_output(key, history)
+        if key == "guideline_recommendations":
+            values[key] = [output, stage_output("alternative", history)]
+        elif key == "evaluation":
+            values[key] = output
+        else:
+            values[key] = AgentOutputPlaceholder.from_agent_output(output)
+    return values
+
+
+def legacy_run(values: Dict[str, Any]) -> None:
+    """Each step rebuilt, compacted and serialized every upstream output."""
+    for index, (_, agent_id, markdown) in enumerate(STAGES):
+        agent_context = {}
+        for key, _, _ in STAGES[:index + 1]:
+            value = values[key]
+            agent_context[key] = value.dict() if isinstance(value, AgentOutputPlaceholder) else value
+        compacted = compact_context(agent_context, include_markdown=markdown)
+        estimate_json_tokens(agent_context), estimate_json_tokens(compacted)
+
+
+def snapshot_run(values: Dict[str, Any], patient_case: PatientCase) -> None:
+    """Each stage is snapshotted once; every step reads the snapshots."""
+    context = AgentContext.model_construct(run_id="bench", patient_case=patient_case, status_service=None,
+                                           context_tokens={}, snapshots={})
+    keys: List[str] = []
+    for key, agent_id, markdown in STAGES:
+        setattr(context, key, values[key])
+        context.record_snapshot(key)
+        keys.append(key)
+        _upstream_context(context, SimpleNamespace(agent_id=agent_id, upstream_markdown=markdown), tuple(keys))
+
+
+def peak_kb(run: Callable[[], None]) -> float:
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--history", type=int, default=40, help="Detail lines in each stage's markdown")
+    args = parser.parse_args()
+
+    values = completed_stages(args.history)
+    patient_case = PatientCase(patient_id="P1", demographics={}, medical_history=[], current_condition={})
+    runs = (
+        ("per-step rebuild", lambda: legacy_run(values)),
+        ("stage snapshots", lambda: snapshot_run(values, patient_case)),
+    )
+    for name, run in runs:
+        total = timeit.timeit(run, number=args.repeat)
+        print(f"{name:<18} {total / args.repeat * 1e3:8.2f} ms/run  peak {peak_kb(run):8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compare the keyword line scans EvaluationAgent used with the single-pass evaluation parser.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_evaluation_parser [--repeat 2000] [--scale 1]
+"""
+import argparse
+import json
+import pathlib
+import timeit
+from typing import Any, Dict
+
+from mdt_agent_system.app.core.evaluation_parser import parse_evaluation
+
+CORPUS_PATH = pathlib.Path(__file__).parent.parent / "data" / "evaluation_outputs.json"
+
+
+def legacy_parse(llm_output: str) -> Dict[str, Any]:
+    """The score and section scans EvaluationAgent ran before the shared parser."""
+    result: Dict[str, Any] = {"score": 0.0, "comments": "", "strengths": [], "areas_for_improvement": [], "missing_elements": []}
+    lines = llm_output.split('\n')
+    for line in lines:
+        line = line.strip()
+        if (("overall" in line.lower() and "score" in line.lower()) or line.lower().startswith("score:")) and ":" in line:
+            score_text = line.split(":", 1)[1].strip()
+            try:
+                value = float(score_text.replace("/1.0", "").replace("/1", "").replace("%", "").strip())
+            except ValueError:
+                continue
+            result["score"] = round(value / 100 if value > 1.0 else value, 2)
+            break
+    section = None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        lower_line = line.lower()
+        if "strength" in lower_line and (":" in line or line.endswith("strengths")):
+            section = "strengths"
+            continue
+        elif any(x in lower_line for x in ["area", "improvement", "weakness"]) and (":" in line or line.endswith("improvements")):
+            section = "areas_for_improvement"
+            continue
+        elif "missing" in lower_line and (":" in line or line.endswith("elements")):
+            section = "missing_elements"
+            continue
+        elif "comment" in lower_line and ":" in line:
+            section = "comments"
+            result["comments"] = line.split(":", 1)[1].strip()
+            continue
+        if section == "comments":
+            result["comments"] += " " + line
+        elif section and not line.endswith(":"):
+            result[section].append(line)
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--scale", type=int, default=1, help="Repeat each output's lists this many times")
+    args = parser.parse_args()
+
+    corpus = json.loads(CORPUS_PATH.read_text())
+    outputs = [case["output"] * args.scale for case in corpus]
+
+    agreed = sum(legacy_parse(case["output"])["score"] == case["expected"]["score"] for case in corpus)
+    correct = sum(parse_evaluation(case["output"]).score == case["expected"]["score"] for case in corpus)
+    print(f"corpus: {len(corpus)} outputs, {sum(map(len, outputs)) / 1024:.1f} KB")
+    print(f"overall score correct: legacy {agreed}/{len(corpus)}, parser {correct}/{len(corpus)}")
+    # The legacy scans drop per-criterion scores and labels; the parser's extra time goes there
+    criteria = sum(len(parse_evaluation(case["output"]).criteria) for case in corpus)
+    print(f"criterion scores extracted: legacy 0, parser {criteria}")
+
+    for name, parse in (("legacy line scans", legacy_parse), ("evaluation parser", parse_evaluation)):
+        total = timeit.timeit(lambda: [parse(output) for output in outputs], number=args.repeat)
+        print(f"{name:<20} {total / (args.repeat * len(outputs)) * 1e6:8.1f} us/output")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Benchmark the guideline inverted index against a synthetic corpus.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_guideline_index [--size 10000]
+"""
+import argparse
+import random
+import time
+
+from mdt_agent_system.app.core.tools.guideline_index import GuidelineKnowledgeBase
+from mdt_agent_system.app.tests.synthetic_data import synthetic_guidelines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    entries = synthetic_guidelines(args.size)
+    start = time.perf_counter()
+    kb = GuidelineKnowledgeBase(entries)
+    build_s = time.perf_counter() - start
+
+    rng = random.Random(11)
+    queries = []
+    for _ in range(args.queries):
+        i = rng.randrange(args.size)
+        queries.append(rng.choice([
+            entries[i]["name"],
+            f"{entries[i]['synonyms'][0]} {entries[i]['tags'][0]}",
+            f"patient with {entries[i]['icd_codes'][0]}",
+        ]))
+
+    hits = 0
+    start = time.perf_counter()
+    for query in queries:
+        results = kb.search(query, limit=5)
+        hits += bool(results)
+    search_s = time.perf_counter() - start
+
+    # Baseline: linear substring scan over every entry, as the original tool did
+    start = time.perf_counter()
+    for query in queries[:200]:
+        lowered = query.lower()
+        [e for e in entries if e["name"] in lowered]
+    scan_s = (time.perf_counter() - start) / min(len(queries), 200)
+
+    print(f"entries:            {args.size}")
+    print(f"build:              {build_s * 1000:.1f} ms")
+    print(f"indexed lookup:     {search_s / len(queries) * 1e6:.1f} us/query ({hits}/{len(queries)} with results)")
+    print(f"linear scan lookup: {scan_s * 1e6:.1f} us/query")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Measure the share of a full MDT run spent encoding and decoding JSON, per codec backend.
+
+Runs the coordinator pipeline end to end against a canned chat model (no
+network) with a real status service and report file under a temporary
+directory, and profiles it. Serialization time is the time spent inside the
+JSON codec and the json/orjson modules. LLM latency is excluded, so the share
+is an upper bound for real runs; pass --llm-seconds to add it back.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_json_codec [--runs 5] [--history 40] [--llm-seconds 0]
+"""
+import argparse
+import asyncio
+import contextlib
+import cProfile
+import io
+import pstats
+import tempfile
+import time
+import uuid
+from typing import Any, Tuple
+
+from langchain_core.messages import AIMessage
+
+from mdt_agent_system.app.agents import base_agent
+from mdt_agent_system.app.agents.coordinator import run_mdt_simulation
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.schemas import PatientCase
+from mdt_agent_system.app.core.samples.patient_case import get_sample_case
+from mdt_agent_system.app.core.status.service import StatusUpdateService
+
+RESPONSE = (
+    "---MARKDOWN---\n# Assessment\n## Findings\n"
+    + "".join(f"- Finding {i}: stable on review, no change in management\n" for i in range(20))
+    + "## Plan\n- Continue current treatment\n- Review in 3 months\n"
+    "---METADATA---\n"
+    '{"key_findings": ["Stage III NSCLC", "COPD GOLD 2"], "score": 0.85, '
+    '"confidence_scores": {"overall": 0.8}, "clinical_metrics": {"active_conditions": ["NSCLC", "COPD"]}}'
+)
+
+
+class CannedLLM:
+    """Chat model stand-in answering every prompt with RESPONSE, without tool binding like 0.0.5."""
+
+    def bind_tools(self, tools: Any) -> Any:
+        raise NotImplementedError
+
+    async def ainvoke(self, prompt: Any, config: Any = None) -> AIMessage:
+        return AIMessage(content=RESPONSE)
+
+    async def astream(self, prompt: Any, config: Any = None):
+        yield AIMessage(content=RESPONSE)
+
+
+def is_serialization(key: Tuple[str, int, str]) -> bool:
+    filename, _, name = key
+    return (
+        filename.endswith("json_codec.py")
+        or "/json/" in filename
+        or "orjson" in name
+        or "_json." in name
+    )
+
+
+def profile_runs(patient_case: PatientCase, runs: int, directory: str) -> Tuple[float, float]:
+    """Return (wall seconds, serialization seconds) for ``runs`` full runs."""
+    service = StatusUpdateService(persistence_path=f"{directory}/status_{json_codec.backend()}.json")
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    # The coordinator prints its debug trace to stdout
+    with contextlib.redirect_stdout(io.StringIO()):
+        profiler.enable()
+        for _ in range(runs):
+            asyncio.run(run_mdt_simulation(patient_case, str(uuid.uuid4()), service))
+        profiler.disable()
+    wall = time.perf_counter() - start
+    stats = pstats.Stats(profiler).stats
+    serialization = sum(entry[2] for key, entry in stats.items() if is_serialization(key))
+    return wall, serialization
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--history", type=int, default=40, help="Extra medical history entries in the case")
+    parser.add_argument("--llm-seconds", type=float, default=0.0, help="LLM latency per run to include in the share")
+    args = parser.parse_args()
+
+    case = get_sample_case()
+    case["medical_history"] += [
+        {"condition": f"Condition {i}", "diagnosed": f"20{i % 20:02d}-01-01", "status": "Resolved"}
+        for i in range(args.history)
+    ]
+    patient_case = PatientCase(**case)
+    base_agent.get_llm = lambda callbacks=None: CannedLLM()
+    fast = json_codec._orjson
+
+    with tempfile.TemporaryDirectory() as directory:
+        get_config().REPORTS_DIR = directory
+        for backend in ("orjson", "json"):
+            if backend == "orjson" and fast is None:
+                print("orjson        not installed")
+                continue
+            json_codec._orjson = fast if backend == "orjson" else None
+            wall, serialization = profile_runs(patient_case, args.runs, directory)
+            per_run, serial_per_run = wall / args.runs, serialization / args.runs
+            share = serial_per_run / (per_run + args.llm_seconds)
+            print(f"{backend:<8} {per_run * 1e3:8.1f} ms/run (profiled)  "
+                  f"serialization {serial_per_run * 1e3:7.1f} ms/run  share {share:6.1%}")
+        json_codec._orjson = fast
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare per-section line scanning with the shared markdown outline on large outputs.
+
+Usage:
+    python -m mdt_agent_system.app.tests.benchmarks.bench_output_parser [--size-kb 50] [--repeat 200]
+"""
+import argparse
+import timeit
+from typing import Dict, List
+
+from mdt_agent_system.app.core.output_parser import MDTOutputParser, parse_markdown_outline
+
+SECTIONS = ["Clinical Assessment", "Disease Status", "Treatment Recommendations", "Risk Assessment", "Follow-up Plan"]
+
+
+def synthetic_markdown(size_kb: int) -> str:
+    """Build specialist-style markdown of roughly ``size_kb`` kilobytes."""
+    parts: List[str] = []
+    length = 0
+    index = 0
+    while length < size_kb * 1024:
+        title = SECTIONS[index % len(SECTIONS)]
+        block = [f"## {title}" if index else f"# {title}"]
+        block += [f"- {title} item {index}.{i}: supporting detail for the MDT discussion" for i in range(12)]
+        block.append(f"### Notes {index}")
+        block += [f"Free text note {index}.{i} referencing prior findings." for i in range(4)]
+        text = "\n".join(block) + "\n"
+        parts.append(text)
+        length += len(text)
+        index += 1
+    return "".join(parts)
+
+
+def legacy_extract(markdown: str) -> Dict[str, object]:
+    """The per-section scans agents used before the shared outline."""
+    result: Dict[str, object] = {"overall_assessment": "", "treatment": [], "follow_up": []}
+    lines = markdown.split('\n')
+    for line in lines:
+        if "# Clinical Assessment" in line or "## Disease Status" in line:
+            next_idx = lines.index(line) + 1
+            if next_idx < len(lines):
+                result["overall_assessment"] = lines[next_idx].strip('- ')
+                break
+    for key, header in (("treatment", "## Treatment Recommendations"), ("follow_up", "## Follow-up Plan")):
+        in_section = False
+        for line in markdown.split('\n'):
+            if header in line:
+                in_section = True
+                continue
+            if in_section and line.strip() and line.startswith('- '):
+                result[key].append(line.strip('- '))
+    return result
+
+
+def outline_extract(markdown: str) -> Dict[str, object]:
+    """The same lookups through one outline pass."""
+    outline = parse_markdown_outline(markdown)
+    section = outline.find("Clinical Assessment", "Disease Status")
+    return {
+        "overall_assessment": section.first_line.strip('- ') if section else "",
+        "treatment": outline.bullets("Treatment Recommendations", include_subsections=True),
+        "follow_up": outline.bullets("Follow-up Plan", include_subsections=True),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-kb", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    markdown = synthetic_markdown(args.size_kb)
+    llm_output = f"---MARKDOWN---\n{markdown}\n---METADATA---\n{{\"key_findings\": []}}"
+    output_parser = MDTOutputParser()
+
+    def streamed() -> None:
+        stream = output_parser.stream()
+        for start in range(0, len(llm_output), 16):
+            stream.feed(llm_output[start:start + 16])
+        stream.close()
+
+    timings = {
+        "legacy per-section scans": timeit.timeit(lambda: legacy_extract(markdown), number=args.repeat),
+        "markdown outline": timeit.timeit(lambda: outline_extract(markdown), number=args.repeat),
+        "parse_llm_output (whole)": timeit.timeit(lambda: output_parser.parse_llm_output(llm_output), number=args.repeat),
+        "streaming, 16-char chunks": timeit.timeit(streamed, number=args.repeat),
+    }
+
+    outline = parse_markdown_outline(markdown)
+    print(f"markdown size: {len(markdown) / 1024:.1f} KB, {len(outline.sections)} sections")
+    for name, total in timings.items():
+        print(f"{name:<26} {total / args.repeat * 1000:8.3f} ms/output")
+
+
+if __name__ == "__main__":
+    main()
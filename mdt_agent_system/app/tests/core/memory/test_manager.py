@@ -98,6 +98,19 @@ class TestMemoryManager:
         assert "config1" in metadata_keys
         assert "config2" in metadata_keys
     
+    def test_prefix_and_count_queries(self, temp_memory_dir):
+        manager = MemoryManager(temp_memory_dir)
+        for session_id in ["run1_EHRAgent", "run1_SummaryAgent", "run2_EHRAgent"]:
+            manager.create_conversation_memory(session_id).save_context(
+                {"input": "Hello"}, {"output": "Hi"}
+            )
+        
+        assert manager.list_conversations("run1_") == ["run1_EHRAgent", "run1_SummaryAgent"]
+        assert manager.count_conversations() == 3
+        assert manager.count_conversations("run2_") == 1
+        assert manager.count_agent_states() == 0
+        assert manager.count_metadata_keys() == 0
+    
     def test_nonexistent_data(self, temp_memory_dir):
         manager = MemoryManager(temp_memory_dir)
         
@@ -38,6 +38,47 @@ class TestJSONFileMemoryStore:
     def test_nonexistent_key_returns_none(self, temp_json_file):
         store = JSONFileMemoryStore(temp_json_file)
         assert store.get_memory("nonexistent_key") is None
+        
+    def test_key_index_prefix_and_count(self, temp_json_file):
+        store = JSONFileMemoryStore(temp_json_file)
+        store.save_memory("run1_EHRAgent", {"a": 1})
+        store.save_memory("run1_ImagingAgent", {"a": 2})
+        store.save_memory("run2_EHRAgent", {"a": 3})
+        
+        assert Path(temp_json_file + ".index.json").exists()
+        assert store.list_keys() == ["run1_EHRAgent", "run1_ImagingAgent", "run2_EHRAgent"]
+        assert store.list_keys("run1_") == ["run1_EHRAgent", "run1_ImagingAgent"]
+        assert store.count() == 3
+        assert store.count("run2_") == 1
+        assert store.has_key("run2_EHRAgent")
+        assert not store.has_key("run3_EHRAgent")
+        
+    def test_index_used_without_loading_values(self, temp_json_file, monkeypatch):
+        JSONFileMemoryStore(temp_json_file).save_memory("k1", {"a": 1})
+        
+        # A fresh store must answer key queries from the sidecar index alone
+        store = JSONFileMemoryStore(temp_json_file)
+        monkeypatch.setattr(store, "_load_data", lambda: pytest.fail("values were deserialized"))
+        assert store.list_keys() == ["k1"]
+        assert store.count() == 1
+        
+    def test_cache_invalidated_by_external_write(self, temp_json_file):
+        store = JSONFileMemoryStore(temp_json_file)
+        store.save_memory("k1", {"a": 1})
+        assert store.get_memory("k1") == {"a": 1}
+        
+        # Another process rewrites the file; the stale index must be ignored
+        with open(temp_json_file, "w", encoding="utf-8") as f:
+            json.dump({"k1": {"a": 2}, "k2": {"b": 1}, "padding": "x" * 16}, f)
+        
+        assert store.get_memory("k1") == {"a": 2}
+        assert store.list_keys() == ["k1", "k2", "padding"]
+        
+    def test_get_memory_returns_copy(self, temp_json_file):
+        store = JSONFileMemoryStore(temp_json_file)
+        store.save_memory("k1", {"items": [1]})
+        store.get_memory("k1")["items"].append(2)
+        assert store.get_memory("k1") == {"items": [1]}
 
 class TestJSONFileChatMessageHistory:
     def test_add_and_get_messages(self, temp_json_file):
@@ -0,0 +1,55 @@
+import pytest
+
+from mdt_agent_system.app.core.case_projection import CASE_PROJECTIONS, CaseProjection, ProjectionCache
+from mdt_agent_system.app.core.schemas import PatientCase
+
+
+@pytest.fixture
+def patient_case():
+    return PatientCase(
+        patient_id="P1",
+        demographics={"age": 64},
+        medical_history=[{"condition": f"C{year}", "diagnosed": f"{year}-01-01"} for year in (2019, 2012, 2021, 2015, 2023, 2010, 2017)],
+        current_condition={"primary_diagnosis": "NSCLC"},
+        imaging_results={"ct": {"impression": "3.2 cm RUL mass"}},
+        pathology_results={"biopsy": {"diagnosis": "Adenocarcinoma"}},
+        lab_results=[{"test": "Hemoglobin", "value": 12.1}, {"test": "PD-L1 TPS", "value": "60%"}, {"test": "CEA", "value": 4.2}],
+    )
+
+
+def test_imaging_view_drops_history_and_pathology(patient_case):
+    view = CASE_PROJECTIONS["imaging"].apply(patient_case)
+    assert view.imaging_results == patient_case.imaging_results
+    assert view.medical_history == [] and view.pathology_results is None and view.lab_results is None
+    assert (view.patient_id, view.current_condition) == ("P1", {"primary_diagnosis": "NSCLC"})
+
+
+def test_pathology_view_keeps_biomarker_labs(patient_case):
+    view = CASE_PROJECTIONS["pathology"].apply(patient_case)
+    assert [lab["test"] for lab in view.lab_results] == ["PD-L1 TPS", "CEA"]
+    assert view.pathology_results == patient_case.pathology_results
+
+
+def test_guideline_view_keeps_most_recent_history_in_order(patient_case):
+    view = CASE_PROJECTIONS["guideline"].apply(patient_case)
+    assert [entry["condition"] for entry in view.medical_history] == ["C2019", "C2021", "C2015", "C2023", "C2017"]
+    assert len(patient_case.medical_history) == 7
+
+
+def test_views_are_built_once_per_run(patient_case, monkeypatch):
+    cache = ProjectionCache()
+    projection = CaseProjection(frozenset({"demographics"}))
+    calls = []
+    original = CaseProjection.apply
+    monkeypatch.setattr(CaseProjection, "apply", lambda self, case: calls.append(self) or original(self, case))
+
+    first = cache.get("run-1", patient_case, projection)
+    assert cache.get("run-1", patient_case, projection) is first
+    assert cache.get("run-2", patient_case, projection) is not first
+    replaced = patient_case.model_copy()
+    assert cache.get("run-1", replaced, projection) is not first
+    assert len(calls) == 3
+
+    cache.discard("run-1")
+    cache.get("run-1", patient_case, projection)
+    assert len(calls) == 4
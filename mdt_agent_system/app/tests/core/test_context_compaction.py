@@ -0,0 +1,121 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from mdt_agent_system.app.agents.coordinator import AgentContext, AgentOutputPlaceholder, _upstream_context
+from mdt_agent_system.app.core.context_compaction import (
+    StageSnapshot,
+    compact_context,
+    compact_stage_output,
+    markdown_findings,
+)
+from mdt_agent_system.app.core.schemas import PatientCase
+
+MARKDOWN = (
+    "# EHR Analysis\n## Findings\n- Stage III NSCLC\n- **COPD** GOLD 2\n"
+    "## History\n" + "".join(f"- Visit {i}: routine review, no change\n" for i in range(40))
+)
+
+
+def _stage_output():
+    result = {
+        "patient_summary": "68-year-old former smoker with stage III NSCLC",
+        "active_conditions": ["NSCLC", "COPD"],
+        "medications": [],
+        "markdown_content": MARKDOWN,
+        "metadata": {
+            "key_findings": ["Stage III NSCLC", "COPD GOLD 2"],
+            "clinical_metrics": {"active_conditions": ["NSCLC", "COPD"], "current_medications": []},
+        },
+    }
+    return AgentOutputPlaceholder.from_agent_output(result).dict()
+
+
+def test_stage_output_keeps_each_fact_once():
+    compact = compact_stage_output(_stage_output())
+
+    assert compact["key_findings"] == ["Stage III NSCLC", "COPD GOLD 2"]
+    assert compact["patient_summary"].startswith("68-year-old")
+    # Repeated in the metadata, and empty fields are dropped
+    assert "active_conditions" not in compact and "medications" not in compact
+    assert compact["metadata"] == {"clinical_metrics": {"active_conditions": ["NSCLC", "COPD"], "current_medications": []}}
+    assert "markdown_content" not in compact and "details" not in compact
+    assert json.dumps(compact).count("Stage III NSCLC") == 1
+
+
+def test_full_markdown_on_request():
+    compact = compact_stage_output(_stage_output(), include_markdown=True)
+    assert compact["markdown_content"] == MARKDOWN
+    assert json.dumps(compact).count("Visit 39") == 1
+
+
+def test_findings_fall_back_to_markdown_items():
+    output = AgentOutputPlaceholder.from_agent_output({"markdown_content": MARKDOWN, "metadata": {}}).dict()
+    assert compact_stage_output(output, max_findings=3)["key_findings"] == ["Stage III NSCLC", "COPD GOLD 2", "Visit 0: routine review, no change"]
+    assert markdown_findings("no lists here") == []
+
+
+def test_lists_and_plain_values_pass_through():
+    compacted = compact_context({"guideline_recommendations": [_stage_output()], "note": "text"})
+    assert compacted["note"] == "text"
+    assert compacted["guideline_recommendations"][0]["key_findings"] == ["Stage III NSCLC", "COPD GOLD 2"]
+
+
+def _context():
+    patient_case = PatientCase(patient_id="P1", demographics={}, medical_history=[], current_condition={})
+    context = AgentContext.model_construct(run_id="r", patient_case=patient_case, status_service=None,
+                                           context_tokens={}, snapshots={})
+    context.ehr_analysis = AgentOutputPlaceholder.from_agent_output(_stage_output()["details"])
+    context.imaging_analysis = AgentOutputPlaceholder.from_agent_output(_stage_output()["details"])
+    context.record_snapshot("ehr_analysis")
+    context.record_snapshot("imaging_analysis")
+    return context
+
+
+def test_upstream_context_records_tokens(monkeypatch):
+    from mdt_agent_system.app.core.config import get_config
+    context = _context()
+    keys = ("ehr_analysis", "imaging_analysis", "pathology_analysis")
+
+    compacted = _upstream_context(context, SimpleNamespace(agent_id="PathologyAgent"), keys)
+
+    assert set(compacted) == {"ehr_analysis", "imaging_analysis"}
+    tokens = context.context_tokens["PathologyAgent"]
+    assert tokens["after"] * 4 < tokens["before"]
+    assert "markdown_content" not in compacted["ehr_analysis"]
+
+    monkeypatch.setattr(get_config(), "CONTEXT_COMPACTION_ENABLED", False)
+    full = _upstream_context(context, SimpleNamespace(agent_id="SummaryAgent"), keys)
+    assert full["ehr_analysis"] == context.ehr_analysis.dict()
+    assert "SummaryAgent" not in context.context_tokens
+
+
+def test_snapshot_is_serialized_once_and_reused():
+    context = _context()
+    snapshot = context.snapshots["ehr_analysis"]
+
+    assert json.loads(snapshot.json_bytes) == snapshot.data == context.ehr_analysis.dict()
+    assert snapshot.view() == compact_stage_output(snapshot.data)
+    assert snapshot.view(include_markdown=True)["markdown_content"] == MARKDOWN
+    # Every downstream stage gets the same precomputed views
+    first = _upstream_context(context, SimpleNamespace(agent_id="PathologyAgent"), ("ehr_analysis",))
+    second = _upstream_context(context, SimpleNamespace(agent_id="SummaryAgent"), ("ehr_analysis",))
+    assert first["ehr_analysis"] is second["ehr_analysis"] is snapshot.compact
+    with pytest.raises(AttributeError):
+        snapshot.data = {}
+
+
+def test_snapshot_is_independent_of_the_stage_output():
+    output = {"summary": "done", "items": [{"name": "a"}]}
+    snapshot = StageSnapshot.capture(output)
+    output["items"].append({"name": "b"})
+    assert snapshot.data["items"] == [{"name": "a"}]
+    assert StageSnapshot.capture([output]).compact[0]["summary"] == "done"
+
+
+def test_empty_outputs_get_no_snapshot():
+    context = _context()
+    context.guideline_recommendations = []
+    assert context.record_snapshot("guideline_recommendations") is None
+    assert "guideline_recommendations" not in context.snapshots
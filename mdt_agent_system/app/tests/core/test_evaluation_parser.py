@@ -0,0 +1,79 @@
+import json
+import pathlib
+
+import pytest
+from mdt_agent_system.app.core.evaluation_parser import normalize_score, parse_evaluation
+
+CORPUS = json.loads((pathlib.Path(__file__).parent.parent / "data" / "evaluation_outputs.json").read_text())
+
+
+@pytest.mark.parametrize("case", CORPUS, ids=[case["id"] for case in CORPUS])
+def test_corpus_outputs_are_parsed(case):
+    result = parse_evaluation(case["output"])
+    expected = case["expected"]
+
+    assert result.score == expected["score"]
+    assert result.criteria_scores() == expected["criteria_scores"]
+    assert len(result.strengths) == expected["strengths"]
+    assert len(result.areas_for_improvement) == expected["areas_for_improvement"]
+    assert len(result.missing_elements) == expected["missing_elements"]
+    assert expected.get("comments_contains", "") in result.comments
+    if "score_label" in expected:
+        assert result.score_label == expected["score_label"]
+    assert not any(item.startswith(("-", "*")) for item in result.strengths)
+
+
+@pytest.mark.parametrize("written,expected", [
+    (("0.85",), 0.85),
+    (("85", "%"), 0.85),
+    (("8.5", None, "10"), 0.85),
+    (("0.85", None, "1.0"), 0.85),
+    (("7",), 0.7),
+    (("92",), 0.92),
+    (("12", None, "10"), None),
+])
+def test_normalize_score(written, expected):
+    assert normalize_score(*written) == expected
+
+
+def test_criterion_labels_are_kept():
+    result = parse_evaluation("Score: 0.85/1.0 (good)\n- Completeness: 0.9 (excellent)\n")
+    assert (result.score, result.score_label) == (0.85, "good")
+    assert [(c.name, c.score, c.label) for c in result.criteria] == [("Completeness", 0.9, "excellent")]
+
+
+@pytest.mark.parametrize("text,expected", [
+    ("## Quality Score\n0.85\n", 0.85),
+    ("**Quality Score**\n0.85\n", 0.85),
+    ("Overall Score:\n17/20\n", 0.85),
+    ("## Score\n85%\n## Strengths\n- Thorough staging\n", 0.85),
+])
+def test_bare_value_under_score_heading(text, expected):
+    assert parse_evaluation(text).score == expected
+
+
+def test_comments_label_never_becomes_a_criterion():
+    result = parse_evaluation("Overall Score: 0.8\nComments: 2 of 3 sections ok\n")
+    assert result.score == 0.8
+    assert result.criteria == []
+    assert result.comments == "2 of 3 sections ok"
+
+
+@pytest.mark.parametrize("line", [
+    "Completeness: 3 sections lack detail",
+    "Patient age: 65 years considered",
+])
+def test_number_led_prose_is_not_a_criterion(line):
+    result = parse_evaluation(f"Overall Score: 0.8\n## Comments\n{line}\n")
+    assert result.criteria == []
+    assert result.comments == line
+
+
+@pytest.mark.parametrize("line,expected", [
+    ("Completeness: 0.9", (0.9, None)),
+    ("Completeness: 9/10 (excellent)", (0.9, "excellent")),
+    ("Completeness: 0.9 - very thorough", (0.9, "very thorough")),
+])
+def test_criterion_score_with_label(line, expected):
+    [criterion] = parse_evaluation(line).criteria
+    assert (criterion.score, criterion.label) == expected
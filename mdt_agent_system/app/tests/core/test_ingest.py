@@ -0,0 +1,111 @@
+import asyncio
+import codecs
+import io
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from mdt_agent_system.app.core.config import get_config
+from mdt_agent_system.app.core.ingest import (
+    CaseTooLargeError,
+    InvalidCaseJSONError,
+    format_validation_errors,
+    iter_ndjson_lines,
+    parse_patient_case,
+    read_limited,
+)
+from mdt_agent_system.app.core.schemas import PatientCase
+
+
+class _Upload:
+    """Minimal stand-in for UploadFile that records how much was read."""
+
+    def __init__(self, data: bytes, size=None):
+        self._stream = io.BytesIO(data)
+        self.size = size
+        self.read_bytes = 0
+
+    async def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self.read_bytes += len(chunk)
+        return chunk
+
+
+def _case(**changes):
+    case = {
+        "patient_id": "P1",
+        "demographics": {"age": 64},
+        "medical_history": [{"condition": "COPD", "diagnosed": "2019-04-01"}],
+        "current_condition": {"primary_complaint": "cough"},
+        "lab_results": [{"test": "Hb", "value": 12.1}],
+    }
+    case.update(changes)
+    return json.dumps(case).encode("utf-8")
+
+
+def test_bytes_validate_into_the_model():
+    case = parse_patient_case(codecs.BOM_UTF8 + _case(created_at="2024-05-01T10:00:00"))
+    assert isinstance(case, PatientCase)
+    assert case.medical_history[0]["condition"] == "COPD"
+    assert case.created_at.year == 2024
+
+
+def test_invalid_json_is_reported_as_such():
+    with pytest.raises(InvalidCaseJSONError, match="line 1"):
+        parse_patient_case(b'{"patient_id": "P1",}')
+
+
+def test_errors_name_the_field_without_echoing_values():
+    with pytest.raises(ValidationError) as raised:
+        parse_patient_case(_case(demographics="secret-value", patient_id=None))
+    message = format_validation_errors(raised.value)
+    assert "patient_id: Input should be a valid string" in message
+    assert "demographics: Input should be an object" in message
+    assert "secret-value" not in message
+
+
+def test_list_limits_apply_to_uploads_only(monkeypatch):
+    history = [{"condition": f"C{i}"} for i in range(4)]
+    monkeypatch.setattr(get_config(), "MAX_CASE_HISTORY_ENTRIES", 3)
+    with pytest.raises(ValidationError) as raised:
+        parse_patient_case(_case(medical_history=history))
+    assert format_validation_errors(raised.value) == "medical_history: List should have at most 3 items, not 4"
+
+    assert len(parse_patient_case(_case(medical_history=history), limits={}).medical_history) == 4
+    # Cases built in code are not limited
+    assert len(PatientCase(**json.loads(_case(medical_history=history))).medical_history) == 4
+
+
+def test_reads_stop_past_the_size_limit():
+    data = _case(medical_history=[{"note": "x" * 1000}] * 300)
+    upload = _Upload(data)
+    with pytest.raises(CaseTooLargeError):
+        asyncio.run(read_limited(upload, max_bytes=100_000))
+    assert upload.read_bytes < 200_000
+
+    declared = _Upload(data, size=len(data))
+    with pytest.raises(CaseTooLargeError):
+        asyncio.run(read_limited(declared, max_bytes=100_000))
+    assert declared.read_bytes == 0
+
+    assert asyncio.run(read_limited(_Upload(data), max_bytes=len(data))) == data
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _lines(*chunks, max_line_bytes=None):
+    return [item async for item in iter_ndjson_lines(_chunks(*chunks), max_line_bytes)]
+
+
+def test_ndjson_lines_split_across_chunks():
+    lines = asyncio.run(_lines(b'{"a": 1}\n{"b"', b': 2}\r\n\n', b"  \n", b'{"c": 3}'))
+    assert lines == [(1, b'{"a": 1}'), (2, b'{"b": 2}\r'), (5, b'{"c": 3}')]
+
+
+def test_oversized_ndjson_line_is_reported_once_and_skipped():
+    lines = asyncio.run(_lines(b"x" * 6, b"x" * 6, b'\n{"a": 1}\n', b"y" * 20, max_line_bytes=10))
+    assert lines == [(1, None), (2, b'{"a": 1}'), (3, None)]
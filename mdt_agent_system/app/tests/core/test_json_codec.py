@@ -0,0 +1,86 @@
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+
+import pytest
+
+from mdt_agent_system.app.agents.coordinator import AgentOutputPlaceholder
+from mdt_agent_system.app.core import json_codec
+from mdt_agent_system.app.core.atomic_io import write_json_atomic
+from mdt_agent_system.app.core.schemas import PatientCase
+
+
+class Priority(Enum):
+    HIGH = "high"
+
+
+@dataclass
+class Finding:
+    name: str
+
+
+def _value():
+    return {
+        "timestamp": datetime(2024, 3, 1, 9, 30, 15, 250),
+        "case": PatientCase(patient_id="P1", demographics={"age": 68}, medical_history=[], current_condition={}),
+        "placeholder": AgentOutputPlaceholder(summary="done", details={"note": "é"}),
+        "priority": Priority.HIGH,
+        "finding": Finding("nodule"),
+        "tags": ("a", "b"),
+        1: "numeric key",
+        "opaque": object,
+    }
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_codec, "_orjson", None)
+    elif json_codec.backend() != "orjson":
+        pytest.skip("orjson is not installed")
+    return json_codec
+
+
+def test_backends_encode_the_same_text(monkeypatch):
+    if json_codec.backend() != "orjson":
+        pytest.skip("orjson is not installed")
+    value = _value()
+    # The standard library cannot sort mixed int and str keys
+    sortable = {key: item for key, item in value.items() if isinstance(key, str)}
+    fast = [json_codec.dumps(value), json_codec.dumps(sortable, indent=True, sort_keys=True)]
+    monkeypatch.setattr(json_codec, "_orjson", None)
+    assert [json_codec.dumps(value), json_codec.dumps(sortable, indent=True, sort_keys=True)] == fast
+
+
+def test_special_values_become_plain_json(codec):
+    data = codec.to_jsonable(_value())
+
+    assert data["timestamp"] == "2024-03-01T09:30:15.000250"
+    assert data["case"]["patient_id"] == "P1" and data["case"]["demographics"] == {"age": 68}
+    # The placeholder's own dict() shapes its output
+    assert data["placeholder"] == {"summary": "done", "details": {"note": "é"}}
+    assert data["priority"] == "high"
+    assert data["finding"] == {"name": "nodule"}
+    assert data["tags"] == ["a", "b"]
+    assert data["1"] == "numeric key"
+    assert data["opaque"] == str(object)
+    assert "é" in codec.dumps(_value())
+
+
+def test_values_the_fast_backend_rejects_fall_back(codec):
+    assert codec.loads(codec.dumpb({"big": 2 ** 70})) == {"big": 2 ** 70}
+
+
+def test_decode_errors_are_json_decode_errors(codec):
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads(b"{not json")
+    with pytest.raises(codec.JSONDecodeError):
+        codec.loads("")
+
+
+def test_atomic_write_uses_the_codec(codec, tmp_path):
+    path = tmp_path / "data.json"
+    write_json_atomic(path, {"at": datetime(2024, 1, 1)}, indent=True)
+    assert path.read_text(encoding="utf-8") == '{\n  "at": "2024-01-01T00:00:00"\n}'
+    assert list(tmp_path.iterdir()) == [path]
@@ -0,0 +1,29 @@
+import pytest
+from mdt_agent_system.app.core.json_repair import JSONRepairError, loads_tolerant, repair_json
+
+
+def test_valid_json_is_not_repaired():
+    assert loads_tolerant('{"a": [1, 2], "b": "0.0-1.0, x,}"}') == ({"a": [1, 2], "b": "0.0-1.0, x,}"}, [])
+
+
+@pytest.mark.parametrize("text,expected,fixes", [
+    ('{"a": 1, "b": [1, 2,],}', {"a": 1, "b": [1, 2]}, ["trailing_comma"]),
+    ('{"confidence_scores": {"diagnosis": 0.0-1.0, "staging": 0.85}}',
+     {"confidence_scores": {"diagnosis": None, "staging": 0.85}}, ["range_literal"]),
+    ('```json\n{"key_findings": ["Stage 1-2"]}\n```', {"key_findings": ["Stage 1-2"]}, ["code_fence"]),
+    ('Metadata below:\n{"a": "}"}\nHope this helps.', {"a": "}"}, ["surrounding_text"]),
+    ("{'a': True, 'b': None} ", {"a": True, "b": None}, ["python_literal", "single_quotes"]),
+    ("Metadata: {'a': '}x', 'b': 2}", {"a": "}x", "b": 2}, ["surrounding_text", "single_quotes"]),
+    ('{"a": 1 // the score\n}', {"a": 1}, ["comments"]),
+    ('{"a": [1, 2, {"b": "trunc', {"a": [1, 2, {"b": "trunc"}]}, ["truncated"]),
+    ('{"a": "x", "b":', {"a": "x"}, ["truncated"]),
+])
+def test_common_llm_mistakes_are_repaired(text, expected, fixes):
+    assert loads_tolerant(text) == (expected, fixes)
+
+
+def test_unrecoverable_text_raises():
+    with pytest.raises(JSONRepairError):
+        loads_tolerant("no json here")
+    repaired, fixes = repair_json("no json here")
+    assert repaired == "no json here" and fixes == []
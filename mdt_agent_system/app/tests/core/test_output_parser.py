@@ -0,0 +1,154 @@
+import pytest
+from mdt_agent_system.app.core.output_parser import (
+    MDTOutputParser, metadata_repair_stats, parse_markdown_outline, reset_metadata_repair_stats
+)
+
+SAMPLE_OUTPUT = """Some preamble the model added.
+---MARKDOWN---
+# Clinical Assessment
+Overall stable.
+
+## Key Findings
+- Finding 1
+- Finding 2
+---METADATA---
+{"key_findings": ["Finding 1", "Finding {2}"], "confidence": 0.9}
+Trailing chatter"""
+
+
+def test_parse_llm_output_complete_response():
+    output = MDTOutputParser().parse_llm_output(SAMPLE_OUTPUT)
+    assert output.markdown_content.startswith("# Clinical Assessment")
+    assert output.markdown_content.endswith("- Finding 2")
+    assert output.metadata == {"key_findings": ["Finding 1", "Finding {2}"], "confidence": 0.9}
+    # The raw response is no longer duplicated unless asked for
+    assert output.legacy_output is None
+    assert MDTOutputParser().parse_llm_output(SAMPLE_OUTPUT, preserve_legacy=True).legacy_output == {"raw_output": SAMPLE_OUTPUT}
+
+
+def test_parse_llm_output_missing_delimiters():
+    parser = MDTOutputParser()
+    output = parser.parse_llm_output("# Plain answer\nNo delimiters")
+    assert output.markdown_content == "# Plain answer\nNo delimiters"
+    assert output.metadata == {}
+
+    output = parser.parse_llm_output("---MARKDOWN---\n# Only markdown\n")
+    assert output.markdown_content == "# Only markdown"
+    assert output.metadata == {}
+
+    output = parser.parse_llm_output("---MARKDOWN---\n# Report\n---METADATA---\n{not json}")
+    assert output.markdown_content == "# Report"
+    assert output.metadata == {}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64])
+def test_streaming_parser_emits_sections_as_they_complete(chunk_size):
+    stream = MDTOutputParser().stream()
+    events = []
+    metadata_at = None
+    for start in range(0, len(SAMPLE_OUTPUT), chunk_size):
+        chunk = SAMPLE_OUTPUT[start:start + chunk_size]
+        for event in stream.feed(chunk):
+            events.append(event)
+            if event.kind == "metadata":
+                metadata_at = start + chunk_size
+
+    assert [(e.kind, e.title, e.level) for e in events] == [
+        ("section", "Clinical Assessment", 1),
+        ("section", "Key Findings", 2),
+        ("metadata", None, 0),
+    ]
+    assert events[0].content == "Overall stable."
+    assert events[1].content == "- Finding 1\n- Finding 2"
+    # The JSON block is parsed when it closes, before the trailing text arrives
+    assert metadata_at <= SAMPLE_OUTPUT.index("Trailing") + chunk_size
+    assert events[2].metadata["confidence"] == 0.9
+
+    output = stream.close()
+    assert output.markdown_content == MDTOutputParser().parse_llm_output(SAMPLE_OUTPUT).markdown_content
+    assert output.metadata == events[2].metadata
+
+
+@pytest.mark.parametrize("chunk_size", [1, 4, 64])
+def test_streaming_parser_skips_braces_in_single_quoted_strings(chunk_size):
+    text = "---MARKDOWN---\n# Report\n---METADATA---\n{'a': '}x', 'b': 2, 'c': \"it's {\"}\nTrailing chatter"
+    stream = MDTOutputParser().stream()
+    events = []
+    for start in range(0, len(text), chunk_size):
+        events.extend(stream.feed(text[start:start + chunk_size]))
+
+    assert [e.metadata for e in events if e.kind == "metadata"] == [{"a": "}x", "b": 2, "c": "it's {"}]
+    assert stream.close().metadata == {"a": "}x", "b": 2, "c": "it's {"}
+
+def test_streaming_parser_flushes_last_section_on_close():
+    stream = MDTOutputParser().stream()
+    events = stream.feed("---MARKDOWN---\nIntro text\n# Plan\n- Start")
+    # Untitled text before the first header completes when the header arrives
+    assert [(e.title, e.content) for e in events] == [(None, "Intro text")]
+
+    output = stream.close()
+    assert output.markdown_content == "Intro text\n# Plan\n- Start"
+    assert output.metadata == {}
+
+
+OUTLINE_MARKDOWN = """Preamble line
+# Clinical Assessment
+- Stable disease
+
+## Treatment Recommendations (NCCN)
+- Treatment 1
+* Treatment 2
+  - Nested detail
+### Systemic Therapy
+- Treatment 3
+## Follow-up Plan
+- Follow up
+"""
+
+
+def test_markdown_outline_sections_and_bullets():
+    outline = parse_markdown_outline(OUTLINE_MARKDOWN)
+    assert outline.preamble == "Preamble line"
+    assert [(s.title, s.level) for s in outline.sections] == [
+        ("Clinical Assessment", 1),
+        ("Treatment Recommendations (NCCN)", 2),
+        ("Systemic Therapy", 3),
+        ("Follow-up Plan", 2),
+    ]
+
+    assessment = outline.find("Disease Status", "clinical assessment")
+    assert assessment.first_line == "- Stable disease"
+    # A level-1 block spans every nested header
+    assert assessment.block.endswith("- Follow up")
+
+    treatment = outline.find("Treatment Recommendations")
+    assert treatment.bullets() == ["Treatment 1", "Treatment 2"]
+    assert treatment.bullets(include_subsections=True) == ["Treatment 1", "Treatment 2", "Treatment 3"]
+    assert [s.title for s in outline.subsections(treatment)] == ["Systemic Therapy"]
+    assert outline.bullets("Follow-up Plan") == ["Follow up"]
+
+    assert outline.find("Treatment Recommendations", level=1) is None
+    assert outline.bullets("Missing") == []
+    assert parse_markdown_outline("").sections == []
+
+
+def test_metadata_repairs_counted_per_agent():
+    reset_metadata_repair_stats()
+    parser = MDTOutputParser(agent_id="PathologyAgent")
+    output = parser.parse_llm_output(
+        '---MARKDOWN---\n# Report\n---METADATA---\n```json\n{"confidence_scores": {"diagnosis": 0.0-1.0,},}\n```'
+    )
+    assert output.metadata == {"confidence_scores": {"diagnosis": None}}
+    parser.parse_llm_output(SAMPLE_OUTPUT)
+    parser.parse_llm_output("---MARKDOWN---\n# Report\n---METADATA---\nnot json")
+    MDTOutputParser(agent_id="EHRAgent").parse_llm_output("---MARKDOWN---\n# Report\n")
+
+    stats = metadata_repair_stats()
+    assert stats["PathologyAgent"] == {
+        "parsed": 1, "repaired": 1, "failed": 1, "missing": 0,
+        "repairs": {"range_literal": 1, "trailing_comma": 1},
+        "retries": 0, "retry_calls": 0, "retry_recovered": 0, "retry_tokens": 0,
+    }
+    assert stats["EHRAgent"]["missing"] == 1
+    reset_metadata_repair_stats()
+    assert metadata_repair_stats() == {}
@@ -0,0 +1,133 @@
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from mdt_agent_system.app.core.samples import prompts
+from mdt_agent_system.app.core.samples.prompts import (
+    BUILTIN_TEMPLATES, PromptRegistry, get_prompt, get_prompt_template, template_version
+)
+
+
+def test_builtin_templates_are_compiled_once_with_versions():
+    registry = PromptRegistry()
+    ehr = registry.get("EHR")
+
+    assert registry.get("ehr") is ehr
+    assert set(registry.versions()) == set(BUILTIN_TEMPLATES)
+    assert ehr.version == template_version(ehr.text) and ehr.source is None
+    assert "{medical_expertise}" not in ehr.text and "{context}" in ehr.text
+    messages = ehr.format_messages(context="CASE-CONTEXT", task="TASK-TEXT")
+    assert messages[0].content == prompts.SHARED_PREFIX
+    assert "CASE-CONTEXT" in messages[-1].content and "TASK-TEXT" in messages[-1].content
+    assert get_prompt_template("ehr") == get_prompt("ehr").text
+    with pytest.raises(ValueError):
+        registry.get("radiotherapy")
+
+
+def test_template_dir_overrides_and_bad_files_fall_back(tmp_path):
+    (tmp_path / "summary_template.txt").write_text("{medical_expertise}\nSummarise:\n{context}\n{task}")
+    (tmp_path / "ehr.txt").write_text("Broken {unknown_placeholder}")
+    (tmp_path / "notes.txt").write_text("not a template")
+
+    registry = PromptRegistry(template_dir=str(tmp_path))
+    builtin = PromptRegistry()
+
+    summary = registry.get("summary")
+    assert summary.source == str(tmp_path / "summary_template.txt")
+    assert summary.text.startswith(prompts.MEDICAL_EXPERTISE_INTRO)
+    assert summary.version != builtin.get("summary").version
+    # The broken override is ignored rather than failing agent construction
+    assert registry.get("ehr").version == builtin.get("ehr").version
+    assert "notes" not in registry.versions()
+
+
+def test_hot_reload_picks_up_changed_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(prompts, "SOURCE_CHECK_INTERVAL", 0.0)
+    path = tmp_path / "evaluation.txt"
+    path.write_text("Version one {context} {task}")
+    registry = PromptRegistry(template_dir=str(tmp_path), hot_reload=True)
+    first = registry.get("evaluation").version
+
+    path.write_text("Version two, longer {context} {task}")
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+    second = registry.get("evaluation")
+    assert second.version != first and second.text.startswith("Version two")
+
+    path.unlink()
+    assert registry.get("evaluation").version == template_version(PromptRegistry().get("evaluation").text)
+
+
+def test_without_hot_reload_changes_wait_for_reload(tmp_path, monkeypatch):
+    monkeypatch.setattr(prompts, "SOURCE_CHECK_INTERVAL", 0.0)
+    path = tmp_path / "imaging.txt"
+    path.write_text("Old {context} {task}")
+    registry = PromptRegistry(template_dir=str(tmp_path))
+    old = registry.get("imaging").version
+
+    path.write_text("New imaging prompt {context} {task}")
+    assert registry.get("imaging").version == old
+    assert registry.reload()["imaging"] == template_version("New imaging prompt {context} {task}")
+
+
+def test_prompt_endpoints(tmp_path, monkeypatch):
+    from mdt_agent_system.app.main import app
+
+    registry = PromptRegistry(template_dir=str(tmp_path))
+    monkeypatch.setattr(prompts, "_default_registry", registry)
+    client = TestClient(app)
+
+    versions = client.get("/api/prompts").json()
+    assert versions == registry.versions()
+
+    (tmp_path / "guideline.txt").write_text("Guideline override {context} {task}")
+    reloaded = client.post("/api/prompts/reload").json()
+    assert reloaded["guideline"] != versions["guideline"]
+    assert reloaded["ehr"] == versions["ehr"]
+
+
+def test_prompts_put_stable_parts_first():
+    registry = PromptRegistry()
+    ehr, imaging = registry.get("ehr"), registry.get("imaging")
+
+    first = ehr.format_messages(context="EHR-CONTEXT", task="EHR-TASK", shared="SHARED-CASE")
+    second = imaging.format_messages(context="IMAGING-CONTEXT", task="IMAGING-TASK", shared="SHARED-CASE")
+
+    # System message, then the per-run section, then the agent's instructions and stage block
+    assert first[0] == second[0]
+    assert first[1].content.startswith("SHARED-CASE\n\nYou are the EHR Analysis Agent")
+    assert first[1].content.endswith("Current Case Information:\nEHR-CONTEXT\n\nTask: EHR-TASK")
+    assert prompts.MEDICAL_EXPERTISE_INTRO not in first[1].content
+    assert "EHR-CONTEXT" not in ehr.instructions
+
+    cached = ehr.format_messages(context="EHR-CONTEXT", task="EHR-TASK", shared="SHARED-CASE", prefix_cached=True)
+    assert len(cached) == 1 and cached[0].content == first[1].content[len("SHARED-CASE\n\n"):]
+
+
+def test_shared_case_section_is_stable():
+    from mdt_agent_system.app.core.schemas import PatientCase
+    case = PatientCase(patient_id="P1", demographics={"b": 1, "a": 2}, medical_history=[], current_condition={})
+    assert prompts.render_shared_case(case) == prompts.render_shared_case(case.model_copy())
+    assert '"a": 2,\n    "b": 1' in prompts.render_shared_case(case)
+
+
+def test_context_cache_uploads_prefix_once_per_run():
+    from mdt_agent_system.app.core.context_cache import ContextCache
+
+    class RecordingCache(ContextCache):
+        def __init__(self):
+            super().__init__()
+            self.created, self.deleted = [], []
+
+        def _create(self, system, shared):
+            self.created.append(shared)
+            return f"cachedContents/{len(self.created)}"
+
+        def _delete(self, name):
+            self.deleted.append(name)
+
+    cache = RecordingCache()
+    assert cache.handle("run-1", "SYSTEM", "CASE") == cache.handle("run-1", "SYSTEM", "CASE") == "cachedContents/1"
+    assert cache.handle("run-2", "SYSTEM", "CASE") == "cachedContents/2"
+    cache.release("run-1")
+    assert cache.deleted == ["cachedContents/1"] and cache.created == ["CASE", "CASE"]
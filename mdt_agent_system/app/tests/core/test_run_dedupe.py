@@ -0,0 +1,71 @@
+import pytest
+
+from mdt_agent_system.app.core.run_dedupe import (
+    IdempotencyKeyConflictError,
+    RunDeduplicator,
+    case_fingerprint,
+)
+from mdt_agent_system.app.core.schemas import PatientCase
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _case(**changes):
+    data = {
+        "patient_id": "P1",
+        "demographics": {"age": 64},
+        "medical_history": [{"condition": "COPD"}],
+        "current_condition": {"primary_complaint": "cough"},
+    }
+    data.update(changes)
+    return PatientCase(**data)
+
+
+def test_fingerprint_ignores_defaulted_created_at():
+    assert case_fingerprint(_case()) == case_fingerprint(_case())
+    assert case_fingerprint(_case()) != case_fingerprint(_case(patient_id="P2"))
+    assert case_fingerprint(_case(created_at="2024-01-01T00:00:00")) != case_fingerprint(
+        _case(created_at="2024-01-02T00:00:00"))
+
+
+def test_idempotency_key_attaches_until_it_expires():
+    clock = _Clock()
+    dedupe = RunDeduplicator(key_ttl=60, clock=clock)
+    assert dedupe.claim("run-1", _case(), "key") == "run-1"
+    assert dedupe.claim("run-2", _case(), "key") == "run-1"
+    # Without a key and a case window every submission is new
+    assert dedupe.claim("run-3", _case()) == "run-3"
+    with pytest.raises(IdempotencyKeyConflictError) as raised:
+        dedupe.claim("run-4", _case(patient_id="P2"), "key")
+    assert raised.value.run_id == "run-1"
+
+    clock.now = 61
+    assert dedupe.claim("run-5", _case(), "key") == "run-5"
+
+
+def test_identical_cases_attach_within_the_window():
+    clock = _Clock()
+    dedupe = RunDeduplicator(key_ttl=3600, case_window=300, clock=clock)
+    assert dedupe.claim("run-1", _case()) == "run-1"
+    clock.now = 200
+    assert dedupe.claim("run-2", _case(), "retry") == "run-1"
+    assert dedupe.claim("run-3", _case(patient_id="P2")) == "run-3"
+
+    clock.now = 301
+    assert dedupe.claim("run-4", _case()) == "run-4"
+    # The key taken at 200 still points at the first run
+    assert dedupe.claim("run-5", _case(), "retry") == "run-1"
+
+
+def test_forgotten_runs_are_not_attached_to():
+    dedupe = RunDeduplicator(case_window=300)
+    dedupe.claim("run-1", _case(), "key")
+    dedupe.forget("run-1")
+    assert dedupe.claim("run-2", _case(), "key") == "run-2"
+    assert dedupe.claim("run-3", _case()) == "run-2"
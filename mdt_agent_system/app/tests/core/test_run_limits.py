@@ -0,0 +1,47 @@
+import asyncio
+
+from mdt_agent_system.app.core.run_limits import RunLimiter
+
+
+def test_runs_past_the_limit_wait_for_a_slot():
+    async def scenario():
+        limiter = RunLimiter(2)
+        await limiter.acquire()
+        await limiter.acquire()
+        third = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert not third.done()
+        assert (limiter.running, limiter.waiting) == (2, 1)
+
+        limiter.release()
+        await third
+        assert (limiter.running, limiter.waiting) == (2, 0)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_does_not_hold_a_slot():
+    async def scenario():
+        limiter = RunLimiter(1)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert (limiter.running, limiter.waiting) == (1, 0)
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_no_limit_only_counts():
+    async def scenario():
+        limiter = RunLimiter(None)
+        for _ in range(10):
+            await limiter.acquire()
+        assert limiter.running == 10
+        limiter.release()
+        assert limiter.running == 9
+
+    asyncio.run(scenario())
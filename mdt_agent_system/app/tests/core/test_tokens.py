@@ -0,0 +1,59 @@
+from types import SimpleNamespace
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from mdt_agent_system.app.core.schemas import PatientCase
+from mdt_agent_system.app.core.tokens import (
+    TokenLedger,
+    estimate_prompt_tokens,
+    estimate_tokens,
+    reported_prompt_tokens,
+    trim_candidates,
+)
+
+
+def _case(history, labs=None):
+    return PatientCase(patient_id="P1", demographics={}, medical_history=history, current_condition={}, lab_results=labs)
+
+
+def test_prompt_estimate_counts_every_message():
+    messages = [SystemMessage(content="x" * 40), HumanMessage(content="y" * 80)]
+    assert estimate_prompt_tokens(messages) == estimate_tokens("x" * 40) + estimate_tokens("y" * 80) + 8
+
+
+def test_reported_usage_is_read_when_present():
+    assert reported_prompt_tokens(AIMessage(content="ok")) is None
+    message = AIMessage(content="ok", response_metadata={"usage_metadata": {"prompt_token_count": 321}})
+    assert reported_prompt_tokens(message) == 321
+    assert reported_prompt_tokens(SimpleNamespace(usage_metadata={"input_tokens": 12})) == 12
+
+
+def test_trim_order_is_oldest_history_then_labs_then_markdown():
+    history = [
+        {"condition": "B", "diagnosed": "2020-01-01"},
+        {"condition": "A", "diagnosed": "2015-05-01"},
+        {"condition": "C", "diagnosed": "2023-02-01"},
+    ]
+    labs = [{"test": "Hb", "date": "2023-01-01"}]
+    context = {"ehr_analysis": {"summary": "s", "markdown_content": "# long"}, "note": "n"}
+
+    steps = list(trim_candidates(_case(history, labs), context))
+
+    assert [[h["condition"] for h in case.medical_history] for case, _ in steps[:2]] == [["B", "C"], ["C"]]
+    assert steps[2][0].lab_results is None
+    assert steps[3][1] == {"ehr_analysis": {"summary": "s"}, "note": "n"}
+    assert len(steps) == 4
+    # Deterministic: the same input always trims the same way
+    assert [s[0].medical_history for s in trim_candidates(_case(history, labs), context)] == [s[0].medical_history for s in steps]
+
+
+def test_ledger_totals_and_forgets_oldest_runs():
+    ledger = TokenLedger(max_runs=2)
+    ledger.record("r1", "EHRAgent", 100, reported=120)
+    ledger.record("r1", "ImagingAgent", 50)
+    ledger.record("r2", "EHRAgent", 10)
+    assert ledger.estimated_total("r1") == 150
+    assert ledger.usage("r1")[0]["reported_prompt_tokens"] == 120
+
+    ledger.record("r3", "EHRAgent", 10)
+    assert ledger.usage("r1") == [] and ledger.estimated_total("r2") == 10
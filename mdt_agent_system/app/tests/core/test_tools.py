@@ -1,10 +1,27 @@
+import asyncio
+import json
+import threading
+import time
 import pytest
+from types import SimpleNamespace
+from typing import ClassVar
 from mdt_agent_system.app.core.tools import (
     MDTTool,
+    MDTToolConfig,
     PharmacologyReferenceTool,
     GuidelineReferenceTool,
-    ToolRegistry
+    ToolRegistry,
+    GuidelineKnowledgeBase,
+    PharmacologyDatabase,
+    DrugInteractionMatrixTool
 )
+from mdt_agent_system.app.core.tools.medical import extract_medications
+from mdt_agent_system.app.core.tools.pharmacology_db import (
+    DEFAULT_PHARMACOLOGY_PATH,
+    get_default_pharmacology_db,
+    reset_default_pharmacology_db,
+)
+from mdt_agent_system.app.tests.synthetic_data import synthetic_guidelines
 from pydantic import Field
 from unittest.mock import MagicMock
 
@@ -24,6 +41,81 @@ def test_base_tool():
     assert tool.max_retries == 3
     assert tool.retry_delay == 1.0
 
+class _SleepTool(MDTTool):
+    """Synchronous tool that records how many calls overlap."""
+    name: str = "sleep_tool"
+    description: str = "Sleeps, then fails until the configured attempt"
+    
+    def __init__(self, fail_until: int = 0, **data):
+        super().__init__(**data)
+        # BaseTool rejects unknown attributes, so keep test state in one namespace
+        self.__dict__["state"] = SimpleNamespace(
+            active=0, peak=0, calls=0, fail_until=fail_until, lock=threading.Lock(), gate=None, released=[]
+        )
+    
+    def _run(self, value: int = 0, **kwargs):
+        state = self.state
+        with state.lock:
+            state.calls += 1
+            call = state.calls
+            state.active += 1
+            state.peak = max(state.peak, state.active)
+        try:
+            if state.gate is not None:
+                # Blocks the worker thread until the test releases it from the event loop
+                state.released.append(state.gate.wait(timeout=5))
+            else:
+                time.sleep(0.05)
+            if call <= state.fail_until:
+                raise ConnectionError(f"transient failure {call}")
+            return {"status": "success", "value": value}
+        finally:
+            with state.lock:
+                state.active -= 1
+
+@pytest.mark.asyncio
+async def test_tool_async_offload_and_concurrency_limit():
+    """Sync tools run off the event loop, bounded by max_concurrency."""
+    tool = _SleepTool(config=MDTToolConfig(max_concurrency=2))
+    tool.state.gate = threading.Event()
+    calls = asyncio.gather(*(tool._arun(value=i) for i in range(6)))
+    
+    async def until_two_active():
+        while tool.state.active < 2:
+            await asyncio.sleep(0)
+    
+    # Two calls block in worker threads while the loop keeps running; the rest wait for a slot
+    await asyncio.wait_for(until_two_active(), timeout=5)
+    assert tool.state.calls == 2
+    tool.state.gate.set()
+    results = await calls
+    
+    assert [r["value"] for r in results] == list(range(6))
+    assert tool.state.peak == 2
+    assert tool.state.released == [True] * 6
+
+@pytest.mark.asyncio
+async def test_tool_retries_and_timeout():
+    """Transient failures are retried with backoff; timeouts and bad arguments surface."""
+    tool = _SleepTool(fail_until=2, config=MDTToolConfig(max_retries=2, retry_delay=0.01, retry_jitter=0.5))
+    assert (await tool._arun(value=1))["value"] == 1
+    assert tool.state.calls == 3
+    assert 0.005 <= tool._retry_delay_for(1) <= 0.015
+    assert 0.01 <= tool._retry_delay_for(2) <= 0.03
+    
+    tool = _SleepTool(fail_until=5, config=MDTToolConfig(max_retries=1, retry_delay=0))
+    with pytest.raises(ConnectionError):
+        await tool._arun()
+    assert tool.state.calls == 2
+    
+    tool = _SleepTool(config=MDTToolConfig(max_retries=0, timeout=0.01))
+    with pytest.raises(asyncio.TimeoutError):
+        await tool._arun()
+    
+    # Bad arguments are not retried, so the long retry_delay is never waited out
+    with pytest.raises(TypeError):
+        await _SleepTool(config=MDTToolConfig(retry_delay=5))._arun(1, value=2)
+
 def test_pharmacology_tool():
     """Test the PharmacologyReferenceTool."""
     tool = PharmacologyReferenceTool()
@@ -38,6 +130,142 @@ def test_pharmacology_tool():
     result = tool._run("unknown_drug")
     assert result["status"] == "not_found"
 
+def test_pharmacology_tool_batch():
+    """A whole medication list resolves in one call with the interactions among it."""
+    tool = PharmacologyReferenceTool()
+    
+    result = tool._run(medications=[
+        "Metformin 1000mg BID",
+        "PRN NSAIDs",
+        "Carboplatin AUC5 + pemetrexed 500mg/m2",
+        "Vitamin D 1000 IU",
+    ])
+    assert result["status"] == "success"
+    assert [d["drug"] for d in result["medications"]["Carboplatin AUC5 + pemetrexed 500mg/m2"]] == ["carboplatin", "pemetrexed"]
+    assert result["medications"]["PRN NSAIDs"][0]["data"]["class"] == "NSAID"
+    assert result["not_found"] == ["Vitamin D 1000 IU"]
+    assert result["interactions"][0] == {
+        "drugs": ["nsaid", "pemetrexed"],
+        "severity": "major",
+        "effect": result["interactions"][0]["effect"],
+    }
+    
+    # Brand names and synonyms resolve through the alias table
+    assert tool._run("Keytruda 200mg q3w")["drug"] == "pembrolizumab"
+
+def test_pharmacology_database_fts_and_rebuild(tmp_path):
+    """Full-text search covers classes and indications; file databases rebuild on dataset change."""
+    dataset = tmp_path / "drugs.json"
+    dataset.write_text(DEFAULT_PHARMACOLOGY_PATH.read_text())
+    db_path = tmp_path / "pharmacology.db"
+    
+    db = PharmacologyDatabase(db_path, dataset)
+    assert db.search("anticoagulant")[0]["drug"] == "apixaban"
+    assert "pembrolizumab" in [r["drug"] for r in db.search("PD-L1 expression")]
+    size = len(db)
+    db.close()
+    
+    dataset.write_text(json.dumps({
+        "drugs": [{"id": "newdrug", "name": "Newdrug", "class": "Test"}],
+        "interactions": []
+    }))
+    db = PharmacologyDatabase(db_path, dataset)
+    assert len(db) == 1 != size
+    assert db.lookup("newdrug 5mg")[0] == "newdrug"
+    db.close()
+
+def test_pharmacology_reset_keeps_in_flight_database_open():
+    """A reload swaps the shared database; a caller still holding the old one can keep querying."""
+    reset_default_pharmacology_db()
+    old = get_default_pharmacology_db()
+    try:
+        reset_default_pharmacology_db()
+        new = get_default_pharmacology_db()
+        assert new is not old
+        assert old.lookup("Keytruda 200mg")[0] == "pembrolizumab"
+        assert new.lookup("Keytruda 200mg")[0] == "pembrolizumab"
+    finally:
+        reset_default_pharmacology_db()
+
+def test_drug_interaction_matrix_tool():
+    """Matrix lookup flags the same pairs as a pairwise scan and reads the patient case."""
+    tool = DrugInteractionMatrixTool()
+    db = PharmacologyDatabase()
+    table = {(a, b): severity for a, b, severity, _ in db.interaction_table()}
+    
+    drugs = db.drug_ids()
+    flagged = tool.check(drugs, db)
+    expected = {(a, b) for i, a in enumerate(drugs) for b in drugs[i + 1:] if (a, b) in table or (b, a) in table}
+    assert {tuple(sorted(p["drugs"])) for p in flagged} == {tuple(sorted(pair)) for pair in expected}
+    assert flagged[0]["severity"] == "contraindicated"
+    assert all(p["severity"] in ("major", "contraindicated") for p in tool.check(drugs, db, min_severity="major"))
+    
+    case = {
+        "medical_history": [
+            {"condition": "Type 2 Diabetes", "treatment": "Metformin 1000mg BID"},
+            {"condition": "Osteoarthritis", "treatment": "PRN NSAIDs"},
+            {"condition": "Appendicectomy"}
+        ],
+        "current_condition": {"medications": ["Pemetrexed 500mg/m2", "Vitamin D"]}
+    }
+    assert extract_medications(case) == ["Metformin 1000mg BID", "PRN NSAIDs", "Pemetrexed 500mg/m2", "Vitamin D"]
+    result = tool._run(patient_case=case)
+    assert result["drug_ids"] == ["metformin", "nsaid", "pemetrexed"]
+    assert result["pairs_checked"] == 3
+    assert result["unmatched"] == ["Vitamin D"]
+    assert result["max_severity"] == "major"
+    assert result["flagged_pairs"][0]["drugs"] == ["nsaid", "pemetrexed"]
+    
+    assert tool._run(medications=["aspirin"], min_severity="severe")["status"] == "error"
+
+def test_tool_result_cache(monkeypatch):
+    """Normalized arguments share entries; TTL, LRU bound and per-tool flags apply."""
+    from mdt_agent_system.app.core.tools import cache as cache_module
+    
+    tool = GuidelineReferenceTool()
+    first = tool._run("Chest Pain")
+    first["guidelines"]["recommendations"].append("mutated by caller")
+    second = tool._run("  chest   pain ")
+    assert second["condition"] == "chest_pain"
+    assert "mutated by caller" not in second["guidelines"]["recommendations"]
+    stats = tool.result_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+    
+    cache = cache_module.ToolResultCache("t", ttl=0.05, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    assert cache.get("a") is cache_module._MISSING and cache.evictions == 1
+    time.sleep(0.06)
+    assert cache.get("c") is cache_module._MISSING and cache.expirations == 1
+    
+    tool.set_cache_enabled(False)
+    assert tool.result_cache is None
+    assert tool._run("chest pain")["condition"] == "chest_pain"
+    
+    class AlwaysFresh(GuidelineReferenceTool):
+        cache_enabled: ClassVar[bool] = False
+    assert AlwaysFresh().result_cache is None
+
+@pytest.mark.asyncio
+async def test_tool_result_cache_invalidated_on_source_change(tmp_path, monkeypatch):
+    """Editing a knowledge-base file drops the tool's cached results."""
+    from mdt_agent_system.app.core.tools import cache as cache_module
+    monkeypatch.setattr(cache_module, "SOURCE_CHECK_INTERVAL", 0.0)
+    
+    source = tmp_path / "guidelines.json"
+    source.write_text(json.dumps([{"id": "gout", "name": "Gout", "recommendations": ["v1"]}]))
+    tool = GuidelineReferenceTool(knowledge_base=GuidelineKnowledgeBase.from_paths([source]))
+    assert (await tool._arun("gout"))["guidelines"]["recommendations"] == ["v1"]
+    assert (await tool._arun("gout"))["guidelines"]["recommendations"] == ["v1"]
+    assert tool.result_cache.hits == 1
+    
+    source.write_text(json.dumps([{"id": "gout", "name": "Gout", "recommendations": ["v2", "longer"]}]))
+    tool.knowledge_base = GuidelineKnowledgeBase.from_paths([source])
+    assert (await tool._arun("gout"))["guidelines"]["recommendations"] == ["v2", "longer"]
+    assert tool.result_cache.invalidations == 1
+    assert any(s["tool"] == "guideline_reference" for s in cache_module.tool_cache_stats())
+
 def test_guideline_tool():
     """Test the GuidelineReferenceTool."""
     tool = GuidelineReferenceTool()
@@ -52,6 +280,51 @@ def test_guideline_tool():
     result = tool._run("unknown_condition")
     assert result["status"] == "not_found"
 
+def test_guideline_tool_ranked_lookups():
+    """Synonyms, ICD codes and stage/biomarker tags resolve to ranked guidelines."""
+    tool = GuidelineReferenceTool()
+    
+    assert tool._run("T2DM")["condition"] == "type_2_diabetes"
+    assert tool._run("Patient with ICD I10")["condition"] == "hypertension"
+    assert tool._run("E11.9")["condition"] == "type_2_diabetes"  # category match
+    
+    result = tool._run("Stage IIIA non-small cell lung cancer, KRAS G12C mutation")
+    ranked = [m["condition"] for m in result["matches"]]
+    assert ranked[0] == "nsclc_kras_g12c"
+    assert "nsclc_stage_iii" in ranked
+    assert [m["score"] for m in result["matches"]] == sorted((m["score"] for m in result["matches"]), reverse=True)
+    assert "synonyms" not in result["guidelines"]
+
+def test_guideline_knowledge_base_yaml(tmp_path):
+    """Guidelines load from YAML files and duplicate ids are rejected."""
+    (tmp_path / "extra.yaml").write_text(
+        "guidelines:\n"
+        "  - id: gout\n"
+        "    name: Gout\n"
+        "    synonyms: [gouty arthritis]\n"
+        "    icd_codes: [M10.9]\n"
+        "    recommendations: [Start urate-lowering therapy]\n"
+    )
+    kb = GuidelineKnowledgeBase.from_paths([tmp_path])
+    assert len(kb) == 1
+    assert kb.search("acute gouty arthritis")[0][0]["id"] == "gout"
+    assert GuidelineReferenceTool(knowledge_base=kb)._run("M10")["condition"] == "gout"
+    
+    with pytest.raises(ValueError):
+        GuidelineKnowledgeBase([{"id": "gout"}, {"id": "gout"}])
+
+def test_guideline_knowledge_base_large_corpus():
+    """Exact names, synonyms and ICD codes stay top-ranked at 10k guidelines."""
+    entries = synthetic_guidelines(10000)
+    kb = GuidelineKnowledgeBase(entries)
+    
+    for i in (0, 4321, 9999):
+        entry = entries[i]
+        assert kb.search(entry["name"])[0][0]["id"] == entry["id"]
+        assert kb.search(entry["synonyms"][0], limit=1)[0][0]["id"] == entry["id"]
+        assert entry["id"] in [e["id"] for e, _ in kb.search(entry["icd_codes"][0], limit=10)]
+    assert len(kb.search("lung cancer", limit=5)) == 5
+
 def test_tool_registry():
     """Test the ToolRegistry."""
     # Reset registry for testing
@@ -84,4 +357,91 @@ def test_tool_registry():
     
     # Test registering invalid tool type
     with pytest.raises(ValueError):
-        ToolRegistry.register_tool("not_a_tool") 
\ No newline at end of file
+        ToolRegistry.register_tool("not_a_tool")
+
+def test_tool_registry_initializes_once(monkeypatch):
+    """Concurrent first lookups register defaults once; later lookups build nothing."""
+    from mdt_agent_system.app.core.tools import registry as registry_module
+    
+    constructed = []
+    original = PharmacologyReferenceTool.__init__
+    def counting_init(self, *args, **kwargs):
+        constructed.append(1)
+        original(self, *args, **kwargs)
+    monkeypatch.setattr(PharmacologyReferenceTool, "__init__", counting_init)
+    monkeypatch.setattr(registry_module, "_entry_points", lambda group: [])
+    
+    ToolRegistry.reset()
+    errors = []
+    def lookup():
+        try:
+            for _ in range(50):
+                ToolRegistry.get_tool("pharmacology_reference")
+        except Exception as e:
+            errors.append(e)
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert errors == []
+    assert len(constructed) == 1
+    ToolRegistry.list_tools()
+    assert len(constructed) == 1
+
+def test_tool_registry_entry_point_plugins(monkeypatch):
+    """Tools exposed through entry points are registered; broken plugins are skipped."""
+    from mdt_agent_system.app.core.tools import registry as registry_module
+    
+    class PluginTool(MDTTool):
+        name: str = "plugin_tool"
+        description: str = "Tool contributed by a plugin"
+        
+        def _run(self, **kwargs):
+            return {"status": "success"}
+    
+    def broken():
+        raise ImportError("missing dependency")
+    
+    entry_points = [
+        SimpleNamespace(name="plugin", load=lambda: PluginTool),
+        SimpleNamespace(name="factory", load=lambda: lambda: [PluginTool(name="plugin_tool_2")]),
+        SimpleNamespace(name="duplicate", load=lambda: GuidelineReferenceTool),
+        SimpleNamespace(name="broken", load=broken),
+    ]
+    monkeypatch.setattr(registry_module, "_entry_points", lambda group: entry_points)
+    
+    ToolRegistry.reset()
+    names = ToolRegistry.list_tools()
+    assert {"plugin_tool", "plugin_tool_2", "guideline_reference"} <= set(names)
+    assert isinstance(ToolRegistry.get_tool("plugin_tool"), PluginTool)
+    ToolRegistry.reset()
+
+@pytest.mark.asyncio
+async def test_prefetch_plan_and_context():
+    """The planner extracts lookups from the case and the results are condensed."""
+    from pathlib import Path
+    from mdt_agent_system.app.core.schemas import PatientCase
+    from mdt_agent_system.app.core.tools import plan_prefetch, prefetch_tool_context
+    
+    sample = Path(__file__).resolve().parents[2] / "core" / "samples" / "patient_case.json"
+    case = PatientCase(**json.loads(sample.read_text()))
+    plan = plan_prefetch(case)
+    
+    assert plan.primary_condition == "Lung adenocarcinoma, KRAS G12C mutated, PD-L1 80%"
+    assert "Hypertension" in plan.conditions
+    assert plan.medications == ["Metformin 1000mg BID", "Lisinopril 20mg daily", "PRN NSAIDs"]
+    assert plan.biomarkers == ["PD-L1 80% expression", "KRAS G12C mutation detected"]  # negatives skipped
+    
+    ToolRegistry.reset()
+    context = await prefetch_tool_context(plan, ["guideline_reference", "pharmacology_reference"])
+    names = [g["guideline"] for g in context["guidelines"]]
+    assert names[0] == "Non-small cell lung cancer, KRAS G12C mutation"
+    assert "Hypertension" in names
+    assert context["medications"]["PRN NSAIDs"] == ["nsaid (NSAID)"]
+    assert context["drug_interactions"][0]["drugs"] == ["lisinopril", "nsaid"]
+    
+    # Only the agent's own tools are used
+    context = await prefetch_tool_context(plan, ["guideline_reference"])
+    assert "medications" not in context
@@ -0,0 +1,28 @@
+"""Synthetic data generators shared by the tests and the benchmarks."""
+import random
+from typing import Any, Dict, List
+
+_ORGANS = ["lung", "breast", "colon", "prostate", "kidney", "liver", "pancreas", "ovarian", "gastric", "bladder"]
+_KINDS = ["cancer", "carcinoma", "disease", "syndrome", "insufficiency", "infection", "fibrosis", "neoplasm"]
+_BIOMARKERS = ["egfr", "alk", "ros1", "braf v600e", "her2", "pd l1", "kras g12c", "msi high", "brca1", "ntrk"]
+_STAGES = ["stage i", "stage ii", "stage iii", "stage iv"]
+
+
+def synthetic_guidelines(size: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Generate ``size`` guideline entries with realistic term overlap."""
+    rng = random.Random(seed)
+    entries = []
+    for i in range(size):
+        organ, kind = rng.choice(_ORGANS), rng.choice(_KINDS)
+        letter = chr(ord("A") + i % 26)
+        entries.append({
+            "id": f"guideline_{i}",
+            "name": f"{organ} {kind} variant {i}",
+            "synonyms": [f"{organ} {kind} type {i}", f"condition {i}"],
+            "icd_codes": [f"{letter}{i % 100:02d}.{i % 10}"],
+            "tags": [rng.choice(_STAGES), rng.choice(_BIOMARKERS), organ],
+            "source": "synthetic",
+            "version": "1",
+            "recommendations": [f"Recommendation {i}"],
+        })
+    return entries